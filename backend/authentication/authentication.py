@@ -0,0 +1,124 @@
+import pickle
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from courses.versioning import bump_counter, read_counter
+from unipath_backend.cache import is_shared
+
+USER_GENERATION_KEY = 'auth:user:{user_id}:generation'
+USER_KEY = 'auth:user:{user_id}:{generation}'
+
+
+class LocalUserCache:
+    """Per-process pickled users that expire after a few seconds.
+
+    Entries are dropped here as soon as this process changes a user; other
+    processes serve theirs until the TTL runs out, which bounds how stale a
+    deactivated account or edited profile can look. That bound needs the
+    shared cache: with a per-process one, other workers would keep the user
+    for ``AUTH_USER_CACHE_TTL``, so ``load_user`` then reads the database.
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def get(self, user_id):
+        entry = self.entries.get(user_id)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+    def set(self, user_id, payload, ttl):
+        with self.lock:
+            if len(self.entries) >= self.max_entries:
+                self.entries.clear()
+            self.entries[user_id] = (time.monotonic() + ttl, payload)
+
+    def discard(self, user_id):
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+local_users = LocalUserCache()
+
+
+def local_ttl():
+    return getattr(settings, 'AUTH_USER_LOCAL_TTL', 5)
+
+
+def shared_ttl():
+    return getattr(settings, 'AUTH_USER_CACHE_TTL', 300)
+
+
+def _query_user(user_id):
+    return get_user_model().objects.select_related('userprofile').filter(
+        **{api_settings.USER_ID_FIELD: user_id}
+    ).first()
+
+
+def load_user(user_id):
+    """The user with its profile, from this process, then the shared cache, then one query.
+
+    Every caller gets its own unpickled copy, so a view mutating
+    ``request.user`` cannot leak into concurrent requests. Without a shared
+    cache other workers would never hear of a change, so every call queries.
+    """
+    # Token claims may carry the id as a string; signals pass the primary key.
+    user_id = str(user_id)
+    if not is_shared():
+        return _query_user(user_id)
+    payload = local_users.get(user_id)
+    if payload is None:
+        # Keys carry a per-user generation: a row read just before a change
+        # commits is stored under a generation that is never read again.
+        key = USER_KEY.format(user_id=user_id, generation=read_counter(USER_GENERATION_KEY.format(user_id=user_id)))
+        payload = cache.get(key)
+        if payload is None:
+            user = _query_user(user_id)
+            if user is None:
+                return None
+            payload = pickle.dumps(user, pickle.HIGHEST_PROTOCOL)
+            cache.set(key, payload, shared_ttl())
+        local_users.set(user_id, payload, local_ttl())
+    return pickle.loads(payload)
+
+
+def invalidate_user(user_id):
+    user_id = str(user_id)
+    local_users.discard(user_id)
+    bump_counter(USER_GENERATION_KEY.format(user_id=user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """``JWTAuthentication`` that serves the user and profile from cache instead of a query per request."""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        user = load_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+        return user
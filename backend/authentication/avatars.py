@@ -0,0 +1,203 @@
+"""
+Avatar uploads and their thumbnails.
+
+``AvatarUploadHandler`` spools an upload to a temporary file chunk by chunk,
+hashing it on the way and giving up once it passes
+``AVATAR_MAX_UPLOAD_SIZE``, so a photo is never held in memory whole. The
+original is moved into storage under a name derived from its hash.
+
+Once the profile is saved, square WebP thumbnails in ``AVATAR_SIZES`` are
+built on a small thread pool (``AVATAR_THUMBNAIL_WORKERS``; 0 builds them
+after the response is committed, in the request thread). Pillow releases
+the GIL while decoding, resizing and encoding, so the threads run in
+parallel without forking processes that would inherit database
+connections. The variant names are recorded in
+``UserProfile.avatar_variants``. Every file name is content-addressed, so
+``media_view`` can tell clients to cache them for a year; avatars uploaded
+before that keep their old names and get no such promise.
+"""
+import hashlib
+import io
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import SkipFile, TemporaryFileUploadHandler
+from django.db import connections, transaction
+from django.views.static import serve
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .authentication import invalidate_user
+from .models import UserProfile
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp', 'GIF': '.gif'}
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# ``save_avatar`` and ``build_variants`` names: a hash prefix, then the thumbnail size.
+CONTENT_ADDRESSED = re.compile(r'avatars/\d+/[0-9a-f]{20}(-\d+)?\.[a-z]+')
+
+
+class InvalidAvatar(Exception):
+    pass
+
+
+def max_upload_size():
+    return getattr(settings, 'AVATAR_MAX_UPLOAD_SIZE', 10 * 1024 * 1024)
+
+
+def avatar_sizes():
+    return getattr(settings, 'AVATAR_SIZES', (64, 128, 256))
+
+
+class AvatarUploadHandler(TemporaryFileUploadHandler):
+    too_large = False
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.digest = hashlib.sha256()
+        self.received = 0
+        self.too_large = False
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > max_upload_size():
+            self.too_large = True
+            raise SkipFile()
+        self.digest.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        upload = super().file_complete(file_size)
+        upload.sha256 = self.digest.hexdigest()
+        return upload
+
+
+def inspect_image(upload):
+    """The file extension for ``upload``'s image format; reads the header only."""
+    try:
+        with Image.open(upload) as image:
+            image_format = image.format
+            image.verify()
+    except (UnidentifiedImageError, OSError, SyntaxError, Image.DecompressionBombError):
+        raise InvalidAvatar('Upload a valid image.')
+    finally:
+        upload.seek(0)
+    if image_format not in EXTENSIONS:
+        raise InvalidAvatar(f'Unsupported image format: {image_format}.')
+    return EXTENSIONS[image_format]
+
+
+def build_variants(name):
+    """Write a square WebP of each size for the stored original ``name``; returns ``{size: name}``."""
+    stem = os.path.splitext(name)[0]
+    variants = {}
+    with default_storage.open(name) as source, Image.open(source) as image:
+        largest = max(avatar_sizes())
+        # Lets JPEG decode at a fraction of the full resolution.
+        image.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+        for size in sorted(avatar_sizes(), reverse=True):
+            # Each size is cut from the previous one rather than from the full image.
+            image = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+            target = f'{stem}-{size}.webp'
+            if not default_storage.exists(target):
+                buffer = io.BytesIO()
+                image.save(buffer, 'WEBP', quality=80, method=4)
+                target = default_storage.save(target, ContentFile(buffer.getvalue()))
+            variants[str(size)] = target
+    return variants
+
+
+def delete_files(names):
+    for name in names:
+        if name:
+            default_storage.delete(name)
+
+
+def process_avatar(profile_id, user_id, name):
+    variants = build_variants(name)
+    if UserProfile.objects.filter(pk=profile_id, avatar=name).update(avatar_variants=variants):
+        invalidate_user(user_id)
+    else:
+        # Replaced or removed while the thumbnails were being made.
+        delete_files(variants.values())
+
+
+_executor = None
+_executor_lock = threading.Lock()
+pending = set()
+
+
+def _run(profile_id, user_id, name, in_worker):
+    try:
+        process_avatar(profile_id, user_id, name)
+    except Exception:
+        # The profile keeps its original avatar; the next upload tries again.
+        logger.exception('Could not make thumbnails of %s', name)
+    finally:
+        if in_worker:
+            connections.close_all()
+
+
+def schedule_thumbnails(profile_id, user_id, name):
+    workers = getattr(settings, 'AVATAR_THUMBNAIL_WORKERS', 2)
+    if not workers:
+        _run(profile_id, user_id, name, in_worker=False)
+        return
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='avatars')
+    future = _executor.submit(_run, profile_id, user_id, name, True)
+    pending.add(future)
+    future.add_done_callback(pending.discard)
+
+
+def wait_for_thumbnails(timeout=None):
+    wait(list(pending), timeout)
+
+
+def save_avatar(profile, upload):
+    """Store ``upload`` as ``profile``'s avatar and queue its thumbnails once the change commits."""
+    extension = inspect_image(upload)
+    name = f'avatars/{profile.user_id}/{upload.sha256[:20]}{extension}'
+    if not default_storage.exists(name):
+        # A spooled upload is moved into place, not copied.
+        name = default_storage.save(name, upload)
+    replaced = [profile.avatar.name, *profile.avatar_variants.values()] if profile.avatar.name != name else []
+    profile.avatar.name = name
+    profile.avatar_variants = {}
+    with transaction.atomic():
+        profile.save(update_fields=['avatar', 'avatar_variants', 'updated_at'])
+        transaction.on_commit(lambda: delete_files(replaced))
+        transaction.on_commit(lambda: schedule_thumbnails(profile.pk, profile.user_id, name))
+    return profile
+
+
+def remove_avatar(profile):
+    names = [profile.avatar.name, *profile.avatar_variants.values()]
+    profile.avatar = None
+    profile.avatar_variants = {}
+    with transaction.atomic():
+        profile.save(update_fields=['avatar', 'avatar_variants', 'updated_at'])
+        transaction.on_commit(lambda: delete_files(names))
+    return profile
+
+
+def media_view(request, path):
+    """Serve an uploaded file; clients may cache content-addressed ones for good.
+
+    Only routed when ``SERVE_MEDIA`` is on; in production the web server or
+    storage serves ``MEDIA_ROOT``.
+    """
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    if CONTENT_ADDRESSED.fullmatch(path):
+        response['Cache-Control'] = IMMUTABLE
+    return response
@@ -0,0 +1,157 @@
+import math
+import threading
+import time
+from collections import deque
+from hashlib import blake2b
+
+from django.conf import settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+from courses.versioning import bump_counter, read_counter
+from unipath_backend.cache import is_shared
+from unipath_backend.benchmarking import summarize
+
+EPOCH_KEY = 'auth:blacklist:epoch'
+# Blacklist rows can commit out of id order, so every sync re-reads this
+# many ids below the highest one already loaded.
+SYNC_OVERLAP = 1000
+
+
+class BloomFilter:
+    """Set membership with no false negatives and a bounded false-positive rate."""
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        digest = blake2b(value.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class BlacklistFilter:
+    """Per-process bloom filter over blacklisted JTIs in front of ``BlacklistedToken``.
+
+    A miss answers "not blacklisted" without a query; a hit is confirmed in
+    the database. Processes learn about new blacklist rows from a cache
+    epoch bumped after each blacklisting commits and load only rows past the
+    last id they saw. The filter is rebuilt once it holds more than its
+    capacity, which also sheds JTIs whose rows were purged.
+
+    The epoch only reaches other processes through a shared cache. Without
+    one, a token blacklisted by another worker would never enter this
+    filter, so every lookup goes to the database instead.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.bloom = None
+        self.epoch = None
+        self.last_id = 0
+        self.latencies = deque(maxlen=10000)
+        self.counters = {'lookups': 0, 'filtered': 0, 'database_checks': 0, 'blacklisted': 0}
+
+    @staticmethod
+    def capacity():
+        return getattr(settings, 'TOKEN_BLACKLIST_FILTER_CAPACITY', 1000000)
+
+    def _load(self, after_id):
+        rows = BlacklistedToken.objects.filter(id__gt=after_id).order_by('id').values_list('id', 'token__jti')
+        for row_id, jti in rows.iterator(chunk_size=5000):
+            self.bloom.add(jti)
+            self.last_id = max(self.last_id, row_id)
+
+    def sync(self):
+        epoch = read_counter(EPOCH_KEY)
+        if epoch == self.epoch and self.bloom is not None:
+            return
+        with self.lock:
+            if self.bloom is None or self.bloom.count > self.bloom.capacity:
+                self.bloom = BloomFilter(self.capacity())
+                self.last_id = 0
+                self._load(0)
+            else:
+                self._load(max(0, self.last_id - SYNC_OVERLAP))
+            self.epoch = epoch
+
+    def add(self, jti):
+        with self.lock:
+            if self.bloom is not None:
+                self.bloom.add(jti)
+
+    def is_blacklisted(self, jti):
+        start = time.perf_counter()
+        shared = is_shared()
+        if shared:
+            self.sync()
+        self.counters['lookups'] += 1
+        if shared and jti not in self.bloom:
+            self.counters['filtered'] += 1
+            blacklisted = False
+        else:
+            self.counters['database_checks'] += 1
+            blacklisted = BlacklistedToken.objects.filter(token__jti=jti).exists()
+            self.counters['blacklisted'] += blacklisted
+        self.latencies.append(time.perf_counter() - start)
+        return blacklisted
+
+    def stats(self):
+        checks = self.counters['database_checks']
+        return {
+            **self.counters,
+            'false_positive_rate': (checks - self.counters['blacklisted']) / checks if checks else 0.0,
+            'filter_entries': self.bloom.count if self.bloom is not None else 0,
+            'filter_bytes': len(self.bloom.bits) if self.bloom is not None else 0,
+            'latency': summarize(list(self.latencies)),
+        }
+
+
+blacklist_filter = BlacklistFilter()
+
+
+def announce_blacklisted(jti):
+    """Add a committed blacklisting to this process's filter and tell the others to sync."""
+    blacklist_filter.add(jti)
+    bump_counter(EPOCH_KEY)
+
+
+def table_sizes():
+    now = aware_utcnow()
+    return {
+        'outstanding': OutstandingToken.objects.count(),
+        'blacklisted': BlacklistedToken.objects.count(),
+        'expired': OutstandingToken.objects.filter(expires_at__lte=now).count(),
+    }
+
+
+def purge_expired_tokens(batch_size=5000, before=None):
+    """Delete expired outstanding tokens (and their blacklist rows) a batch at a time.
+
+    Short batches keep each transaction's locks brief on a busy table.
+    Expired tokens fail their ``exp`` check anyway, so dropping them never
+    un-revokes anything.
+    """
+    before = before or aware_utcnow()
+    purged = 0
+    while True:
+        ids = list(
+            OutstandingToken.objects.filter(expires_at__lte=before).order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return purged
+        BlacklistedToken.objects.filter(token_id__in=ids).delete()
+        OutstandingToken.objects.filter(id__in=ids).delete()
+        purged += len(ids)
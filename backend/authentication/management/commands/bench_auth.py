@@ -0,0 +1,43 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+
+from authentication.authentication import CachedJWTAuthentication
+from authentication.views import ProfileView
+from unipath_backend.benchmarking import format_stats, measure, scratch_database, without_throttling
+
+
+class Command(BaseCommand):
+    help = 'Compare authenticated request throughput with database-backed and cached JWT authentication'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--repeat', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        # A single process, so its local-memory cache counts as shared.
+        with scratch_database(), without_throttling(), override_settings(CACHE_SHARED=True):
+            users = [
+                User.objects.create_user(username=f'bench{number}', password='bench-pass-123')
+                for number in range(options['users'])
+            ]
+            clients = []
+            for user in users:
+                client = APIClient()
+                client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+                clients.append(client)
+            position = iter(range(10 ** 9))
+
+            def fetch():
+                # Round-robin over the users so the cached run is not a single hot key.
+                response = clients[next(position) % len(clients)].get('/api/v1/auth/profile/')
+                assert response.status_code == 200, response.status_code
+
+            for label, authentication in (('database', JWTAuthentication), ('cached', CachedJWTAuthentication)):
+                with mock.patch.object(ProfileView, 'authentication_classes', [authentication]):
+                    self.stdout.write(format_stats(f'profile ({label})', measure(fetch, options['repeat'])))
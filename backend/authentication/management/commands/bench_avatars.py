@@ -0,0 +1,110 @@
+import io
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy
+from django.contrib.auth.models import User
+from django.core.files.uploadhandler import MemoryFileUploadHandler
+from django.core.management.base import BaseCommand
+from django.http.multipartparser import MultiPartParser
+from django.test import RequestFactory
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.test.utils import override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from authentication.avatars import AvatarUploadHandler, build_variants, wait_for_thumbnails
+from authentication.models import UserProfile
+from unipath_backend.benchmarking import format_stats, measure, scratch_database, summarize, without_throttling
+
+
+def photo(width, height, seed=0):
+    """A noisy JPEG, which compresses about as badly as a real photo."""
+    pixels = numpy.random.default_rng(seed).integers(0, 256, (height, width, 3), dtype=numpy.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, 'JPEG', quality=90)
+    buffer.seek(0)
+    buffer.name = f'photo{seed}.jpg'
+    return buffer
+
+
+def parse_peak(body, handler_class):
+    """Peak Python allocations while parsing the multipart ``body`` with ``handler_class``."""
+    request = RequestFactory().put('/', data=body, content_type=MULTIPART_CONTENT)
+    tracemalloc.start()
+    try:
+        _, files = MultiPartParser(request.META, request, [handler_class(request)]).parse()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    files['avatar'].close()
+    return peak
+
+
+class Command(BaseCommand):
+    help = 'Measure avatar upload memory, thumbnailing throughput and bytes served per profile picture'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--width', type=int, default=3000)
+        parser.add_argument('--height', type=int, default=2000)
+        parser.add_argument('--uploads', type=int, default=8)
+
+    def handle(self, *args, **options):
+        size = (options['width'], options['height'])
+        count = options['uploads']
+        body = encode_multipart(BOUNDARY, {'avatar': photo(*size)})
+        self.stdout.write(f'upload: {size[0]}x{size[1]} JPEG, {len(body) / 1e6:.1f} MB')
+        # Django's default handlers keep files under FILE_UPLOAD_MAX_MEMORY_SIZE in memory.
+        with override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=len(body)):
+            buffered = parse_peak(body, MemoryFileUploadHandler)
+        streamed = parse_peak(body, AvatarUploadHandler)
+        self.stdout.write(f'peak memory while parsing: in memory {buffered / 1e6:.1f} MB, streamed {streamed / 1e6:.2f} MB')
+
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            names = []
+            os.makedirs(os.path.join(media_root, 'bench'))
+            for seed in range(count):
+                names.append(f'bench/{seed}.jpg')
+                with open(os.path.join(media_root, names[-1]), 'wb') as stream:
+                    stream.write(photo(*size, seed).getvalue())
+            started = time.perf_counter()
+            for name in names:
+                build_variants(name)
+            inline = time.perf_counter() - started
+            for name in os.listdir(os.path.join(media_root, 'bench')):
+                if name.endswith('.webp'):
+                    os.remove(os.path.join(media_root, 'bench', name))
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                list(pool.map(build_variants, names))
+            pooled = time.perf_counter() - started
+            self.stdout.write(f'thumbnails: inline {count / inline:.1f} uploads/s, 2 threads {count / pooled:.1f} uploads/s')
+            shutil.rmtree(os.path.join(media_root, 'bench'))
+
+            with scratch_database(), without_throttling():
+                user = User.objects.create_user(username='bench')
+                client = APIClient()
+                client.force_authenticate(user)
+                for workers in (0, 2):
+                    samples = []
+                    with override_settings(AVATAR_THUMBNAIL_WORKERS=workers):
+                        for seed in range(count):
+                            upload = photo(*size, seed=(workers + 1) * 1000 + seed)
+                            started = time.perf_counter()
+                            response = client.put('/api/v1/auth/profile/avatar/', {'avatar': upload}, format='multipart')
+                            samples.append(time.perf_counter() - started)
+                            assert response.status_code == 202, response.data
+                            # Only the response is timed; with workers the thumbnails are built after it.
+                            wait_for_thumbnails()
+                    self.stdout.write(format_stats(f'PUT avatar/, {workers} workers', summarize(samples)))
+
+                profile = UserProfile.objects.get(user=user)
+                original = b''.join(client.get(f'/media/{profile.avatar.name}').streaming_content)
+                url = f"/media/{profile.avatar_variants['128']}"
+                thumbnail = b''.join(client.get(url).streaming_content)
+                self.stdout.write(f'bytes per profile picture: original {len(original)}, 128px WebP {len(thumbnail)}')
+                self.stdout.write(format_stats('GET media/ 128px WebP', measure(lambda: client.get(url), 200)))
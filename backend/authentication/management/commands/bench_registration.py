@@ -0,0 +1,76 @@
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+
+from authentication.onboarding import import_students
+from unipath_backend.benchmarking import scratch_database, without_throttling
+
+WRITES = ('INSERT', 'UPDATE', 'DELETE')
+
+
+def legacy_register(number, password):
+    """The previous pipeline: create, set the password, save again, each save also saving the profile."""
+    user = User.objects.create(username=f'legacy{number}', email=f'legacy{number}@example.com')
+    user.userprofile.save()
+    user.set_password(password)
+    user.save()
+    user.userprofile.save()
+
+
+def count_writes(func):
+    with CaptureQueriesContext(connection) as queries:
+        func()
+    return sum(1 for query in queries if query['sql'].lstrip().upper().startswith(WRITES))
+
+
+class Command(BaseCommand):
+    help = 'Measure registrations per second, writes per registration and bulk onboarding throughput'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--registrations', type=int, default=200)
+        parser.add_argument('--students', type=int, default=20000)
+        parser.add_argument('--fast-hasher', action='store_true',
+                            help='Hash with MD5 to isolate the write path from password hashing.')
+
+    def handle(self, *args, **options):
+        fast = {'PASSWORD_HASHERS': ['django.contrib.auth.hashers.MD5PasswordHasher']}
+        with scratch_database(), without_throttling(), override_settings(**(fast if options['fast_hasher'] else {})):
+            self.stdout.write(f'database: {connection.vendor}, hasher: {make_password("x").split("$")[0]}')
+            client = APIClient()
+            password = 'Correct-Horse-42'
+
+            def register(number):
+                response = client.post('/api/v1/auth/register/', {
+                    'username': f'student{number}', 'email': f'student{number}@example.com',
+                    'password': password, 'password2': password,
+                })
+                assert response.status_code == 201, response.data
+
+            self.stdout.write(
+                f'writes per registration: before {count_writes(lambda: legacy_register(0, password))}, '
+                f'now {count_writes(lambda: register(0))}'
+            )
+            started = time.perf_counter()
+            for number in range(1, options['registrations'] + 1):
+                register(number)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"POST register/: {options['registrations'] / elapsed:.1f} registrations/s")
+
+            for label, hashed in (('deferred passwords', ''), ('pre-hashed passwords', make_password(password))):
+                rows = [
+                    (number, {'username': f'{label[:3]}{number}', 'email': f'{label[:3]}{number}@example.com',
+                              'password': hashed, 'student_id': f'{label[:3]}{number}', 'year': 1})
+                    for number in range(options['students'])
+                ]
+                reports = []
+                writes = count_writes(lambda: reports.append(import_students(rows)))
+                report = reports[0]
+                self.stdout.write(
+                    f'import_students, {label}: {report.rows_per_second:.0f} students/s, '
+                    f'{writes} INSERT statements for {report.created} students'
+                )
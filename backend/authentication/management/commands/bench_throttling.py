@@ -0,0 +1,47 @@
+import pickle
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from rest_framework import throttling
+
+from unipath_backend.throttling import UserRateThrottle
+
+
+class Command(BaseCommand):
+    help = "Compare DRF's timestamp-list throttle with the fixed-window counter throttle"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--requests', type=int, default=1000, help='Requests per user, all within the limit.')
+
+    def handle(self, *args, **options):
+        users, per_user = options['users'], options['requests']
+        requests = []
+        for user_id in range(1, users + 1):
+            request = RequestFactory().get('/')
+            request.user = SimpleNamespace(pk=user_id, is_authenticated=True)
+            requests.append(request)
+        rates = {'user': f'{per_user}/hour'}
+        for label, throttle_class in (('DRF UserRateThrottle', throttling.UserRateThrottle),
+                                      ('fixed window', UserRateThrottle)):
+            cache.clear()
+            with mock.patch.object(throttling.SimpleRateThrottle, 'THROTTLE_RATES', rates):
+                started = time.perf_counter()
+                for _ in range(per_user):
+                    for request in requests:
+                        assert throttle_class().allow_request(request, None)
+                elapsed = time.perf_counter() - started
+                # What one user's entry costs to store and to send on every request.
+                key = throttle_class().get_cache_key(requests[0], None)
+                if throttle_class is UserRateThrottle:
+                    key = f'{key}:{int(time.time() // 3600)}'
+                size = len(pickle.dumps(cache.get(key), pickle.HIGHEST_PROTOCOL))
+            self.stdout.write(
+                f'{label:<22} {users * per_user / elapsed:>10.0f} checks/s, '
+                f'{elapsed / (users * per_user) * 1e6:.1f}us per check, {size} bytes per user'
+            )
+        cache.clear()
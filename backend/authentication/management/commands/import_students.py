@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from authentication.onboarding import COLUMNS, StudentImportError, import_students
+from courses.importer import CatalogImportError, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        'Create student accounts and profiles from CSV, JSON Lines, JSON or XLSX with the columns: '
+        + ', '.join(COLUMNS) + '. Passwords must be pre-hashed; blank ones are left unusable.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl', 'json', 'xlsx'], help='Defaults to the file extension.')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Students written per transaction.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per INSERT statement.')
+
+    def handle(self, *args, **options):
+        try:
+            report = import_students(
+                read_rows(options['path'], options['format']),
+                chunk_size=options['chunk_size'], batch_size=options['batch_size'],
+            )
+        except (StudentImportError, CatalogImportError) as error:
+            for message in error.errors[:50]:
+                self.stderr.write(message)
+            raise CommandError(f'Import aborted: {error}')
+        except (OSError, ValueError) as error:
+            raise CommandError(f'Could not read {options["path"]}: {error}')
+
+        self.stdout.write(f'created: {report.created}, skipped existing usernames: {report.skipped}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {report.rows} rows in {report.seconds:.2f}s ({report.rows_per_second:.0f} rows/s).'
+        ))
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from authentication.blacklist import purge_expired_tokens, table_sizes
+
+
+class Command(BaseCommand):
+    help = 'Delete expired outstanding and blacklisted refresh tokens in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        before = table_sizes()
+        start = time.perf_counter()
+        purged = purge_expired_tokens(batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - start
+        after = table_sizes()
+        self.stdout.write(
+            f"outstanding {before['outstanding']} -> {after['outstanding']}, "
+            f"blacklisted {before['blacklisted']} -> {after['blacklisted']}"
+        )
+        self.stdout.write(self.style.SUCCESS(f'Purged {purged} expired tokens in {elapsed:.2f}s.'))
@@ -10,6 +10,8 @@ class UserProfile(models.Model):
     year = models.IntegerField(blank=True, null=True)
     phone = models.CharField(max_length=15, blank=True)
     avatar = models.ImageField(upload_to='avatars/', blank=True, null=True)
+    # {"<size>": "<storage name>"} of the square WebP thumbnails, filled in once they are built.
+    avatar_variants = models.JSONField(default=dict, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -18,9 +20,6 @@ class UserProfile(models.Model):
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
+    # Only a new user needs a row; later user saves (logins, renames) leave the profile alone.
     if created:
         UserProfile.objects.create(user=instance)
-
-@receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    instance.userprofile.save()
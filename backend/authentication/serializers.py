@@ -1,21 +1,47 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer, TokenVerifySerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import UntypedToken
+from unipath_backend.metrics import TimedSerializerMixin
+from .authentication import load_user
+from .blacklist import blacklist_filter
 from .models import UserProfile
+from .tokens import FilteredRefreshToken
+
+class UserProfileSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    avatar_variants = serializers.SerializerMethodField()
 
-class UserProfileSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserProfile
-        fields = ['student_id', 'major', 'year', 'phone', 'avatar', 'created_at', 'updated_at']
+        fields = ['student_id', 'major', 'year', 'phone', 'avatar', 'avatar_variants', 'created_at', 'updated_at']
+
+    def get_avatar_variants(self, profile):
+        # {"64": url, ...}; empty until the thumbnails of the current avatar are built.
+        request = self.context.get('request')
+        urls = {size: default_storage.url(name) for size, name in profile.avatar_variants.items()}
+        return {size: request.build_absolute_uri(url) for size, url in urls.items()} if request else urls
+
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    profile = UserProfileSerializer(source='userprofile', read_only=True)
 
-class UserSerializer(serializers.ModelSerializer):
-    profile = UserProfileSerializer(read_only=True)
-    
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 'profile']
 
+    def update(self, instance, validated_data):
+        changed = [name for name, value in validated_data.items() if getattr(instance, name) != value]
+        for name in changed:
+            setattr(instance, name, validated_data[name])
+        if changed:
+            instance.save(update_fields=changed)
+        return instance
+
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True, validators=[validate_password])
     password2 = serializers.CharField(write_only=True, required=True)
@@ -30,20 +56,54 @@ class RegisterSerializer(serializers.ModelSerializer):
         return attrs
 
     def create(self, validated_data):
-        user = User.objects.create(
+        user = User(
             username=validated_data['username'],
             email=validated_data['email'],
             first_name=validated_data.get('first_name', ''),
             last_name=validated_data.get('last_name', ''),
         )
         user.set_password(validated_data['password'])
-        user.save()
+        # One INSERT for the user and one for the profile its post_save creates.
+        with transaction.atomic():
+            user.save()
         return user
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = FilteredRefreshToken
+
     @classmethod
     def get_token(cls, user):
         token = super().get_token(user)
         token['username'] = user.username
         token['email'] = user.email
         return token
+
+class FilteredTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = FilteredRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        user_id = refresh.payload.get(api_settings.USER_ID_CLAIM)
+        if user_id is not None:
+            user = load_user(user_id)
+            if not api_settings.USER_AUTHENTICATION_RULE(user):
+                raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+
+        data = {'access': str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.blacklist()
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            refresh.outstand()
+            data['refresh'] = str(refresh)
+        return data
+
+class FilteredTokenVerifySerializer(TokenVerifySerializer):
+    def validate(self, attrs):
+        token = UntypedToken(attrs['token'])
+        jti = token.get(api_settings.JTI_CLAIM)
+        if api_settings.BLACKLIST_AFTER_ROTATION and jti and blacklist_filter.is_blacklisted(jti):
+            raise serializers.ValidationError(_('Token is blacklisted'))
+        return {}
@@ -0,0 +1,43 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from .authentication import invalidate_user
+from .blacklist import announce_blacklisted
+from .models import UserProfile
+
+
+def invalidate_cached_user(user_id):
+    if user_id is not None:
+        transaction.on_commit(lambda: invalidate_user(user_id))
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_on_save(sender, instance, created, **kwargs):
+    if created:
+        # A new row can only collide with entries left behind by a deleted
+        # user whose id was reused, so there is no commit to wait for.
+        invalidate_user(instance.pk)
+    else:
+        invalidate_cached_user(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def invalidate_user_on_delete(sender, instance, **kwargs):
+    invalidate_cached_user(instance.pk)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_user_on_profile_change(sender, instance, **kwargs):
+    invalidate_cached_user(instance.user_id)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def announce_blacklisted_token(sender, instance, created, **kwargs):
+    if created:
+        jti = instance.token.jti
+        transaction.on_commit(lambda: announce_blacklisted(jti))
+        invalidate_cached_user(instance.token.user_id)
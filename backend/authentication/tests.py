@@ -1,3 +1,404 @@
-from django.test import TestCase
+import csv
+import importlib
+import io
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User, update_last_login
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import Resolver404, clear_url_caches, resolve
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from unipath_backend import urls
+from unipath_backend.cache import cache_settings
+from unipath_backend.throttling import FixedWindowRateThrottle
+
+from .authentication import local_users
+from .blacklist import BloomFilter, blacklist_filter, purge_expired_tokens, table_sizes
+from .models import UserProfile
+from .onboarding import StudentImportError, import_students
+
+
+def writes(queries):
+    statements = [query['sql'].split()[0].upper() for query in queries]
+    return [statement for statement in statements if statement in ('INSERT', 'UPDATE')]
+
+
+@override_settings(CACHE_SHARED=True)
+class CachedJWTAuthenticationTests(APITestCase):
+    url = '/api/v1/auth/profile/'
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='student', password='secret-pass-123', first_name='Sara')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def test_repeat_requests_skip_the_database(self):
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data['username'], 'student')
+        self.assertIn('major', response.data['profile'])
+
+    def test_shared_cache_serves_other_processes(self):
+        self.client.get(self.url)
+        local_users.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_user_changes_invalidate_the_cache(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(self.url, {'first_name': 'Maryam'})
+        self.assertEqual(response.data['first_name'], 'Maryam')
+        self.assertEqual(self.client.get(self.url).data['first_name'], 'Maryam')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.userprofile.major = 'Physics'
+            self.user.userprofile.save()
+        self.assertEqual(self.client.get(self.url).data['profile']['major'], 'Physics')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_blacklisting_a_token_invalidates_the_cache(self):
+        self.client.get(self.url)
+        self.assertIsNotNone(local_users.get(str(self.user.pk)))
+        with self.captureOnCommitCallbacks(execute=True):
+            RefreshToken.for_user(self.user).blacklist()
+        self.assertIsNone(local_users.get(str(self.user.pk)))
+
+    def test_without_a_shared_cache_every_request_reads_the_user(self):
+        self.client.get(self.url)
+        with override_settings(CACHE_SHARED=None):
+            # Another worker deactivates the user; this process's cache never hears of it.
+            User.objects.filter(pk=self.user.pk).update(is_active=False)
+            self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_mutating_the_request_user_does_not_leak(self):
+        first = self.client.get(self.url).wsgi_request.user
+        first.first_name = 'Changed'
+        self.assertEqual(self.client.get(self.url).data['first_name'], 'Sara')
+
+
+    def test_async_profile(self):
+        url = '/api/v1/auth/async/profile/'
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.data, self.client.get(self.url).data)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(url, {'last_name': 'Karimi'}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(User.objects.get(pk=self.user.pk).last_name, 'Karimi')
+        self.assertEqual(self.client.get(url).data['last_name'], 'Karimi')
+        self.client.credentials()
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+
+class TokenBlacklistTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='student', password='secret-pass-123')
+
+    def login(self):
+        response = self.client.post('/api/v1/auth/login/', {'username': 'student', 'password': 'secret-pass-123'})
+        self.assertEqual(response.status_code, 200)
+        return response.data['refresh']
+
+    def refresh(self, token):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/api/v1/auth/token/refresh/', {'refresh': token})
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = BloomFilter(1000, error_rate=0.01)
+        for number in range(1000):
+            bloom.add(f'jti-{number}')
+        self.assertTrue(all(f'jti-{number}' in bloom for number in range(1000)))
+        false_positives = sum(f'other-{number}' in bloom for number in range(10000))
+        self.assertLess(false_positives, 300)
+
+    def test_rotated_refresh_tokens_are_rejected(self):
+        first = self.login()
+        response = self.refresh(first)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.refresh(response.data['refresh']).status_code, 200)
+        self.assertEqual(self.refresh(first).status_code, 401)
+
+        verify = self.client.post('/api/v1/auth/token/verify/', {'token': first})
+        self.assertEqual(verify.status_code, 400)
+
+    @override_settings(CACHE_SHARED=True)
+    def test_lookups_of_live_tokens_skip_the_blacklist_table(self):
+        token = self.login()
+        self.refresh(self.login())
+        blacklist_filter.sync()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/v1/auth/token/verify/', {'token': token})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([query for query in queries if 'blacklistedtoken' in query['sql']])
+
+    def test_without_a_shared_cache_every_lookup_reads_the_blacklist(self):
+        first = self.login()
+        with override_settings(CACHE_SHARED=True):
+            self.assertEqual(self.client.post('/api/v1/auth/token/verify/', {'token': first}).status_code, 200)
+        # Another worker rotates the token; the epoch it bumps lives in that worker's cache only.
+        with mock.patch('authentication.blacklist.bump_counter'), self.captureOnCommitCallbacks(execute=True):
+            RefreshToken(first).blacklist()
+        # This worker's filter never heard of it.
+        blacklist_filter.bloom = BloomFilter(blacklist_filter.capacity())
+        self.addCleanup(setattr, blacklist_filter, 'bloom', None)
+        self.assertEqual(self.refresh(first).status_code, 401)
+
+    def test_purge_removes_only_expired_tokens(self):
+        self.refresh(self.login())
+        self.login()
+        OutstandingToken.objects.filter(pk__in=OutstandingToken.objects.order_by('id')[:2].values('pk')).update(
+            expires_at=timezone.now() - timedelta(days=1)
+        )
+        self.assertEqual(purge_expired_tokens(batch_size=1), 2)
+        self.assertEqual(table_sizes(), {'outstanding': 1, 'blacklisted': 0, 'expired': 0})
+
+    def test_stats_require_staff(self):
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get('/api/v1/auth/token/blacklist/stats/').status_code, 403)
+        self.user.is_staff = True
+        self.assertEqual(self.client.get('/api/v1/auth/token/blacklist/stats/').data['tables']['outstanding'], 0)
+
+
+class RegistrationTests(APITestCase):
+    def test_registration_writes_user_and_profile_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/v1/auth/register/', {
+                'username': 'newstudent', 'email': 'new@example.com',
+                'password': 'Correct-Horse-42', 'password2': 'Correct-Horse-42',
+            })
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(writes(queries), ['INSERT', 'INSERT'])
+        user = User.objects.get(username='newstudent')
+        self.assertTrue(user.check_password('Correct-Horse-42'))
+        self.assertTrue(UserProfile.objects.filter(user=user).exists())
+
+    def test_user_saves_leave_the_profile_alone(self):
+        user = User.objects.create_user(username='student', password='secret-pass-123', first_name='Sara')
+        with CaptureQueriesContext(connection) as queries:
+            update_last_login(None, user)
+        self.assertEqual(writes(queries), ['UPDATE'])
+        self.assertNotIn('userprofile', queries[0]['sql'])
+
+        self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.patch('/api/v1/auth/profile/', {'first_name': 'Sara'})
+        self.assertEqual(writes(queries), [])
+        with CaptureQueriesContext(connection) as queries:
+            self.client.patch('/api/v1/auth/profile/', {'first_name': 'Maryam', 'last_name': ''})
+        self.assertEqual(writes(queries), ['UPDATE'])
+        update = next(query['sql'] for query in queries if query['sql'].startswith('UPDATE'))
+        self.assertIn('first_name', update)
+        self.assertNotIn('last_name', update)
+        self.assertEqual(User.objects.get(pk=user.pk).first_name, 'Maryam')
+
+
+class StudentImportTests(APITestCase):
+    def rows(self, count, **extra):
+        return [
+            (number, {'username': f'student{number}', 'email': f'student{number}@example.com',
+                      'student_id': f'S{number:05}', 'major': 'Physics', 'year': '2', **extra})
+            for number in range(count)
+        ]
+
+    def test_import_creates_users_and_profiles_in_bulk(self):
+        hashed = make_password('Correct-Horse-42')
+        with CaptureQueriesContext(connection) as queries:
+            report = import_students(self.rows(25, password=hashed), chunk_size=10)
+        self.assertEqual((report.created, report.skipped), (25, 0))
+        # One INSERT of users and one of profiles per chunk.
+        self.assertEqual(writes(queries).count('INSERT'), 6)
+        user = User.objects.select_related('userprofile').get(username='student7')
+        self.assertTrue(user.check_password('Correct-Horse-42'))
+        self.assertEqual((user.userprofile.student_id, user.userprofile.year), ('S00007', 2))
+
+        # Running it again only adds the new students; blank passwords stay unusable.
+        report = import_students(self.rows(30, password=''))
+        self.assertEqual((report.created, report.skipped), (5, 25))
+        self.assertFalse(User.objects.get(username='student29').has_usable_password())
+        self.assertEqual(UserProfile.objects.filter(user__username__startswith='student').count(), 30)
+
+    def test_invalid_rows_abort_the_import(self):
+        rows = self.rows(3, password='plain-text')
+        rows.append((4, {'username': 'student0'}))
+        rows.append((5, {'username': 'bad name!', 'email': 'nope', 'year': 'first'}))
+        with self.assertRaises(StudentImportError) as raised:
+            import_students(rows)
+        self.assertEqual(len(raised.exception.errors), 5)
+        self.assertIn('row 4: username', raised.exception.errors[3])
+        self.assertFalse(User.objects.filter(username__startswith='student').exists())
+
+        UserProfile.objects.filter(user=User.objects.create_user(username='existing')).update(student_id='S00001')
+        with self.assertRaisesMessage(StudentImportError, '1 invalid rows'):
+            import_students(self.rows(3))
+
+    def test_command_reads_csv(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'students.csv')
+            with open(path, 'w', newline='') as stream:
+                writer = csv.DictWriter(stream, fieldnames=['username', 'email', 'student_id', 'major', 'year'])
+                writer.writeheader()
+                writer.writerows(record for _, record in self.rows(4))
+            call_command('import_students', path, stdout=open(os.devnull, 'w'))
+        self.assertEqual(User.objects.filter(username__startswith='student').count(), 4)
+
+
+def image_file(name='photo.jpg', size=(640, 480), color='teal', image_format='JPEG'):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, image_format)
+    buffer.seek(0)
+    buffer.name = name
+    return buffer
+
+
+class AvatarTests(APITestCase):
+    url = '/api/v1/auth/profile/avatar/'
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.media_root = directory.name
+        media = override_settings(MEDIA_ROOT=self.media_root, AVATAR_THUMBNAIL_WORKERS=0)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.user = User.objects.create_user(username='student', password='secret-pass-123')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def upload(self, upload):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.put(self.url, {'avatar': upload}, format='multipart')
+
+    def stored(self):
+        return sorted(
+            os.path.relpath(os.path.join(root, name), self.media_root)
+            for root, _, names in os.walk(self.media_root) for name in names
+        )
+
+    def test_upload_builds_square_webp_variants(self):
+        response = self.upload(image_file())
+        self.assertEqual(response.status_code, 202)
+        profile = UserProfile.objects.get(user=self.user)
+        self.assertEqual(sorted(profile.avatar_variants, key=int), ['64', '128', '256'])
+        for size, name in profile.avatar_variants.items():
+            with Image.open(os.path.join(self.media_root, name)) as image:
+                self.assertEqual((image.format, image.size), ('WEBP', (int(size), int(size))))
+
+        variants = self.client.get('/api/v1/auth/profile/').data['profile']['avatar_variants']
+        self.assertEqual(variants['128'], f'http://testserver/media/{profile.avatar_variants["128"]}')
+        response = self.client.get(variants['128'])
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(response['Content-Type'], 'image/webp')
+
+    def test_replacing_and_removing_delete_old_files(self):
+        self.upload(image_file())
+        first = self.stored()
+        self.assertEqual(len(first), 4)
+        self.upload(image_file(name='other.png', color='navy', image_format='PNG'))
+        second = self.stored()
+        self.assertEqual(len(second), 4)
+        self.assertFalse(set(first) & set(second))
+        self.assertTrue(UserProfile.objects.get(user=self.user).avatar.name.endswith('.png'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.delete(self.url).status_code, 204)
+        self.assertEqual(self.stored(), [])
+        profile = UserProfile.objects.get(user=self.user)
+        self.assertFalse(profile.avatar)
+        self.assertEqual(profile.avatar_variants, {})
+
+    def test_rejects_invalid_and_oversized_uploads(self):
+        fake = io.BytesIO(b'not an image')
+        fake.name = 'photo.jpg'
+        self.assertEqual(self.upload(fake).status_code, 400)
+        self.assertEqual(self.client.put(self.url, {}, format='multipart').status_code, 400)
+        with override_settings(AVATAR_MAX_UPLOAD_SIZE=1024):
+            response = self.upload(image_file(size=(512, 512)))
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(UserProfile.objects.get(user=self.user).avatar)
+
+        response = self.client.put(
+            self.url, b'', content_type='multipart/form-data; boundary=x', CONTENT_LENGTH='lots',
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_only_content_addressed_files_are_immutable(self):
+        os.makedirs(os.path.join(self.media_root, 'avatars'))
+        with open(os.path.join(self.media_root, 'avatars', 'photo.jpg'), 'wb') as legacy:
+            legacy.write(image_file().getvalue())
+        response = self.client.get('/media/avatars/photo.jpg')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Cache-Control'))
+
+    def test_media_is_only_routed_when_enabled(self):
+        self.addCleanup(clear_url_caches)
+        self.addCleanup(importlib.reload, urls)
+        with override_settings(SERVE_MEDIA=False):
+            importlib.reload(urls)
+            clear_url_caches()
+            self.assertEqual(self.client.get('/media/avatars/photo.jpg').status_code, 404)
+            self.assertRaises(Resolver404, resolve, '/media/avatars/photo.jpg')
+
+
+class ThrottleTests(APITestCase):
+    rates = {'anon': '100/hour', 'user': '1000/hour', 'register': '2/hour', 'login': '3/minute', 'enrollment': '60/minute'}
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        rates = mock.patch.object(FixedWindowRateThrottle, 'THROTTLE_RATES', self.rates)
+        rates.start()
+        self.addCleanup(rates.stop)
+
+    def register(self, number):
+        return self.client.post('/api/v1/auth/register/', {
+            'username': f'student{number}', 'email': f'student{number}@example.com',
+            'password': 'Correct-Horse-42', 'password2': 'Correct-Horse-42',
+        })
+
+    @mock.patch.object(FixedWindowRateThrottle, 'timer', return_value=7300.0)
+    def test_register_and_login_have_their_own_limits(self, timer):
+        self.assertEqual([self.register(number).status_code for number in range(3)], [201, 201, 429])
+        self.assertEqual(self.register(3)['Retry-After'], '3500')
+        statuses = [
+            self.client.post('/api/v1/auth/login/', {'username': 'student0', 'password': 'Correct-Horse-42'}).status_code
+            for _ in range(4)
+        ]
+        self.assertEqual(statuses, [200, 200, 200, 429])
+        # One integer per client and window, whatever the number of requests.
+        self.assertEqual(cache.get('throttle_register_127.0.0.1:2'), 4)
+
+    def test_counts_reset_with_the_window(self):
+        class Throttle(FixedWindowRateThrottle):
+            rate = '2/minute'
+
+            def get_cache_key(self, request, view):
+                return 'throttle_test_1'
+
+        throttle = Throttle()
+        with mock.patch.object(FixedWindowRateThrottle, 'timer', side_effect=[600, 610, 615, 659, 660]):
+            self.assertEqual([throttle.allow_request(None, None) for _ in range(4)], [True, True, False, False])
+            self.assertEqual(throttle.wait(), 1)
+            self.assertTrue(throttle.allow_request(None, None))
+
+    def test_cache_settings(self):
+        self.assertEqual(cache_settings({})['default']['BACKEND'], 'django.core.cache.backends.locmem.LocMemCache')
+        default = cache_settings({'REDIS_URL': 'redis://primary:6379/0,redis://replica:6379/0'})['default']
+        self.assertEqual(default['BACKEND'], 'django.core.cache.backends.redis.RedisCache')
+        self.assertEqual(default['LOCATION'], ['redis://primary:6379/0', 'redis://replica:6379/0'])
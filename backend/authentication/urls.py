@@ -1,11 +1,13 @@
 from django.urls import path
-from rest_framework_simplejwt.views import TokenRefreshView, TokenVerifyView
 from . import views
 
 urlpatterns = [
     path('register/', views.RegisterView.as_view(), name='register'),
     path('login/', views.CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
-    path('token/verify/', TokenVerifyView.as_view(), name='token_verify'),
+    path('token/refresh/', views.FilteredTokenRefreshView.as_view(), name='token_refresh'),
+    path('token/verify/', views.FilteredTokenVerifyView.as_view(), name='token_verify'),
+    path('token/blacklist/stats/', views.TokenBlacklistStatsView.as_view(), name='token_blacklist_stats'),
     path('profile/', views.ProfileView.as_view(), name='profile'),
+    path('profile/avatar/', views.AvatarView.as_view(), name='profile_avatar'),
+    path('async/profile/', views.AsyncProfileView.as_view(), name='async_profile'),
 ]
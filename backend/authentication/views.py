@@ -1,15 +1,29 @@
 from rest_framework import generics, status
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.views import APIView
-from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView, TokenVerifyView
+from asgiref.sync import sync_to_async
 from django.contrib.auth.models import User
-from .serializers import RegisterSerializer, UserSerializer, CustomTokenObtainPairSerializer
+from unipath_backend.async_views import AsyncAPIView
+from unipath_backend.throttling import AnonRateThrottle, LoginRateThrottle, RegisterRateThrottle
+from .avatars import AvatarUploadHandler, InvalidAvatar, max_upload_size, remove_avatar, save_avatar
+from .blacklist import blacklist_filter, table_sizes
+from .serializers import (
+    CustomTokenObtainPairSerializer, FilteredTokenRefreshSerializer, FilteredTokenVerifySerializer, RegisterSerializer,
+    UserProfileSerializer, UserSerializer,
+)
+from .models import UserProfile
+
+# Room for the multipart boundaries and headers around the image itself.
+MULTIPART_OVERHEAD = 64 * 1024
 
 class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
     permission_classes = [AllowAny]
     serializer_class = RegisterSerializer
+    throttle_classes = [AnonRateThrottle, RegisterRateThrottle]
 
 class ProfileView(generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializer
@@ -18,5 +32,72 @@ class ProfileView(generics.RetrieveUpdateAPIView):
     def get_object(self):
         return self.request.user
 
+class AsyncProfileView(AsyncAPIView):
+    permission_classes = [IsAuthenticated]
+
+    async def get(self, request):
+        # The authenticated user comes from the user cache with its profile attached.
+        return Response(UserSerializer(request.user, context={'request': request}).data)
+
+    async def put(self, request, partial=False):
+        serializer = UserSerializer(request.user, data=request.data, partial=partial, context={'request': request})
+        await sync_to_async(serializer.is_valid)(raise_exception=True)
+        await sync_to_async(serializer.save)()
+        return Response(serializer.data)
+
+    async def patch(self, request):
+        return await self.put(request, partial=True)
+
+class AvatarView(APIView):
+    """PUT a multipart ``avatar`` file to replace the avatar; thumbnails follow in the background."""
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser]
+
+    def too_large(self):
+        return Response(
+            {'avatar': [f'Upload at most {max_upload_size()} bytes.']}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        )
+
+    def put(self, request):
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            return Response({'detail': 'Invalid Content-Length header.'}, status=status.HTTP_400_BAD_REQUEST)
+        if length > max_upload_size() + MULTIPART_OVERHEAD:
+            return self.too_large()
+        handler = AvatarUploadHandler(request._request)
+        # Before request.data is touched, so the body is spooled to disk instead of read into memory.
+        request.upload_handlers = [handler]
+        upload = request.FILES.get('avatar')
+        if handler.too_large:
+            return self.too_large()
+        if upload is None:
+            return Response({'avatar': ['No file was submitted.']}, status=status.HTTP_400_BAD_REQUEST)
+        profile = UserProfile.objects.get(user_id=request.user.pk)
+        try:
+            save_avatar(profile, upload)
+        except InvalidAvatar as error:
+            return Response({'avatar': [str(error)]}, status=status.HTTP_400_BAD_REQUEST)
+        finally:
+            upload.close()
+        return Response(UserProfileSerializer(profile, context={'request': request}).data, status=status.HTTP_202_ACCEPTED)
+
+    def delete(self, request):
+        remove_avatar(UserProfile.objects.get(user_id=request.user.pk))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
+    throttle_classes = [AnonRateThrottle, LoginRateThrottle]
+
+class FilteredTokenRefreshView(TokenRefreshView):
+    serializer_class = FilteredTokenRefreshSerializer
+
+class FilteredTokenVerifyView(TokenVerifyView):
+    serializer_class = FilteredTokenVerifySerializer
+
+class TokenBlacklistStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({'tables': table_sizes(), 'filter': blacklist_filter.stats()})
@@ -0,0 +1,277 @@
+"""
+Batch writes of sections and meeting times for timetable tooling.
+
+A batch is validated as a whole against the database state it will
+produce and written with bulk queries, both in one transaction. Batches
+take turns, and the rows a batch names are locked, so what was validated
+is still true when it is written. Writes that bypass model signals log
+their changes with ``record_changes``; deletes go through the ORM so their
+signals still fire.
+"""
+from django.db import IntegrityError, connection, transaction
+from django.db.models.functions import Lower, Trim
+
+from .changes import record_changes
+from .clashes import invalidate_clashes, overlapping_pairs, resource_key, update_clashes
+from .models import Course, Section, SectionTime
+
+
+# Key of the PostgreSQL advisory lock that bulk timetable writers take turns on.
+TIMETABLE_LOCK = 0x74696d65
+
+
+class BulkWriteError(Exception):
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(errors)
+
+
+def _lock_timetable():
+    # Room checks must see every meeting committed by an earlier batch, and a
+    # free room has no row to lock. Elsewhere only the row locks below apply.
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [TIMETABLE_LOCK])
+
+
+def _atomic_batch(write, upserts, deletes):
+    try:
+        with transaction.atomic():
+            _lock_timetable()
+            return write(upserts, set(deletes))
+    except IntegrityError:
+        # Another writer outside the bulk API took a section number or meeting slot first.
+        raise BulkWriteError({'non_field_errors': 'Rows changed while the batch was written; send it again.'})
+
+
+def room_conflicts(slots, replaced_sections=(), replaced_times=()):
+    """Overlaps in the same room on the same day involving at least one of ``slots``.
+
+    ``slots`` are ``(ref, day, start, end, location)`` for the incoming
+    meetings; stored meetings of ``replaced_sections`` and
+    ``replaced_times`` are ignored because the batch rewrites them.
+    """
+    rooms = {}
+    for ref, day, start, end, location in slots:
+        if location.strip():
+            rooms.setdefault((resource_key(location), day), []).append((start, end, ref))
+    if not rooms:
+        return []
+    stored = (
+        SectionTime.objects.annotate(room=Lower(Trim('location')))
+        .filter(room__in={room for room, _ in rooms}, day__in={day for _, day in rooms})
+        .exclude(section_id__in=replaced_sections)
+        .exclude(pk__in=replaced_times)
+        .values_list('id', 'day', 'start_time', 'end_time', 'location')
+    )
+    for time_id, day, start, end, location in stored:
+        key = (resource_key(location), day)
+        if key in rooms:
+            rooms[key].append((start, end, ('section_time', time_id)))
+    conflicts = []
+    for (room, day), room_slots in sorted(rooms.items()):
+        for first, second in overlapping_pairs(room_slots):
+            if first[0] != 'section_time' or second[0] != 'section_time':
+                conflicts.append({'location': room, 'day': day, 'slots': [list(first), list(second)]})
+    return conflicts
+
+
+def _check_ids(model, ids, label, errors):
+    ids = set(ids)
+    known = set(model.objects.select_for_update().filter(pk__in=ids).order_by('pk').values_list('pk', flat=True))
+    if ids - known:
+        errors[label] = f'Unknown ids: {sorted(ids - known)}'
+
+
+def _write_times(section_times, record):
+    """Make each section's meetings exactly ``section_times[section_id]``, keyed on (day, start_time)."""
+    existing = {
+        (section_id, day, start): (time_id, end, location)
+        for time_id, section_id, day, start, end, location in SectionTime.objects.filter(
+            section_id__in=section_times
+        ).values_list('id', 'section_id', 'day', 'start_time', 'end_time', 'location')
+    }
+    wanted = set()
+    changed = []
+    for section_id, times in section_times.items():
+        for item in times:
+            key = (section_id, item['day'], item['start_time'])
+            wanted.add(key)
+            current = existing.get(key)
+            if current is None or current[1:] != (item['end_time'], item.get('location', '')):
+                changed.append(SectionTime(section_id=section_id, **item))
+    SectionTime.objects.filter(pk__in=[existing[key][0] for key in existing.keys() - wanted]).delete()
+    SectionTime.objects.bulk_create(
+        changed, update_conflicts=True, unique_fields=['section', 'day', 'start_time'],
+        update_fields=['end_time', 'location'],
+    )
+    keys = {(time.section_id, time.day, time.start_time) for time in changed}
+    record['section_time'].extend(
+        time_id for time_id, section_id, day, start in SectionTime.objects.filter(
+            section_id__in={key[0] for key in keys}
+        ).values_list('id', 'section_id', 'day', 'start_time')
+        if (section_id, day, start) in keys
+    )
+
+
+def write_sections(upserts, deletes=()):
+    """Create, update and delete sections, replacing the meetings of those that list ``times``.
+
+    Rows are matched on ``id`` when given, otherwise on ``(course,
+    section_number)``. Returns the ids of the written sections in input
+    order.
+    """
+    return _atomic_batch(_write_sections, upserts, deletes)
+
+
+def _write_sections(upserts, deletes):
+    errors = {}
+    given_ids = [row['id'] for row in upserts if row.get('id') is not None]
+    _check_ids(Section, set(given_ids) | deletes, 'ids', errors)
+    _check_ids(Course, {row['course'] for row in upserts}, 'courses', errors)
+    if deletes & set(given_ids):
+        errors['delete'] = f'Sections both updated and deleted: {sorted(deletes & set(given_ids))}'
+    if errors:
+        raise BulkWriteError(errors)
+
+    holders = {
+        (course_id, number): section_id
+        for section_id, course_id, number in Section.objects.filter(
+            course_id__in={row['course'] for row in upserts}
+        ).values_list('id', 'course_id', 'section_number')
+    }
+    moving = set(given_ids) | deletes
+    taken = {key: section_id for key, section_id in holders.items() if section_id not in moving}
+    resolved = []
+    duplicates = []
+    seen = set()
+    for index, row in enumerate(upserts):
+        key = (row['course'], row['section_number'])
+        section_id = row.get('id')
+        if section_id is None:
+            # A row without an id updates the section already holding its number.
+            section_id = taken.get(key)
+        elif taken.get(key, section_id) != section_id:
+            duplicates.append(index)
+        if key in seen:
+            duplicates.append(index)
+        seen.add(key)
+        resolved.append(section_id)
+    if duplicates:
+        raise BulkWriteError({'upsert': f'Rows reuse a section number within a course: {sorted(set(duplicates))}'})
+
+    replaced = [section_id for section_id, row in zip(resolved, upserts) if section_id and 'times' in row]
+    slots = []
+    for index, row in enumerate(upserts):
+        meetings = set()
+        for position, item in enumerate(row.get('times', ())):
+            meeting = (item['day'], item['start_time'])
+            if meeting in meetings:
+                errors.setdefault('times', []).append(f'Row {index} meets twice at {item["day"]} {item["start_time"]}')
+            meetings.add(meeting)
+            slots.append((('upsert', index, position), item['day'], item['start_time'], item['end_time'],
+                          item.get('location', '')))
+    if not errors:
+        conflicts = room_conflicts(slots, replaced_sections=replaced + sorted(deletes))
+        if conflicts:
+            errors['conflicts'] = conflicts
+    if errors:
+        raise BulkWriteError(errors)
+
+    record = {'section': [], 'section_time': []}
+    fields = ['course', 'section_number', 'instructor', 'capacity']
+    Section.objects.filter(pk__in=deletes).delete()
+    sections = [
+        Section(pk=section_id, course_id=row['course'], section_number=row['section_number'],
+                instructor=row['instructor'], capacity=row['capacity'])
+        for section_id, row in zip(resolved, upserts)
+    ]
+    Section.objects.bulk_update([section for section in sections if section.pk], fields)
+    created = Section.objects.bulk_create([section for section in sections if not section.pk])
+    if any(section.pk is None for section in created):
+        # Databases that cannot return ids from a bulk insert.
+        numbers = {
+            (course_id, number): section_id
+            for section_id, course_id, number in Section.objects.filter(
+                course_id__in={section.course_id for section in created}
+            ).values_list('id', 'course_id', 'section_number')
+        }
+        for section in created:
+            section.pk = numbers[section.course_id, section.section_number]
+    resolved = [section.pk for section in sections]
+    record['section'].extend(resolved)
+    _write_times(
+        {section_id: row['times'] for section_id, row in zip(resolved, upserts) if 'times' in row}, record,
+    )
+    for kind, object_ids in record.items():
+        record_changes(kind, object_ids)
+    transaction.on_commit(invalidate_clashes)
+    return resolved
+
+
+def write_section_times(upserts, deletes=()):
+    """Create, update and delete individual meetings; rows are matched on ``id`` or ``(section, day, start_time)``."""
+    return _atomic_batch(_write_section_times, upserts, deletes)
+
+
+def _write_section_times(upserts, deletes):
+    errors = {}
+    given_ids = [row['id'] for row in upserts if row.get('id') is not None]
+    _check_ids(SectionTime, set(given_ids) | deletes, 'ids', errors)
+    _check_ids(Section, {row['section'] for row in upserts}, 'sections', errors)
+    keys = [(row['section'], row['day'], row['start_time']) for row in upserts]
+    if len(set(keys)) != len(keys):
+        errors['upsert'] = 'Rows repeat a section meeting (section, day, start_time).'
+    if errors:
+        raise BulkWriteError(errors)
+
+    holders = {
+        (section_id, day, start): time_id
+        for time_id, section_id, day, start in SectionTime.objects.filter(
+            section_id__in={row['section'] for row in upserts}
+        ).values_list('id', 'section_id', 'day', 'start_time')
+    }
+    moving = set(given_ids) | deletes
+    resolved = []
+    for index, (key, row) in enumerate(zip(keys, upserts)):
+        holder = holders.get(key)
+        if holder in moving and holder != row.get('id'):
+            holder = None
+        if row.get('id') is not None and holder not in (None, row['id']):
+            errors.setdefault('upsert', []).append(f'Row {index} collides with meeting {holder}')
+        resolved.append(row.get('id') or holder)
+    slots = [
+        (('upsert', index), row['day'], row['start_time'], row['end_time'], row.get('location', ''))
+        for index, row in enumerate(upserts)
+    ]
+    if not errors:
+        conflicts = room_conflicts(slots, replaced_times=[time_id for time_id in resolved if time_id] + sorted(deletes))
+        if conflicts:
+            errors['conflicts'] = conflicts
+    if errors:
+        raise BulkWriteError(errors)
+
+    fields = ['section', 'day', 'start_time', 'end_time', 'location']
+    SectionTime.objects.filter(pk__in=deletes).delete()
+    objects = [
+        SectionTime(pk=time_id, section_id=row['section'], day=row['day'], start_time=row['start_time'],
+                    end_time=row['end_time'], location=row.get('location', ''))
+        for time_id, row in zip(resolved, upserts)
+    ]
+    SectionTime.objects.bulk_update([item for item in objects if item.pk], fields)
+    created = SectionTime.objects.bulk_create([item for item in objects if not item.pk])
+    if any(item.pk is None for item in created):
+        # Databases that cannot return ids from a bulk insert.
+        meetings = {
+            (section_id, day, start): time_id
+            for time_id, section_id, day, start in SectionTime.objects.filter(
+                section_id__in={item.section_id for item in created}
+            ).values_list('id', 'section_id', 'day', 'start_time')
+        }
+        for item in created:
+            item.pk = meetings[item.section_id, item.day, item.start_time]
+    resolved = [item.pk for item in objects]
+    record_changes('section_time', resolved)
+    changed = set(resolved) | deletes
+    transaction.on_commit(lambda: update_clashes(changed))
+    return resolved
@@ -0,0 +1,217 @@
+import gzip
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils import timezone
+from unipath_backend.cache import is_shared
+
+from .models import CatalogChange, Course, Section, SectionTime
+from .versioning import bump_counter, read_counter
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+GENERATION_KEY = 'courses:catalog:generation'
+CONTENT_GENERATION_KEY = 'courses:catalog:content-generation'
+SNAPSHOT_KEY = 'courses:catalog:snapshot:{generation}'
+LATEST_SNAPSHOT_KEY = 'courses:catalog:snapshot:latest'
+SNAPSHOT_LOCK_KEY = 'courses:catalog:snapshot:lock'
+SNAPSHOT_TIMEOUT = 60 * 60 * 24
+# Rebuilds happen while clients wait; higher levels cost far more time than they save bytes.
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+COURSE_FIELDS = ('id', 'name', 'units')
+SECTION_FIELDS = ('id', 'course', 'section_number', 'instructor', 'capacity', 'enrolled')
+
+
+def catalog_generation():
+    """Moves with every committed catalog change, seat counts included."""
+    return read_counter(GENERATION_KEY)
+
+
+def content_generation():
+    """Moves with every committed catalog change except seats taken and released."""
+    return read_counter(CONTENT_GENERATION_KEY)
+
+
+def bump_catalog_generation():
+    """Retire cached snapshots and indexes; called once a catalog change has committed."""
+    bump_counter(CONTENT_GENERATION_KEY)
+    return bump_counter(GENERATION_KEY)
+
+
+def bump_seat_generation():
+    """Called once an enrollment or drop has committed; the snapshot carries no seat counts."""
+    return bump_counter(GENERATION_KEY)
+
+
+def settle_time():
+    """Gaps in the change log older than this can no longer be filled by a late commit."""
+    return timezone.now() - timedelta(seconds=getattr(settings, 'CATALOG_CHANGES_SETTLE', 120))
+
+
+def settled_version(cursor, entries, settled):
+    """The last of ``(version, changed_at)`` entries reached from ``cursor`` without crossing a young gap.
+
+    Versions are drawn at insert time but become visible at commit, so a gap
+    may still be filled by a transaction that has not committed yet.
+    """
+    for version, changed_at in entries:
+        if version != cursor + 1 and changed_at > settled:
+            break
+        cursor = version
+    return cursor
+
+
+def latest_change_version():
+    settled = settle_time()
+    base = CatalogChange.objects.filter(changed_at__lte=settled).aggregate(value=Max('version'))['value'] or 0
+    recent = CatalogChange.objects.filter(version__gt=base).order_by('version').values_list('version', 'changed_at')
+    return settled_version(base, recent, settled)
+
+
+def _related_ids(through, course_ids=None):
+    rows = through.objects.order_by('from_course_id', 'to_course_id')
+    if course_ids is not None:
+        rows = rows.filter(from_course_id__in=course_ids)
+    related = {}
+    for course_id, other_id in rows.values_list('from_course_id', 'to_course_id'):
+        related.setdefault(course_id, []).append(other_id)
+    return related
+
+
+def course_rows(queryset=None):
+    """Flat course dicts with prerequisite and corequisite ids, in three queries."""
+    if queryset is None:
+        courses = list(Course.objects.order_by('id').values(*COURSE_FIELDS))
+        course_ids = None
+    else:
+        courses = list(queryset.order_by('id').values(*COURSE_FIELDS))
+        course_ids = [course['id'] for course in courses]
+    prerequisites = _related_ids(Course.prerequisites.through, course_ids)
+    corequisites = _related_ids(Course.corequisites.through, course_ids)
+    for course in courses:
+        course['prerequisites'] = prerequisites.get(course['id'], [])
+        course['corequisites'] = corequisites.get(course['id'], [])
+    return courses
+
+
+def section_rows(queryset=None, seats=True):
+    queryset = Section.objects.all() if queryset is None else queryset
+    fields = SECTION_FIELDS if seats else SECTION_FIELDS[:-1]
+    columns = ('id', 'course_id', 'section_number', 'instructor', 'capacity', 'enrolled')
+    return [dict(zip(fields, row)) for row in queryset.order_by('id').values_list(*columns[:len(fields)])]
+
+
+def section_time_rows(queryset=None):
+    queryset = SectionTime.objects.all() if queryset is None else queryset
+    return [
+        {
+            'id': time_id,
+            'section': section_id,
+            'day': day,
+            'start_time': start_time.isoformat(),
+            'end_time': end_time.isoformat(),
+            'location': location,
+        }
+        for time_id, section_id, day, start_time, end_time, location in queryset.order_by('id').values_list(
+            'id', 'section_id', 'day', 'start_time', 'end_time', 'location'
+        )
+    ]
+
+
+def accepted_encodings(header):
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0 and coding.strip():
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+class CatalogSnapshot:
+    """The whole catalog serialized once, with every content coding precomputed.
+
+    Each coding gets its own strong ETag derived from the same content hash,
+    so any of them validates a conditional request for this version.
+    """
+
+    def __init__(self, version, body):
+        self.version = version
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.encodings = {'identity': body, 'gzip': gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)}
+        if brotli is not None:
+            self.encodings['br'] = brotli.compress(body, quality=BROTLI_QUALITY)
+        self.etags = {
+            coding: f'"{digest}"' if coding == 'identity' else f'"{digest}-{coding}"'
+            for coding in self.encodings
+        }
+
+    def negotiate(self, accept_encoding):
+        accepted = accepted_encodings(accept_encoding)
+        for coding in ('br', 'gzip'):
+            if coding in self.encodings and (coding in accepted or '*' in accepted):
+                return coding
+        return 'identity'
+
+    def matches(self, etags):
+        return '*' in etags or any(etag in etags for etag in self.etags.values())
+
+
+def build_snapshot():
+    # Reading the change log position first means the rows below are at
+    # least that new; replaying changes already included is harmless.
+    # Seat counts change on every enrollment; delta sync and the live seat
+    # stream carry them, so they would only make the snapshot churn.
+    version = latest_change_version()
+    document = {
+        'version': version,
+        'courses': course_rows(),
+        'sections': section_rows(seats=False),
+        'section_times': section_time_rows(),
+    }
+    body = json.dumps(document, separators=(',', ':')).encode()
+    return CatalogSnapshot(version, body)
+
+
+def get_snapshot():
+    """The snapshot of the current content generation, built by one request at a time.
+
+    Snapshots are keyed by generation, so one built while a change was being
+    committed is simply never read again. While another request rebuilds,
+    the previous snapshot is served: it is consistent with its own version,
+    and delta sync brings clients forward from there. Without a shared cache
+    other workers' bumps never arrive, so the change log version is the key.
+    """
+    generation = content_generation() if is_shared() else f'v{latest_change_version()}'
+    key = SNAPSHOT_KEY.format(generation=generation)
+    snapshot = cache.get(key)
+    if snapshot is not None:
+        return snapshot
+    if not cache.add(SNAPSHOT_LOCK_KEY, 1, 60):
+        latest = cache.get(LATEST_SNAPSHOT_KEY)
+        if latest is not None:
+            return latest
+        # Nothing to serve yet, so this request builds one too.
+        return build_snapshot()
+    try:
+        snapshot = build_snapshot()
+        cache.set_many({key: snapshot, LATEST_SNAPSHOT_KEY: snapshot}, SNAPSHOT_TIMEOUT)
+    finally:
+        cache.delete(SNAPSHOT_LOCK_KEY)
+    return snapshot
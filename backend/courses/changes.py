@@ -0,0 +1,117 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Exists, Max, OuterRef
+from django.utils import timezone
+
+from .catalog import bump_catalog_generation, bump_seat_generation, course_rows, section_rows, section_time_rows, settle_time, settled_version
+from .demand import demand_changed
+from .models import CatalogChange, CatalogCompaction, Course, Section, SectionTime
+from .occupancy import times_changed
+from .planner import plans_changed
+
+KINDS = {
+    'course': ('courses', Course, course_rows),
+    'section': ('sections', Section, section_rows),
+    'section_time': ('section_times', SectionTime, section_time_rows),
+}
+MODEL_KINDS = {model: kind for kind, (_, model, _) in KINDS.items()}
+
+
+def record_changes(kind, object_ids, deleted=False, seats_only=False):
+    """Log upserts (or tombstones) in the caller's transaction.
+
+    Writes that bypass model signals, such as ``QuerySet.update()`` and
+    ``bulk_create()``, must call this themselves so delta sync sees them.
+    ``seats_only`` changes keep the cached snapshot and search index.
+    """
+    changes = [CatalogChange(kind=kind, object_id=object_id, deleted=deleted) for object_id in object_ids]
+    if not changes:
+        return
+    CatalogChange.objects.bulk_create(changes)
+    transaction.on_commit(bump_seat_generation if seats_only else bump_catalog_generation)
+    if kind == 'section_time':
+        times_changed()
+    else:
+        demand_changed()
+    if kind == 'course':
+        # Units and requisites live on courses; plans do not depend on sections.
+        plans_changed()
+
+
+def record_instance_change(instance, deleted=False):
+    record_changes(MODEL_KINDS[type(instance)], [instance.pk], deleted=deleted)
+
+
+class ChangeFeedExpired(Exception):
+    """The requested version predates the oldest change still in the log."""
+
+
+def purged_through():
+    return CatalogCompaction.objects.aggregate(value=Max('purged_through'))['value'] or 0
+
+
+def changes_since(since, limit=1000):
+    """Collapse the log after ``since`` into the latest state of each object.
+
+    Returns the new cursor, whether more entries remain, the current rows of
+    inserted or updated objects and the ids of deleted ones.
+
+    While an import holds versions 100-600 open, a short transaction can
+    commit 601; a cursor moved to 601 would never see 100-600. So the cursor
+    stops below any gap younger than ``CATALOG_CHANGES_SETTLE`` seconds, and
+    the entries past it are sent again on the next sync.
+    """
+    if since < purged_through():
+        raise ChangeFeedExpired(since)
+    entries = list(
+        CatalogChange.objects.filter(version__gt=since)
+        .order_by('version')
+        .values_list('version', 'kind', 'object_id', 'deleted', 'changed_at')[:limit + 1]
+    )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    cursor = settled_version(since, [(entry[0], entry[4]) for entry in entries], settle_time())
+    if cursor != (entries[-1][0] if entries else since):
+        # Paging on would return this page again, so the client waits for its next sync.
+        has_more = False
+    latest = {}
+    for version, kind, object_id, deleted, _ in entries:
+        latest[kind, object_id] = deleted
+
+    upserts = {kind: [] for kind in KINDS}
+    tombstones = {kind: [] for kind in KINDS}
+    for (kind, object_id), deleted in latest.items():
+        (tombstones if deleted else upserts)[kind].append(object_id)
+
+    result = {
+        'version': cursor,
+        'has_more': has_more,
+        'deleted': {},
+    }
+    for kind, (key, model, rows) in KINDS.items():
+        result[key] = rows(model.objects.filter(pk__in=upserts[kind])) if upserts[kind] else []
+        result['deleted'][key] = sorted(tombstones[kind])
+    return result
+
+
+def compact_changes(tombstone_age=timedelta(days=90)):
+    """Drop log entries superseded by a newer one for the same object, then old tombstones.
+
+    Collapsing superseded entries never changes what any cursor sees. Purging
+    tombstones does, so the purged range is recorded and clients behind it are
+    told to resynchronize from the snapshot.
+    """
+    with transaction.atomic():
+        newer = CatalogChange.objects.filter(
+            kind=OuterRef('kind'), object_id=OuterRef('object_id'), version__gt=OuterRef('version')
+        )
+        superseded, _ = CatalogChange.objects.filter(Exists(newer)).delete()
+
+        expired = CatalogChange.objects.filter(deleted=True, changed_at__lt=timezone.now() - tombstone_age)
+        horizon = expired.aggregate(value=Max('version'))['value']
+        purged = 0
+        if horizon is not None:
+            purged, _ = expired.filter(version__lte=horizon).delete()
+            CatalogCompaction.objects.create(purged_through=horizon)
+    return superseded, purged
@@ -0,0 +1,134 @@
+"""
+Room and instructor double-booking detection.
+
+Meetings are grouped by (room, day) and (instructor, day), and each group
+is swept in start order, so finding every clash costs O(n log n) plus the
+number of clashes rather than comparing all pairs. The full report is
+cached; saves and deletes of single meetings patch it by re-sweeping only
+the groups the changed meetings belong to, and bulk writers drop it.
+"""
+from django.core.cache import cache
+from django.db.models.functions import Lower, Trim
+
+from .models import Section, SectionTime
+
+REPORT_KEY = 'courses:clashes:report'
+LOCK_KEY = 'courses:clashes:lock'
+# A rebuild racing with a patch can store a stale report; expiring it bounds how long that lasts.
+REPORT_TIMEOUT = 60 * 60
+ROOM = 'room'
+INSTRUCTOR = 'instructor'
+MEETING_FIELDS = ('id', 'section_id', 'section__course_id', 'section__instructor', 'day', 'start_time', 'end_time',
+                  'location')
+
+
+def resource_key(value):
+    """Rooms and instructors are free text; match them ignoring case and surrounding spaces."""
+    return value.strip().lower()
+
+
+def overlapping_pairs(slots):
+    """Yield ``(a, b)`` for every pair of ``(start, end, ref)`` slots whose times overlap.
+
+    A sweep in start order keeps only the slots still running, so the cost
+    is O(n log n) plus the number of overlaps instead of comparing every
+    pair. Slots that merely touch (one ends as the next starts) do not clash.
+    """
+    running = []
+    for start, end, ref in sorted(slots, key=lambda slot: (slot[0], slot[1])):
+        running = [(other_end, other) for other_end, other in running if other_end > start]
+        for _, other in running:
+            yield other, ref
+        running.append((end, ref))
+
+
+def meeting_groups(meetings):
+    """``{(kind, resource, day): [(start, end, time id), ...]}`` for rows of ``MEETING_FIELDS``."""
+    groups = {}
+    for time_id, _, _, instructor, day, start, end, location in meetings:
+        for kind, resource in ((ROOM, location), (INSTRUCTOR, instructor)):
+            if resource and resource.strip():
+                groups.setdefault((kind, resource_key(resource), day), []).append((start, end, time_id))
+    return groups
+
+
+def sweep(groups, involving=None):
+    """Clash keys ``(kind, resource, day, first id, second id)``, optionally only those touching ``involving``."""
+    clashes = set()
+    for (kind, resource, day), slots in groups.items():
+        for first, second in overlapping_pairs(slots):
+            if involving is None or first in involving or second in involving:
+                clashes.add((kind, resource, day, min(first, second), max(first, second)))
+    return clashes
+
+
+def find_clashes():
+    return sweep(meeting_groups(SectionTime.objects.values_list(*MEETING_FIELDS).iterator(chunk_size=5000)))
+
+
+def clash_report():
+    report = cache.get(REPORT_KEY)
+    if report is None:
+        report = find_clashes()
+        cache.set(REPORT_KEY, report, REPORT_TIMEOUT)
+    return report
+
+
+def invalidate_clashes():
+    cache.delete(REPORT_KEY)
+
+
+def clashes_with(time_ids):
+    """Current clashes of the given meetings, read from only the rooms and instructors they use."""
+    meetings = list(SectionTime.objects.filter(pk__in=time_ids).values_list(*MEETING_FIELDS))
+    if not meetings:
+        return set()
+    days = {meeting[4] for meeting in meetings}
+    rooms = {resource_key(meeting[7]) for meeting in meetings if meeting[7].strip()}
+    instructors = {resource_key(meeting[3]) for meeting in meetings if meeting[3].strip()}
+    # Two lookups rather than one OR across the join, so each is a seek on its expression index.
+    neighbours = {}
+    if rooms:
+        by_room = SectionTime.objects.annotate(room=Lower(Trim('location'))).filter(room__in=rooms, day__in=days)
+        neighbours.update((row[0], row) for row in by_room.values_list(*MEETING_FIELDS))
+    if instructors:
+        sections = Section.objects.annotate(teacher=Lower(Trim('instructor'))).filter(teacher__in=instructors)
+        by_teacher = SectionTime.objects.filter(section__in=sections.values('pk'), day__in=days)
+        neighbours.update((row[0], row) for row in by_teacher.values_list(*MEETING_FIELDS))
+    return sweep(meeting_groups(neighbours.values()), involving=set(time_ids))
+
+
+def update_clashes(time_ids):
+    """Patch the cached report after the given meetings were saved or deleted."""
+    time_ids = set(time_ids)
+    if not time_ids:
+        return
+    if not cache.add(LOCK_KEY, 1, 10):
+        # Another process is patching the report; rebuilding later is always correct.
+        invalidate_clashes()
+        return
+    try:
+        # Read under the lock, so the report patched is the latest one stored.
+        report = cache.get(REPORT_KEY)
+        if report is None:
+            return
+        report = {clash for clash in report if clash[3] not in time_ids and clash[4] not in time_ids}
+        report |= clashes_with(time_ids)
+        cache.set(REPORT_KEY, report, REPORT_TIMEOUT)
+    finally:
+        cache.delete(LOCK_KEY)
+
+
+def describe(clashes):
+    """Clash keys expanded with both meetings, ordered by kind, resource and day."""
+    ids = {time_id for clash in clashes for time_id in clash[3:]}
+    meetings = {
+        row[0]: dict(zip(('id', 'section', 'course', 'instructor', 'day', 'start_time', 'end_time', 'location'), row))
+        for row in SectionTime.objects.filter(pk__in=ids).values_list(*MEETING_FIELDS)
+    }
+    result = []
+    for kind, resource, day, first, second in sorted(clashes):
+        if first in meetings and second in meetings:
+            result.append({'kind': kind, 'resource': resource, 'day': day,
+                           'meetings': [meetings[first], meetings[second]]})
+    return result
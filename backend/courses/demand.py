@@ -0,0 +1,101 @@
+"""
+Enrollment pressure: fill ratios, full sections and projected overflow.
+
+Statistics are aggregated in the database from the ``enrolled`` and
+``waitlisted`` counters on ``Section``, one grouped query per view, and
+materialized in the cache. Writes that move seats or waitlists bump
+``DEMAND_GENERATION_KEY``. Readers rebuild a stale report at most once per
+``DEMAND_STATS_MIN_REFRESH`` seconds; everyone else keeps serving the
+previous one, so live registration traffic never waits behind a rebuild.
+Without a shared cache a report older than that interval counts as stale.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, FloatField, Q, Sum, Value, Window
+from django.db.models.functions import Cast, Coalesce, Greatest, NullIf, Rank
+from unipath_backend.cache import is_shared
+
+from .models import Section
+from .versioning import bump_counter, read_counter
+
+DEMAND_GENERATION_KEY = 'courses:demand:generation'
+STATS_KEY = 'courses:demand:stats'
+LOCK_KEY = 'courses:demand:lock'
+GROUPS = {'course': {'name': F('course__name')}, 'instructor': {}}
+
+
+def min_refresh():
+    return getattr(settings, 'DEMAND_STATS_MIN_REFRESH', 30)
+
+
+def bump_demand_generation():
+    return bump_counter(DEMAND_GENERATION_KEY)
+
+
+def demand_changed():
+    transaction.on_commit(bump_demand_generation)
+
+
+def pressure(group):
+    """One row per course or instructor, ranked by fill ratio."""
+    demand = F('enrolled') + F('waitlisted')
+    return list(
+        Section.objects.order_by().values(group, **GROUPS[group]).annotate(
+            sections=Count('pk'),
+            full_sections=Count('pk', filter=Q(enrolled__gte=F('capacity'))),
+            capacity=Sum('capacity'),
+            enrolled=Sum('enrolled'),
+            waitlisted=Sum('waitlisted'),
+        ).annotate(
+            fill_ratio=Cast(F('enrolled'), FloatField()) / NullIf(F('capacity'), 0),
+            projected_fill=Cast(demand, FloatField()) / NullIf(F('capacity'), 0),
+            projected_overflow=Greatest(demand - F('capacity'), Value(0)),
+        ).annotate(
+            rank=Window(Rank(), order_by=[F('fill_ratio').desc(nulls_last=True), F('projected_overflow').desc()]),
+        ).order_by('rank', group)
+    )
+
+
+def totals():
+    return Section.objects.aggregate(
+        sections=Count('pk'),
+        full_sections=Count('pk', filter=Q(enrolled__gte=F('capacity'))),
+        capacity=Coalesce(Sum('capacity'), 0),
+        enrolled=Coalesce(Sum('enrolled'), 0),
+        waitlisted=Coalesce(Sum('waitlisted'), 0),
+    )
+
+
+def build_stats():
+    generation = read_counter(DEMAND_GENERATION_KEY)
+    return {
+        'generation': generation,
+        'generated_at': time.time(),
+        'totals': totals(),
+        **{group: pressure(group) for group in GROUPS},
+    }
+
+
+def refresh_stats():
+    stats = build_stats()
+    cache.set(STATS_KEY, stats, None)
+    return stats
+
+
+def demand_stats():
+    """The materialized report, rebuilt when it is stale and the refresh interval has passed."""
+    stats = cache.get(STATS_KEY)
+    if stats is None:
+        return refresh_stats()
+    # Without a shared cache other workers' bumps never arrive, so only age retires the report.
+    fresh = is_shared() and stats['generation'] == read_counter(DEMAND_GENERATION_KEY)
+    if fresh or time.time() - stats['generated_at'] < min_refresh() or not cache.add(LOCK_KEY, 1, 60):
+        # Within the refresh interval, or another worker is already rebuilding.
+        return stats
+    try:
+        return refresh_stats()
+    finally:
+        cache.delete(LOCK_KEY)
@@ -0,0 +1,130 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .changes import record_changes
+from .demand import demand_changed
+from .models import Enrollment, Section
+
+
+class EnrollmentError(Exception):
+    def __init__(self, section_ids):
+        self.section_ids = sorted(section_ids)
+        super().__init__(self.section_ids)
+
+
+class UnknownSections(EnrollmentError):
+    pass
+
+
+class SectionsFull(EnrollmentError):
+    pass
+
+
+class AlreadyEnrolled(EnrollmentError):
+    pass
+
+
+class NotEnrolled(EnrollmentError):
+    pass
+
+
+def _take_seat(section_id):
+    return Section.objects.filter(pk=section_id, enrolled__lt=F('capacity')).update(enrolled=F('enrolled') + 1)
+
+
+def enroll_in_sections(student, section_ids, waitlist=False):
+    """Reserve a seat in every section or none of them.
+
+    Each seat is taken with ``UPDATE ... SET enrolled = enrolled + 1 WHERE
+    enrolled < capacity``, so the database decides who gets the last seat
+    and concurrent requests can never overbook. Sections are locked in id
+    order to keep concurrent multi-section batches from deadlocking. Full
+    sections either waitlist the student or fail the whole batch; a section
+    is locked before its waitlist entry is written, so no drop in between
+    can hand its seat to nobody.
+    """
+    section_ids = sorted(set(section_ids))
+    try:
+        with transaction.atomic():
+            known = set(Section.objects.filter(pk__in=section_ids).values_list('pk', flat=True))
+            if len(known) != len(section_ids):
+                raise UnknownSections(set(section_ids) - known)
+            existing = Enrollment.objects.filter(student=student, section_id__in=section_ids)
+            if existing.exists():
+                raise AlreadyEnrolled(existing.values_list('section_id', flat=True))
+
+            enrollments = []
+            seated = []
+            waiting = []
+            full = []
+            for section_id in section_ids:
+                reserved = _take_seat(section_id)
+                if not reserved and waitlist:
+                    # An UPDATE that matches nothing locks nothing, so a drop could free a seat, find
+                    # no waitlist yet and release it. Lock the section, as drops do, and look again.
+                    list(Section.objects.select_for_update().filter(pk=section_id).values_list('pk'))
+                    reserved = _take_seat(section_id)
+                if reserved:
+                    seated.append(section_id)
+                    status = Enrollment.ENROLLED
+                elif waitlist:
+                    waiting.append(section_id)
+                    status = Enrollment.WAITLISTED
+                else:
+                    full.append(section_id)
+                    continue
+                enrollments.append(Enrollment(student=student, section_id=section_id, status=status))
+            if full:
+                raise SectionsFull(full)
+            Enrollment.objects.bulk_create(enrollments)
+            Section.objects.filter(pk__in=waiting).update(waitlisted=F('waitlisted') + 1)
+            record_changes('section', seated, seats_only=True)
+            # Waitlists are not part of the synced catalog, only of demand statistics.
+            demand_changed()
+    except IntegrityError:
+        # A concurrent request enrolled the same student first; its seat stands and ours rolled back.
+        raise AlreadyEnrolled(section_ids)
+    return enrollments
+
+
+def drop_sections(student, section_ids):
+    """Release the student's places, handing each freed seat to the head of the waitlist.
+
+    The sections are locked first, in id order, so concurrent drops from one
+    section queue up and each sees the waitlist the previous one left behind.
+    """
+    section_ids = sorted(set(section_ids))
+    with transaction.atomic():
+        list(Section.objects.select_for_update().filter(pk__in=section_ids).order_by('pk').values_list('pk'))
+        enrollments = list(
+            Enrollment.objects.select_for_update()
+            .filter(student=student, section_id__in=section_ids)
+            .order_by('section_id')
+        )
+        missing = set(section_ids) - {enrollment.section_id for enrollment in enrollments}
+        if missing:
+            raise NotEnrolled(missing)
+        Enrollment.objects.filter(pk__in=[enrollment.pk for enrollment in enrollments]).delete()
+
+        released = []
+        for enrollment in enrollments:
+            section = Section.objects.filter(pk=enrollment.section_id)
+            if enrollment.status != Enrollment.ENROLLED:
+                section.filter(waitlisted__gt=0).update(waitlisted=F('waitlisted') - 1)
+                continue
+            promoted = (
+                Enrollment.objects.select_for_update()
+                .filter(section_id=enrollment.section_id, status=Enrollment.WAITLISTED)
+                .order_by('created_at', 'id')
+                .first()
+            )
+            if promoted is not None:
+                promoted.status = Enrollment.ENROLLED
+                promoted.save(update_fields=['status'])
+                section.filter(waitlisted__gt=0).update(waitlisted=F('waitlisted') - 1)
+            else:
+                section.filter(enrolled__gt=0).update(enrolled=F('enrolled') - 1)
+                released.append(enrollment.section_id)
+        record_changes('section', released, seats_only=True)
+        demand_changed()
+    return enrollments
@@ -0,0 +1,374 @@
+"""
+Term catalog import.
+
+Input is one flat record per meeting time, in the shape a registrar export
+usually has: the course and section columns repeat on every row of that
+section, and rows without a ``day`` describe a section (or, without a
+``section``, a course) that has no meetings. ``prerequisites`` and
+``corequisites`` hold course ids separated by ``;``, ``,`` or spaces.
+"""
+import csv
+import json
+import re
+import time as clock
+from dataclasses import dataclass, field
+from datetime import time
+from pathlib import Path
+
+from django.db import transaction
+
+from .changes import record_changes
+from .models import Course, Section, SectionTime
+from .clashes import invalidate_clashes
+from .prerequisites import invalidate_graph
+
+try:
+    import openpyxl
+except ImportError:  # pragma: no cover - openpyxl is optional
+    openpyxl = None
+
+COLUMNS = (
+    'course', 'course_name', 'units', 'prerequisites', 'corequisites',
+    'section', 'instructor', 'capacity', 'day', 'start_time', 'end_time', 'location',
+)
+DAY_CODES = {code: code for code, _ in SectionTime.DAYS_CHOICES}
+DAY_CODES.update({name.lower(): code for code, name in SectionTime.DAYS_CHOICES})
+ID_SEPARATOR = re.compile(r'[;,\s]+')
+
+
+class CatalogImportError(Exception):
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(f'{len(errors)} invalid rows')
+
+
+def read_rows(path, file_format=None):
+    """Yield ``(row number, record)`` from a CSV, JSON Lines, JSON array or XLSX file."""
+    path = Path(path)
+    file_format = (file_format or path.suffix.lstrip('.')).lower()
+    if file_format == 'csv':
+        with path.open(newline='', encoding='utf-8-sig') as stream:
+            for number, record in enumerate(csv.DictReader(stream), start=2):
+                yield number, record
+    elif file_format in ('jsonl', 'ndjson'):
+        with path.open(encoding='utf-8') as stream:
+            for number, line in enumerate(stream, start=1):
+                if line.strip():
+                    yield number, json.loads(line)
+    elif file_format == 'json':
+        with path.open(encoding='utf-8') as stream:
+            yield from enumerate(json.load(stream), start=1)
+    elif file_format == 'xlsx':
+        if openpyxl is None:
+            raise CatalogImportError(['XLSX import needs the openpyxl package.'])
+        workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(name).strip() if name is not None else '' for name in next(rows, ())]
+            for number, values in enumerate(rows, start=2):
+                yield number, dict(zip(header, values))
+        finally:
+            workbook.close()
+    else:
+        raise CatalogImportError([f'Unsupported catalog format: {file_format!r}'])
+
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _integer(record, name, required=False, default=None, minimum=0):
+    value = record.get(name)
+    if _blank(value):
+        if required:
+            raise ValueError(f'{name} is required')
+        return default
+    try:
+        # Spreadsheet cells hold numbers as floats.
+        number = int(value) if isinstance(value, float) and value.is_integer() else int(str(value).strip())
+    except ValueError:
+        raise ValueError(f'{name} must be an integer')
+    if number < minimum:
+        raise ValueError(f'{name} must be at least {minimum}')
+    return number
+
+
+def _ids(value):
+    if _blank(value):
+        return set()
+    if isinstance(value, (int, float)):
+        parts = [int(value)]
+    elif isinstance(value, (list, tuple)):
+        parts = value
+    else:
+        parts = [part for part in ID_SEPARATOR.split(str(value).strip()) if part]
+    return {int(part) for part in parts}
+
+
+def _time(record, name):
+    value = record.get(name)
+    if isinstance(value, time):
+        return value
+    if _blank(value):
+        raise ValueError(f'{name} is required')
+    try:
+        return time.fromisoformat(str(value).strip())
+    except ValueError:
+        raise ValueError(f'{name} must look like HH:MM')
+
+
+@dataclass
+class CourseRecord:
+    name: str
+    units: int
+    prerequisites: set = field(default_factory=set)
+    corequisites: set = field(default_factory=set)
+    sections: dict = field(default_factory=dict)
+
+
+@dataclass
+class SectionRecord:
+    instructor: str
+    capacity: int
+    times: dict = field(default_factory=dict)
+
+
+def parse_catalog(rows):
+    """Validate every row and fold them into ``{course id: CourseRecord}``.
+
+    Raises ``CatalogImportError`` listing every problem, so a bad file is
+    rejected before anything is written.
+    """
+    courses = {}
+    errors = []
+    for number, record in rows:
+        try:
+            course_id = _integer(record, 'course', required=True, minimum=1)
+            # Repeated course and section columns may be left blank after the first row.
+            name = str(record.get('course_name') or '').strip()
+            units = _integer(record, 'units')
+            try:
+                prerequisites = _ids(record.get('prerequisites'))
+                corequisites = _ids(record.get('corequisites'))
+            except ValueError:
+                raise ValueError('prerequisites and corequisites must be course ids')
+            course = courses.get(course_id)
+            if course is None:
+                if not name:
+                    raise ValueError('course_name is required')
+                course = courses[course_id] = CourseRecord(name, units or 0)
+            elif (name and name != course.name) or (units is not None and units != course.units):
+                raise ValueError(f'course {course_id} is described differently on another row')
+            course.prerequisites |= prerequisites
+            course.corequisites |= corequisites
+
+            section_number = _integer(record, 'section', minimum=1)
+            if section_number is None:
+                continue
+            instructor = str(record.get('instructor') or '').strip()
+            capacity = _integer(record, 'capacity')
+            section = course.sections.get(section_number)
+            if section is None:
+                section = course.sections[section_number] = SectionRecord(instructor, capacity or 0)
+            elif (instructor and instructor != section.instructor) or (
+                capacity is not None and capacity != section.capacity
+            ):
+                raise ValueError(f'section {course_id}/{section_number} is described differently on another row')
+
+            if _blank(record.get('day')):
+                continue
+            day = DAY_CODES.get(str(record['day']).strip().lower())
+            if day is None:
+                raise ValueError(f"unknown day {record['day']!r}")
+            start, end = _time(record, 'start_time'), _time(record, 'end_time')
+            if end <= start:
+                raise ValueError('end_time must be after start_time')
+            if (day, start) in section.times:
+                raise ValueError(f'section {course_id}/{section_number} meets twice at {day} {start}')
+            section.times[day, start] = (end, str(record.get('location') or '').strip())
+        except (ValueError, TypeError) as error:
+            errors.append(f'row {number}: {error}')
+    if errors:
+        raise CatalogImportError(errors)
+    return courses
+
+
+@dataclass
+class ImportReport:
+    rows: int = 0
+    created: dict = field(default_factory=lambda: {'courses': 0, 'sections': 0, 'section_times': 0})
+    updated: dict = field(default_factory=lambda: {'courses': 0, 'sections': 0, 'section_times': 0})
+    deleted: dict = field(default_factory=lambda: {'sections': 0, 'section_times': 0})
+    requisites_added: int = 0
+    requisites_removed: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def _upsert(model, objects, unique_fields, update_fields, batch_size):
+    if objects:
+        model.objects.bulk_create(
+            objects, batch_size=batch_size, update_conflicts=True,
+            unique_fields=unique_fields, update_fields=update_fields,
+        )
+
+
+def _import_chunk(chunk, report, prune, batch_size):
+    transaction.on_commit(invalidate_clashes)
+    course_ids = [course_id for course_id, _ in chunk]
+    existing = {
+        course_id: (name, units)
+        for course_id, name, units in Course.objects.filter(pk__in=course_ids).values_list('id', 'name', 'units')
+    }
+    courses = [
+        Course(id=course_id, name=record.name, units=record.units)
+        for course_id, record in chunk if existing.get(course_id) != (record.name, record.units)
+    ]
+    _upsert(Course, courses, ['id'], ['name', 'units'], batch_size)
+    report.created['courses'] += sum(course.pk not in existing for course in courses)
+    report.updated['courses'] += sum(course.pk in existing for course in courses)
+    record_changes('course', [course.pk for course in courses])
+    # Bulk inserts skip post_save, so new courses never reach the prerequisite graph on their own.
+    if any(course.pk not in existing for course in courses):
+        transaction.on_commit(invalidate_graph)
+
+    existing = {
+        (course_id, number): (section_id, instructor, capacity)
+        for section_id, course_id, number, instructor, capacity in Section.objects.filter(
+            course_id__in=course_ids
+        ).values_list('id', 'course_id', 'section_number', 'instructor', 'capacity')
+    }
+    sections = []
+    for course_id, record in chunk:
+        for number, section in record.sections.items():
+            current = existing.get((course_id, number))
+            if current is None or current[1:] != (section.instructor, section.capacity):
+                sections.append(Section(
+                    course_id=course_id, section_number=number,
+                    instructor=section.instructor, capacity=section.capacity,
+                ))
+    # ``enrolled`` is a live counter and is never overwritten by an import.
+    _upsert(Section, sections, ['course', 'section_number'], ['instructor', 'capacity'], batch_size)
+    changed = {(section.course_id, section.section_number) for section in sections}
+    report.created['sections'] += len(changed - existing.keys())
+    report.updated['sections'] += len(changed & existing.keys())
+
+    section_ids = {key: current[0] for key, current in existing.items()}
+    if changed - existing.keys():
+        section_ids = {
+            (course_id, number): section_id
+            for section_id, course_id, number in Section.objects.filter(course_id__in=course_ids).values_list(
+                'id', 'course_id', 'section_number'
+            )
+        }
+    record_changes('section', [section_ids[key] for key in changed])
+    wanted_sections = {
+        section_ids[course_id, number] for course_id, record in chunk for number in record.sections
+    }
+
+    existing = {
+        (section_id, day, start): (time_id, end, location)
+        for time_id, section_id, day, start, end, location in SectionTime.objects.filter(
+            section_id__in=wanted_sections
+        ).values_list('id', 'section_id', 'day', 'start_time', 'end_time', 'location')
+    }
+    times = []
+    wanted_times = set()
+    for course_id, record in chunk:
+        for number, section in record.sections.items():
+            section_id = section_ids[course_id, number]
+            for (day, start), (end, location) in section.times.items():
+                wanted_times.add((section_id, day, start))
+                current = existing.get((section_id, day, start))
+                if current is None or current[1:] != (end, location):
+                    times.append(SectionTime(
+                        section_id=section_id, day=day, start_time=start, end_time=end, location=location,
+                    ))
+    _upsert(SectionTime, times, ['section', 'day', 'start_time'], ['end_time', 'location'], batch_size)
+    changed = {(time.section_id, time.day, time.start_time) for time in times}
+    report.created['section_times'] += len(changed - existing.keys())
+    report.updated['section_times'] += len(changed & existing.keys())
+    if changed:
+        changed_ids = [
+            time_id for time_id, section_id, day, start in SectionTime.objects.filter(
+                section_id__in={key[0] for key in changed}
+            ).values_list('id', 'section_id', 'day', 'start_time')
+            if (section_id, day, start) in changed
+        ]
+        record_changes('section_time', changed_ids)
+
+    if prune:
+        # Deleting through the ORM sends post_delete, which logs the tombstones.
+        stale_times = [existing[key][0] for key in existing.keys() - wanted_times]
+        report.deleted['section_times'] += SectionTime.objects.filter(pk__in=stale_times).delete()[1].get(
+            SectionTime._meta.label, 0
+        )
+        stale_sections = Section.objects.filter(course_id__in=course_ids).exclude(pk__in=wanted_sections)
+        report.deleted['sections'] += stale_sections.delete()[1].get(Section._meta.label, 0)
+
+
+def _check_requisites(courses):
+    referenced = {other for record in courses.values() for other in record.prerequisites | record.corequisites}
+    missing = referenced - courses.keys()
+    missing -= set(Course.objects.filter(pk__in=missing).values_list('pk', flat=True))
+    if missing:
+        raise CatalogImportError([f'unknown requisite course {course_id}' for course_id in sorted(missing)])
+
+
+def _sync_requisites(courses, report, batch_size):
+    touched = set()
+    for attribute in ('prerequisites', 'corequisites'):
+        through = getattr(Course, attribute).through
+        wanted = {
+            (course_id, other) for course_id, record in courses.items() for other in getattr(record, attribute)
+        }
+        current = {
+            (course_id, other): link_id
+            for link_id, course_id, other in through.objects.filter(from_course_id__in=courses).values_list(
+                'id', 'from_course_id', 'to_course_id'
+            )
+        }
+        added, removed = wanted - current.keys(), current.keys() - wanted
+        through.objects.bulk_create(
+            [through(from_course_id=course_id, to_course_id=other) for course_id, other in added],
+            batch_size=batch_size, ignore_conflicts=True,
+        )
+        through.objects.filter(pk__in=[current[link] for link in removed]).delete()
+        report.requisites_added += len(added)
+        report.requisites_removed += len(removed)
+        touched |= {course_id for course_id, _ in added | removed}
+    # Through rows written in bulk send no m2m_changed signal.
+    record_changes('course', sorted(touched))
+    if touched:
+        transaction.on_commit(invalidate_graph)
+
+
+def import_catalog(rows, chunk_size=500, batch_size=1000, prune=False):
+    """Upsert a term catalog, writing only rows that differ from the database.
+
+    Courses, sections and times go in one transaction per ``chunk_size``
+    courses. Requisite links are written last, once every course they can
+    point at exists. With ``prune``, sections and times of the imported
+    courses that are missing from the file are deleted.
+    """
+    started = clock.perf_counter()
+    report = ImportReport()
+
+    def counted():
+        for row in rows:
+            report.rows += 1
+            yield row
+
+    courses = parse_catalog(counted())
+    _check_requisites(courses)
+    items = sorted(courses.items())
+    for start in range(0, len(items), chunk_size):
+        with transaction.atomic():
+            _import_chunk(items[start:start + chunk_size], report, prune, batch_size)
+    with transaction.atomic():
+        _sync_requisites(courses, report, batch_size)
+    report.seconds = clock.perf_counter() - started
+    return report
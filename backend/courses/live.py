@@ -0,0 +1,155 @@
+"""
+Live seat counts pushed to subscribers instead of polled.
+
+Each process runs one ``SeatBroker`` on its event loop. While anyone is
+subscribed, the broker checks the catalog generation every
+``SEAT_PUSH_INTERVAL`` seconds; the generation is bumped by every committed
+catalog change in any process, so one cheap cache read replaces every
+client's poll. When it moves, the broker reads the subscribed sections in
+one query and fans out the seats that differ. Updates that arrive before a
+subscriber has drained its previous batch overwrite it, so a burst of
+enrollments reaches each client as a single event.
+
+The generation is only seen by every process through a shared cache. With
+a per-process one, changes committed by other workers would never move it,
+so the broker then reads the subscribed sections on every check.
+"""
+import asyncio
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from unipath_backend.cache import is_shared
+from .catalog import catalog_generation
+from .models import Section
+
+logger = logging.getLogger(__name__)
+
+
+def push_interval():
+    return getattr(settings, 'SEAT_PUSH_INTERVAL', 0.5)
+
+
+def heartbeat_interval():
+    return getattr(settings, 'SEAT_PUSH_HEARTBEAT', 15)
+
+
+def read_seats(section_ids):
+    return {
+        section_id: (enrolled, capacity)
+        for section_id, enrolled, capacity in Section.objects.filter(pk__in=section_ids).values_list(
+            'pk', 'enrolled', 'capacity'
+        )
+    }
+
+
+class Subscription:
+    def __init__(self, section_ids):
+        self.section_ids = frozenset(section_ids)
+        self.pending = {}
+        self.ready = asyncio.Event()
+
+    def offer(self, seats):
+        self.pending.update(seats)
+        self.ready.set()
+
+    async def next_batch(self):
+        """Wait for updates and take everything that accumulated since the last call."""
+        await self.ready.wait()
+        self.ready.clear()
+        batch, self.pending = self.pending, {}
+        return batch
+
+
+class SeatBroker:
+    def __init__(self, interval=None):
+        self.interval = interval
+        self.subscribers = {}
+        self.seats = {}
+        self.generation = None
+        self.poller = None
+
+    def subscribe(self, section_ids, seats=None):
+        """Register interest in ``section_ids``; ``seats`` are their current values, if already read."""
+        subscription = Subscription(section_ids)
+        for section_id in subscription.section_ids:
+            self.subscribers.setdefault(section_id, set()).add(subscription)
+        if seats:
+            for section_id, value in seats.items():
+                self.seats.setdefault(section_id, value)
+        loop = asyncio.get_running_loop()
+        if self.poller is None or self.poller.done() or self.poller.get_loop() is not loop:
+            self.poller = loop.create_task(self.poll())
+        return subscription
+
+    def unsubscribe(self, subscription):
+        for section_id in subscription.section_ids:
+            subscribers = self.subscribers.get(section_id)
+            if subscribers is None:
+                continue
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self.subscribers[section_id]
+                self.seats.pop(section_id, None)
+
+    def publish(self, seats):
+        """Fan out the values in ``{section_id: (enrolled, capacity)}`` that changed."""
+        batches = {}
+        for section_id, value in seats.items():
+            if self.seats.get(section_id) == value:
+                continue
+            self.seats[section_id] = value
+            for subscription in self.subscribers.get(section_id, ()):
+                batches.setdefault(subscription, {})[section_id] = value
+        for subscription, batch in batches.items():
+            subscription.offer(batch)
+        return len(batches)
+
+    async def refresh(self):
+        generation = None
+        if is_shared():
+            generation = await sync_to_async(catalog_generation)()
+            if generation == self.generation:
+                return
+        self.publish(await sync_to_async(read_seats)(list(self.subscribers)))
+        # Only once the seats are read, so a failed read is retried on the next check.
+        self.generation = generation
+
+    async def poll(self):
+        while self.subscribers:
+            try:
+                await self.refresh()
+            except Exception:
+                # The poller serves every stream in this process; a dead one leaves them all silent.
+                logger.exception('Could not refresh live seats')
+            await asyncio.sleep(self.interval if self.interval is not None else push_interval())
+
+
+seat_broker = SeatBroker()
+
+
+def format_event(seats):
+    sections = [
+        {'id': section_id, 'enrolled': enrolled, 'capacity': capacity, 'available': max(capacity - enrolled, 0)}
+        for section_id, (enrolled, capacity) in sorted(seats.items())
+    ]
+    return f'event: seats\ndata: {json.dumps({"sections": sections}, separators=(",", ":"))}\n\n'
+
+
+async def seat_events(section_ids, seats, broker=seat_broker):
+    """Server-sent events: the current seats, then every change until the client disconnects."""
+    subscription = broker.subscribe(section_ids, seats)
+    try:
+        yield format_event(seats)
+        while True:
+            try:
+                batch = await asyncio.wait_for(subscription.next_batch(), heartbeat_interval())
+            except asyncio.TimeoutError:
+                # Keeps proxies from closing an idle stream.
+                yield ': keepalive\n\n'
+                continue
+            yield format_event(batch)
+    finally:
+        broker.unsubscribe(subscription)
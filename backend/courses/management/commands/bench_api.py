@@ -0,0 +1,380 @@
+import gc
+import http.client
+import io
+import platform
+import statistics
+import tempfile
+import threading
+import time
+
+import django
+from django.contrib.auth.models import User
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+from PIL import Image
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from courses.models import Course, Section, SectionTime
+from courses.synthetic import generate_catalog, generate_students
+from unipath_backend.benchmarking import (
+    find_regressions, format_stats, read_baseline, scratch_database, summarize, without_throttling, write_baseline,
+)
+
+PASSWORD = 'Student-Pass-1'
+FIRST_NEW_COURSE = 10_000_000
+# Streams until the client disconnects, which the test client cannot do; bench_seat_push covers it.
+NOT_DRIVEN = {'live-seats'}
+HTTP_PATHS = [
+    '/api/v1/courses/courses/',
+    '/api/v1/courses/sections/',
+    '/api/v1/courses/courses/{course}/',
+    '/api/v1/courses/search/?q=algorithms',
+    '/api/v1/courses/eligible/?completed=1,2,3',
+    '/api/v1/auth/profile/',
+]
+
+
+class Scenario:
+    """One endpoint; ``path`` and ``data`` are values or functions of the call number."""
+
+    def __init__(self, name, url_name, method, path, data=None, status=200, format='json'):
+        self.name = name
+        self.url_name = url_name
+        self.method = method
+        self.path = path
+        self.data = data
+        self.status = status
+        self.format = format
+        self.calls = 0
+        self.samples = []
+        self.queries = []
+        self.failure = None
+
+    def request(self, client, number):
+        path = self.path(number) if callable(self.path) else self.path
+        data = self.data(number) if callable(self.data) else self.data
+        if self.method == 'get':
+            return client.get(path, data)
+        return getattr(client, self.method)(path, data, format=self.format)
+
+    def run(self, client, calls, timed=True):
+        gc.collect()
+        for _ in range(calls):
+            if self.failure:
+                return
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                response = self.request(client, self.calls)
+                elapsed = time.perf_counter() - start
+            self.calls += 1
+            if response.status_code != self.status:
+                self.failure = f'{self.name}: expected {self.status}, got {response.status_code}'
+            elif timed:
+                self.samples.append(elapsed)
+                self.queries.append(len(captured))
+
+    def stats(self):
+        # The median query count, so a cache refill in one call does not move it.
+        return {**summarize(self.samples), 'queries': int(statistics.median_low(self.queries))}
+
+
+def api_url_names(patterns=None, prefix=''):
+    """Names of every route under ``/api/v1/``."""
+    names = set()
+    for pattern in get_resolver().url_patterns if patterns is None else patterns:
+        route = prefix + str(pattern.pattern)
+        if isinstance(pattern, URLResolver):
+            names |= api_url_names(pattern.url_patterns, route)
+        elif isinstance(pattern, URLPattern) and pattern.name and route.startswith('api/v1/'):
+            names.add(pattern.name)
+    return names
+
+
+def avatar_bytes():
+    stream = io.BytesIO()
+    Image.new('RGB', (512, 512), (40, 90, 160)).save(stream, 'JPEG', quality=85)
+    return stream.getvalue()
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive every /api/v1/ endpoint through the test client and a local HTTP server on a scratch database '
+        'with a synthetic catalog, and compare latency, throughput and query counts against a baseline file'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--courses', type=int, default=500)
+        parser.add_argument('--sections-per-course', type=int, default=4)
+        parser.add_argument('--students', type=int, default=200)
+        parser.add_argument('--repeat', type=int, default=20, help='Timed requests per endpoint.')
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--rounds', type=int, default=4, help='Passes over the endpoints that share the repeats.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--only', help='Run only the scenarios whose name contains this text.')
+        parser.add_argument('--http-clients', type=int, default=4, help='Concurrent keep-alive connections.')
+        parser.add_argument('--http-seconds', type=float, default=3.0, help='0 skips the HTTP load test.')
+        parser.add_argument('--output', help='Write the results to this JSON file.')
+        parser.add_argument('--baseline', help='Fail if the results regress against this file.')
+        parser.add_argument('--save-baseline', help='Write the results as a new baseline to this file.')
+        parser.add_argument('--tolerance', type=float, default=0.5, help='Allowed relative slowdown.')
+        parser.add_argument('--floor-ms', type=float, default=1.0, help='Allowed absolute slowdown.')
+
+    def handle(self, *args, **options):
+        # Read before the scratch database exists, so a missing file fails fast.
+        baseline = read_baseline(options['baseline']) if options['baseline'] else None
+        meta = {
+            'options': {
+                name: options[name] for name in (
+                    'courses', 'sections_per_course', 'students', 'repeat', 'warmup', 'rounds', 'seed', 'http_clients',
+                    'http_seconds',
+                )
+            },
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        }
+        with tempfile.TemporaryDirectory() as media_root, \
+                override_settings(MEDIA_ROOT=media_root, AVATAR_THUMBNAIL_WORKERS=0), \
+                scratch_database() as scratch, without_throttling():
+            meta['database'] = scratch.vendor
+            started = time.perf_counter()
+            generate_catalog(
+                options['courses'], options['sections_per_course'], seed=options['seed'],
+                max_prerequisites=3, corequisite_ratio=0.02,
+            )
+            generate_students(options['students'], PASSWORD, seed=options['seed'])
+            self.stdout.write(
+                f"{options['courses']} courses, {Section.objects.count()} sections, "
+                f"{SectionTime.objects.count()} meeting times, {options['students']} students "
+                f'generated in {time.perf_counter() - started:.1f}s'
+            )
+            user = User.objects.get(username='student1')
+            # Staff, for the blacklist statistics.
+            user.is_staff = True
+            user.save(update_fields=['is_staff'])
+            token = str(AccessToken.for_user(user))
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+            scenarios = [
+                scenario for scenario in self.scenarios(options)
+                if not options['only'] or options['only'] in scenario.name
+            ]
+            rounds = max(1, min(options['rounds'], options['repeat']))
+            # Round-robin, so a slow stretch on a shared machine is spread over every endpoint.
+            for round_number in range(rounds):
+                calls = options['repeat'] // rounds + (round_number < options['repeat'] % rounds)
+                for scenario in scenarios:
+                    if round_number == 0:
+                        scenario.run(client, options['warmup'], timed=False)
+                    scenario.run(client, calls)
+            results = {}
+            failures = []
+            for scenario in scenarios:
+                if scenario.failure:
+                    failures.append(scenario.failure)
+                    self.stdout.write(self.style.ERROR(scenario.failure))
+                    continue
+                results[scenario.name] = stats = scenario.stats()
+                self.stdout.write(f"{format_stats(scenario.name, stats)} queries={stats['queries']}")
+            if not options['only']:
+                missing = api_url_names() - {scenario.url_name for scenario in scenarios} - NOT_DRIVEN
+                if missing:
+                    self.stdout.write(self.style.WARNING(f"not driven: {', '.join(sorted(missing))}"))
+
+            if options['http_seconds'] > 0 and not options['only']:
+                course_id = Course.objects.order_by('id').values_list('id', flat=True)[0]
+                paths = [path.format(course=course_id) for path in HTTP_PATHS]
+                for name, stats in self.load_test(paths, token, options['http_clients'], options['http_seconds']).items():
+                    results[name] = stats
+                    extra = f" throughput={stats['throughput']:.1f}/s" if 'throughput' in stats else ''
+                    self.stdout.write(format_stats(name, stats) + extra)
+
+        if options['output']:
+            write_baseline(options['output'], results, meta)
+        if failures:
+            raise CommandError(f'{len(failures)} endpoints answered with an unexpected status.')
+        if options['save_baseline']:
+            write_baseline(options['save_baseline'], results, meta)
+            self.stdout.write(f"Baseline written to {options['save_baseline']}.")
+        if baseline is not None:
+            regressions = find_regressions(results, baseline, options['tolerance'], options['floor_ms'])
+            for regression in regressions:
+                self.stdout.write(self.style.ERROR(regression))
+            if regressions:
+                raise CommandError(f"{len(regressions)} regressions against {options['baseline']}.")
+            self.stdout.write(self.style.SUCCESS(f"No regressions against {options['baseline']}."))
+
+    def scenarios(self, options):
+        course_ids = list(Course.objects.order_by('id').values_list('id', flat=True))
+        sections = list(Section.objects.order_by('course_id', 'section_number').values(
+            'id', 'course_id', 'section_number', 'instructor', 'capacity',
+        ))
+        times = list(SectionTime.objects.order_by('id').values(
+            'id', 'section_id', 'day', 'start_time', 'end_time', 'location',
+        ))
+        # One section per course, so enrolling in them never asks for the same course twice.
+        first_sections = list({section['course_id']: section['id'] for section in reversed(sections)}.values())
+        calls = options['warmup'] + options['repeat']
+        refresh_tokens = [str(RefreshToken.for_user(User.objects.get(username='student2'))) for _ in range(calls)]
+        access = str(AccessToken.for_user(User.objects.get(username='student2')))
+        avatar = avatar_bytes()
+        course = course_ids[0]
+        section = sections[0]
+        section_time = times[0]
+        targets = course_ids[len(course_ids) // 10:len(course_ids) // 10 + 3]
+
+        def pick(values):
+            return lambda number: values[number % len(values)]
+
+        def detail(url_name, values):
+            return lambda number: reverse(url_name, args=[values[number % len(values)]])
+
+        def bulk_section(number):
+            row = sections[number % len(sections)]
+            return {'upsert': [{
+                'id': row['id'], 'course': row['course_id'], 'section_number': row['section_number'],
+                'instructor': row['instructor'], 'capacity': row['capacity'] + number % 2,
+            }]}
+
+        def bulk_time(number):
+            row = times[number % len(times)]
+            return {'upsert': [{
+                'id': row['id'], 'section': row['section_id'], 'day': row['day'],
+                'start_time': row['start_time'].isoformat(), 'end_time': row['end_time'].isoformat(),
+                # A room of its own, so the batch never clashes with the synthetic timetable.
+                'location': f"Bench Room {row['id']}-{number % 2}",
+            }]}
+
+        def avatar_upload(number):
+            return {'avatar': io.BytesIO(avatar)}
+
+        return [
+            # Catalog reads.
+            Scenario('GET courses', 'course-list', 'get', reverse('course-list')),
+            Scenario('GET courses ?search', 'course-list', 'get', reverse('course-list'), {'search': 'Algorithms'}),
+            Scenario('GET course', 'course-detail', 'get', detail('course-detail', course_ids)),
+            Scenario('GET sections', 'section-list', 'get', reverse('section-list')),
+            Scenario('GET section', 'section-detail', 'get', detail('section-detail', [row['id'] for row in sections])),
+            Scenario('GET section-times', 'sectiontime-list', 'get', reverse('sectiontime-list')),
+            Scenario('GET section-time', 'sectiontime-detail', 'get',
+                     detail('sectiontime-detail', [row['id'] for row in times])),
+            Scenario('GET async courses', 'async-course-list', 'get', reverse('async-course-list')),
+            Scenario('GET async course', 'async-course-detail', 'get', detail('async-course-detail', course_ids)),
+            Scenario('GET async sections', 'async-section-list', 'get', reverse('async-section-list')),
+            Scenario('GET async section', 'async-section-detail', 'get',
+                     detail('async-section-detail', [row['id'] for row in sections])),
+            Scenario('GET async section-times', 'async-section-time-list', 'get', reverse('async-section-time-list')),
+            Scenario('GET async section-time', 'async-section-time-detail', 'get',
+                     detail('async-section-time-detail', [row['id'] for row in times])),
+            Scenario('GET api root', 'api-root', 'get', reverse('api-root')),
+            Scenario('GET catalog', 'catalog-snapshot', 'get', reverse('catalog-snapshot')),
+            Scenario('GET changes', 'catalog-changes', 'get', reverse('catalog-changes'), {'since': 0}),
+            Scenario('GET search', 'catalog-search', 'get', reverse('catalog-search'), {'q': 'advanced algo'}),
+            Scenario('GET clashes', 'clashes', 'get', reverse('clashes')),
+            Scenario('GET rooms/free', 'free-rooms', 'get', reverse('free-rooms'),
+                     {'day': 'mon', 'start': '10:00', 'end': '11:30'}),
+            Scenario('GET rooms/utilization', 'room-utilization', 'get', reverse('room-utilization')),
+            Scenario('GET demand', 'demand', 'get', reverse('demand')),
+            Scenario('GET eligible', 'eligible-courses', 'get', reverse('eligible-courses'),
+                     {'completed': ','.join(map(str, course_ids[:20]))}),
+            Scenario('POST schedules', 'schedules', 'post', reverse('schedules'), {'courses': course_ids[:4]}),
+            Scenario('POST plan', 'plan', 'post', reverse('plan'), {'courses': targets}),
+            # Catalog writes.
+            Scenario('POST course', 'course-list', 'post', reverse('course-list'), lambda number: {
+                'id': FIRST_NEW_COURSE + number, 'name': f'Benchmark Course {number}', 'units': 3,
+                'prerequisites': [course], 'corequisites': [],
+            }, status=201),
+            Scenario('PATCH course', 'course-detail', 'patch', detail('course-detail', course_ids),
+                     lambda number: {'name': f'Renamed Course {number}'}),
+            Scenario('DELETE course', 'course-detail', 'delete',
+                     lambda number: reverse('course-detail', args=[FIRST_NEW_COURSE + number]), status=204),
+            Scenario('PATCH section', 'section-detail', 'patch', reverse('section-detail', args=[section['id']]),
+                     lambda number: {'capacity': section['capacity'] + number % 2}),
+            Scenario('PATCH section-time', 'sectiontime-detail', 'patch',
+                     reverse('sectiontime-detail', args=[section_time['id']]),
+                     lambda number: {'location': f"{section_time['location'] or 'Room'} {number % 2}"}),
+            Scenario('POST sections/bulk', 'section-bulk', 'post', reverse('section-bulk'), bulk_section),
+            Scenario('POST section-times/bulk', 'sectiontime-bulk', 'post', reverse('sectiontime-bulk'), bulk_time),
+            # Enrollment, after the writes so the seat counts it changes are not rewritten by them.
+            Scenario('POST enroll', 'enrollment-enroll', 'post', reverse('enrollment-enroll'),
+                     lambda number: {'sections': [pick(first_sections)(number)], 'waitlist': True}, status=201),
+            Scenario('GET enrollments', 'enrollment-list', 'get', reverse('enrollment-list')),
+            Scenario('POST drop', 'enrollment-drop', 'post', reverse('enrollment-drop'),
+                     lambda number: {'sections': [pick(first_sections)(number)]}, status=204),
+            # Accounts.
+            Scenario('POST register', 'register', 'post', reverse('register'), lambda number: {
+                'username': f'bench{number}', 'email': f'bench{number}@example.com',
+                'password': 'Bench-Pass-123!', 'password2': 'Bench-Pass-123!',
+            }, status=201),
+            Scenario('POST login', 'token_obtain_pair', 'post', reverse('token_obtain_pair'),
+                     {'username': 'student2', 'password': PASSWORD}),
+            Scenario('POST token/refresh', 'token_refresh', 'post', reverse('token_refresh'),
+                     lambda number: {'refresh': refresh_tokens[number]}),
+            Scenario('POST token/verify', 'token_verify', 'post', reverse('token_verify'), {'token': access}),
+            Scenario('GET token/blacklist/stats', 'token_blacklist_stats', 'get', reverse('token_blacklist_stats')),
+            Scenario('GET profile', 'profile', 'get', reverse('profile')),
+            Scenario('PATCH profile', 'profile', 'patch', reverse('profile'),
+                     lambda number: {'first_name': ('Sara', 'Nora')[number % 2]}),
+            Scenario('GET async profile', 'async_profile', 'get', reverse('async_profile')),
+            Scenario('PATCH async profile', 'async_profile', 'patch', reverse('async_profile'),
+                     lambda number: {'last_name': ('Smith', 'Chen')[number % 2]}),
+            Scenario('PUT avatar', 'profile_avatar', 'put', reverse('profile_avatar'), avatar_upload,
+                     status=202, format='multipart'),
+            Scenario('DELETE avatar', 'profile_avatar', 'delete', reverse('profile_avatar'), status=204),
+        ]
+
+    def load_test(self, paths, token, clients, seconds):
+        """Keep-alive GETs from ``clients`` threads against a threaded WSGI server for ``seconds``."""
+        server = ThreadedWSGIServer(('127.0.0.1', 0), QuietRequestHandler)
+        server.set_app(WSGIHandler())
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        port = server.server_address[1]
+        latencies = {path: [] for path in paths}
+        errors = []
+        deadline = time.perf_counter() + seconds
+
+        def client(offset):
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            headers = {'Authorization': f'Bearer {token}', 'Host': 'testserver'}
+            number = offset
+            while time.perf_counter() < deadline:
+                path = paths[number % len(paths)]
+                number += 1
+                start = time.perf_counter()
+                conn.request('GET', path, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                latencies[path].append(time.perf_counter() - start)
+                if response.status != 200:
+                    errors.append(f'{path}: {response.status}')
+            conn.close()
+
+        threads = [threading.Thread(target=client, args=(offset,)) for offset in range(clients)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        server.shutdown()
+        server.server_close()
+        if errors:
+            raise CommandError(f'HTTP load test: {len(errors)} failed requests, first {errors[0]}')
+
+        results = {f'http GET {path}': summarize(samples) for path, samples in latencies.items()}
+        total = summarize([sample for samples in latencies.values() for sample in samples])
+        # Requests completed by all clients together; ops_per_sec is one client's back-to-back rate.
+        total['throughput'] = total['runs'] / elapsed
+        results[f'http all, {clients} clients'] = total
+        return results
@@ -0,0 +1,134 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.test import RequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+from courses.synthetic import generate_catalog
+from unipath_backend.benchmarking import scratch_database, summarize, without_throttling
+
+
+class Command(BaseCommand):
+    help = 'Compare concurrent catalog reads through the WSGI and ASGI handlers with a simulated database round trip'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--courses', type=int, default=500)
+        parser.add_argument('--requests', type=int, default=400)
+        parser.add_argument('--concurrency', type=int, default=50, help='Requests in flight at once.')
+        parser.add_argument('--threads', type=int, default=4, help='Threads of the WSGI worker.')
+        parser.add_argument('--db-latency-ms', type=float, default=20.0,
+                            help='Added to every query to stand in for a remote database.')
+        parser.add_argument('--path', action='append', dest='paths')
+
+    def handle(self, *args, **options):
+        latency = options['db_latency_ms'] / 1000
+
+        def delay(execute, sql, params, many, context):
+            time.sleep(latency)
+            return execute(sql, params, many, context)
+
+        def add_delay(sender, connection, **kwargs):
+            connection.execute_wrappers.append(delay)
+
+        paths = options['paths'] or ['/api/v1/courses/sections/?page_size=20', '/api/v1/auth/profile/']
+        with scratch_database(), without_throttling():
+            generate_catalog(options['courses'], 5)
+            user = User.objects.create_user(username='bench', password='bench-pass-123')
+            token = f'Bearer {AccessToken.for_user(user)}'
+            self.stdout.write(
+                f"{options['requests']} requests, {options['concurrency']} in flight, "
+                f"{options['db_latency_ms']:.1f}ms per query, database: {connection.vendor}"
+            )
+            connection_created.connect(add_delay)
+            for alias in connections:
+                connections[alias].execute_wrappers.append(delay)
+            try:
+                for path in paths:
+                    async_path = path.replace('/courses/', '/courses/async/', 1).replace('/auth/', '/auth/async/', 1)
+                    self.stdout.write(path)
+                    self.report('  sync view, WSGI', self.run_wsgi(path, token, options))
+                    self.report('  sync view, ASGI', asyncio.run(self.run_asgi(path, token, options)))
+                    self.report('  async view, ASGI', asyncio.run(self.run_asgi(async_path, token, options)))
+            finally:
+                connection_created.disconnect(add_delay)
+                for alias in connections:
+                    if delay in connections[alias].execute_wrappers:
+                        connections[alias].execute_wrappers.remove(delay)
+
+    def report(self, label, result):
+        elapsed, samples = result
+        stats = summarize(samples)
+        self.stdout.write(
+            f"{label:<20} {len(samples) / elapsed:8.1f} req/s  p50={stats['p50_ms']:.1f}ms "
+            f"p95={stats['p95_ms']:.1f}ms p99={stats['p99_ms']:.1f}ms"
+        )
+
+    def run_wsgi(self, path, token, options):
+        """One WSGI worker: a pool of ``--threads`` threads, each blocked for the whole request."""
+        handler = WSGIHandler()
+        route, _, query = path.partition('?')
+        environ = RequestFactory()._base_environ(PATH_INFO=route, QUERY_STRING=query, HTTP_AUTHORIZATION=token)
+
+        def serve():
+            statuses = []
+            body = b''.join(handler(dict(environ), lambda status, headers: statuses.append(status)))
+            assert statuses[0].startswith('200'), (statuses[0], body[:200])
+
+        def client(_):
+            # Latency as the client sees it, including the wait for a free worker thread.
+            started = time.perf_counter()
+            worker.submit(serve).result()
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as worker:
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as clients:
+                samples = list(clients.map(client, range(options['requests'])))
+        return time.perf_counter() - started, samples
+
+    async def run_asgi(self, path, token, options):
+        """One ASGI worker: a single event loop with ``--concurrency`` requests in flight."""
+        application = ASGIHandler()
+        route, _, query = path.partition('?')
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': route, 'raw_path': route.encode(), 'query_string': query.encode(), 'root_path': '',
+            'headers': [(b'host', b'testserver'), (b'authorization', token.encode())],
+            'server': ('testserver', 80), 'client': ('127.0.0.1', 50000),
+        }
+        slots = asyncio.Semaphore(options['concurrency'])
+
+        async def request():
+            async with slots:
+                started = time.perf_counter()
+                disconnected = asyncio.Event()
+                messages = iter([{'type': 'http.request', 'body': b'', 'more_body': False}])
+                statuses = []
+
+                async def receive():
+                    message = next(messages, None)
+                    if message is None:
+                        await disconnected.wait()
+                        return {'type': 'http.disconnect'}
+                    return message
+
+                async def send(message):
+                    if message['type'] == 'http.response.start':
+                        statuses.append(message['status'])
+                    elif not message.get('more_body'):
+                        disconnected.set()
+
+                await application(dict(scope), receive, send)
+                assert statuses == [200], statuses
+                return time.perf_counter() - started
+
+        started = time.perf_counter()
+        samples = await asyncio.gather(*(request() for _ in range(options['requests'])))
+        return time.perf_counter() - started, samples
@@ -0,0 +1,69 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIClient
+
+from courses.models import Section
+from courses.synthetic import generate_catalog
+from unipath_backend.benchmarking import scratch_database, without_throttling
+
+
+class Command(BaseCommand):
+    help = 'Compare writing sections with their times one request at a time against one bulk request'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000)
+        parser.add_argument('--courses', type=int, default=200)
+
+    def rows(self, count, courses, first_number):
+        rows = []
+        for offset in range(count):
+            day = ['sat', 'sun', 'mon', 'tue', 'wed'][offset % 5]
+            hour = 8 + offset % 10
+            rows.append({
+                'course': 1 + offset % courses,
+                'section_number': first_number + offset // courses,
+                'instructor': f'Instructor {offset % 50}',
+                'capacity': 40,
+                'times': [
+                    {'day': day, 'start_time': f'{hour:02d}:00', 'end_time': f'{hour:02d}:50',
+                     'location': f'Hall {first_number}-{offset}'},
+                    {'day': 'thu', 'start_time': f'{hour:02d}:00', 'end_time': f'{hour:02d}:50',
+                     'location': f'Hall {first_number}-{offset}'},
+                ],
+            })
+        return rows
+
+    def handle(self, *args, **options):
+        rows, courses = options['rows'], options['courses']
+        with scratch_database(), without_throttling():
+            generate_catalog(courses, sections_per_course=1, times_per_section=0)
+            client = APIClient()
+            client.force_authenticate(
+                User.objects.create_user(username='bench', password='bench-pass-123', is_staff=True)
+            )
+
+            start = time.perf_counter()
+            for row in self.rows(rows, courses, first_number=100):
+                times = row.pop('times')
+                response = client.post('/api/v1/courses/sections/', row, format='json')
+                assert response.status_code == 201, response.data
+                section_id = response.data['id']
+                for meeting in times:
+                    response = client.post(
+                        '/api/v1/courses/section-times/', {'section': section_id, **meeting}, format='json'
+                    )
+                    assert response.status_code == 201, response.data
+            per_row = time.perf_counter() - start
+
+            start = time.perf_counter()
+            response = client.post(
+                '/api/v1/courses/sections/bulk/', {'upsert': self.rows(rows, courses, first_number=1000)}, format='json'
+            )
+            assert response.status_code == 200, response.data
+            bulk = time.perf_counter() - start
+
+            self.stdout.write(f'sections in database: {Section.objects.count()}, rows per run: {rows} (2 times each)')
+            self.stdout.write(f'per-row API   {per_row:.2f}s  {rows / per_row:.0f} rows/s')
+            self.stdout.write(f'bulk endpoint {bulk:.2f}s  {rows / bulk:.0f} rows/s ({per_row / bulk:.1f}x)')
@@ -0,0 +1,77 @@
+import random
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from courses.clashes import (
+    MEETING_FIELDS, REPORT_KEY, clash_report, find_clashes, invalidate_clashes, meeting_groups, resource_key,
+    sweep,
+)
+from courses.models import SectionTime
+from courses.synthetic import generate_catalog
+from unipath_backend.benchmarking import format_stats, measure, scratch_database
+
+
+def naive_clashes(meetings):
+    """Compare every pair of meetings; the baseline the sweep replaces."""
+    clashes = set()
+    for index, first in enumerate(meetings):
+        for second in meetings[index + 1:]:
+            if first[4] != second[4] or not (first[5] < second[6] and second[5] < first[6]):
+                continue
+            low, high = min(first[0], second[0]), max(first[0], second[0])
+            for kind, position in (('room', 7), ('instructor', 3)):
+                if first[position].strip() and resource_key(first[position]) == resource_key(second[position]):
+                    clashes.add((kind, resource_key(first[position]), first[4], low, high))
+    return clashes
+
+
+class Command(BaseCommand):
+    help = 'Time the interval sweep against pairwise comparison and the incremental update on a scratch database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--courses', type=int, default=5000)
+        parser.add_argument('--sections-per-course', type=int, default=5)
+        parser.add_argument('--naive-sample', type=int, default=3000,
+                            help='Meetings given to the pairwise baseline, which is quadratic.')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            generate_catalog(options['courses'], options['sections_per_course'])
+            meetings = list(SectionTime.objects.values_list(*MEETING_FIELDS))
+            self.stdout.write(f'meetings: {len(meetings)}, database: {connection.vendor}')
+
+            self.stdout.write(format_stats('find_clashes (query + sweep)', measure(find_clashes, options['repeat'], 1)))
+            self.stdout.write(format_stats(
+                'sweep only', measure(lambda: sweep(meeting_groups(meetings)), options['repeat'], 1)
+            ))
+
+            sample = meetings[:options['naive_sample']]
+            started = time.perf_counter()
+            naive = naive_clashes(sample)
+            naive_ms = (time.perf_counter() - started) * 1000
+            swept = sweep(meeting_groups(sample))
+            assert naive == swept, 'sweep and pairwise comparison disagree'
+            started = time.perf_counter()
+            sweep(meeting_groups(sample))
+            sweep_ms = (time.perf_counter() - started) * 1000
+            self.stdout.write(
+                f'{len(sample)} meetings: pairwise {naive_ms:.1f} ms, sweep {sweep_ms:.1f} ms, {len(swept)} clashes'
+            )
+
+            invalidate_clashes()
+            clash_report()
+            rng = random.Random(0)
+
+            def move_one():
+                meeting = SectionTime.objects.get(pk=rng.choice(meetings)[0])
+                meeting.location = f'Room {rng.randint(100, 150)}'
+                meeting.save()
+                return meeting
+
+            self.stdout.write(format_stats('save with incremental update', measure(move_one, options['repeat'] * 20)))
+            assert cache.get(REPORT_KEY) == find_clashes(), 'incremental report drifted from a full sweep'
+            self.stdout.write(self.style.SUCCESS('incremental report matches a full sweep'))
@@ -0,0 +1,117 @@
+import logging
+import random
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connection
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from authentication.models import UserProfile
+from courses.demand import pressure
+from courses.enrollment import EnrollmentError, enroll_in_sections
+from courses.models import Section
+from courses.synthetic import generate_catalog
+from unipath_backend.benchmarking import format_stats, measure, scratch_database, summarize, without_throttling
+
+
+def python_stats():
+    """The baseline: pull every section and aggregate per course in Python."""
+    courses = {}
+    for course_id, capacity, enrolled, waitlisted in Section.objects.values_list(
+        'course_id', 'capacity', 'enrolled', 'waitlisted'
+    ):
+        row = courses.setdefault(course_id, [0, 0, 0, 0])
+        row[0] += capacity
+        row[1] += enrolled
+        row[2] += waitlisted
+        row[3] += enrolled >= capacity
+    return sorted(courses.items(), key=lambda item: -(item[1][1] / item[1][0]) if item[1][0] else 0)
+
+
+class Command(BaseCommand):
+    help = 'Time the enrollment-pressure report, cold and while enrollments are running, on a scratch database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--courses', type=int, default=5000)
+        parser.add_argument('--sections-per-course', type=int, default=5)
+        parser.add_argument('--students', type=int, default=2000)
+        parser.add_argument('--repeat', type=int, default=200)
+        parser.add_argument('--min-refresh', type=float, default=1.0,
+                            help='DEMAND_STATS_MIN_REFRESH used while traffic is running.')
+        parser.add_argument('--budget-ms', type=float, default=50.0, help='Allowed p95 of GET /demand/ under traffic.')
+
+    def handle(self, *args, **options):
+        with scratch_database(), without_throttling():
+            generate_catalog(options['courses'], options['sections_per_course'])
+            users = User.objects.bulk_create(User(username=f'load-{number}') for number in range(options['students']))
+            if not all(user.pk for user in users):
+                users = list(User.objects.filter(username__startswith='load-'))
+            UserProfile.objects.bulk_create(UserProfile(user=user) for user in users)
+            profiles = list(UserProfile.objects.filter(user__in=users))
+            section_ids = list(Section.objects.values_list('pk', flat=True))
+            client = APIClient()
+            client.force_authenticate(users[0])
+            self.stdout.write(f'sections: {len(section_ids)}, database: {connection.vendor}')
+
+            self.stdout.write(format_stats('aggregate in python', measure(python_stats, 5, 1)))
+            self.stdout.write(format_stats('aggregate in database', measure(lambda: pressure('course'), 5, 1)))
+
+            stop = threading.Event()
+            enrolled = 0
+
+            def traffic():
+                nonlocal enrolled
+                close_old_connections()
+                rng = random.Random(0)
+                try:
+                    for profile in profiles:
+                        if stop.is_set():
+                            break
+                        try:
+                            enroll_in_sections(profile, rng.sample(section_ids, 3), waitlist=True)
+                            enrolled += 1
+                        except (EnrollmentError, OperationalError):
+                            # SQLite reports writer contention as "database is locked".
+                            time.sleep(0.001)
+                finally:
+                    connection.close()
+
+            retries = 0
+
+            def fetch():
+                nonlocal retries
+                started = time.perf_counter()
+                while True:
+                    try:
+                        response = client.get('/api/v1/courses/demand/')
+                        break
+                    except OperationalError:
+                        # SQLite locks tables for readers while a writer holds them; the wait counts.
+                        retries += 1
+                        time.sleep(0.001)
+                assert response.status_code == 200, response.status_code
+                return time.perf_counter() - started
+
+            # Django would log every such retry as a server error.
+            request_log = logging.getLogger('django.request')
+            level = request_log.level
+            request_log.setLevel(logging.CRITICAL)
+            with override_settings(DEMAND_STATS_MIN_REFRESH=options['min_refresh']):
+                fetch()
+                worker = threading.Thread(target=traffic)
+                worker.start()
+                try:
+                    samples = [fetch() for _ in range(options['repeat'])]
+                finally:
+                    stop.set()
+                    worker.join()
+                    request_log.setLevel(level)
+            stats = summarize(samples)
+            self.stdout.write(format_stats('GET demand/ under traffic', stats))
+            self.stdout.write(f'{enrolled} enrollment batches committed during the run, {retries} read retries')
+            if stats['p95_ms'] > options['budget_ms']:
+                raise CommandError(f"p95 {stats['p95_ms']:.1f}ms exceeds the {options['budget_ms']:.0f}ms budget.")
+            self.stdout.write(self.style.SUCCESS(f"p95 within the {options['budget_ms']:.0f}ms budget."))
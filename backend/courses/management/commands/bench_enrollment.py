@@ -0,0 +1,70 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connection
+
+from authentication.models import UserProfile
+from courses.enrollment import enroll_in_sections
+from courses.models import Course, Enrollment, Section
+from unipath_backend.benchmarking import scratch_database
+
+
+class Command(BaseCommand):
+    help = 'Hammer one section with concurrent enrollments and check that it is never overbooked'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=2000)
+        parser.add_argument('--capacity', type=int, default=150)
+        parser.add_argument('--threads', type=int, default=16)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            course = Course.objects.create(id=1, name='Load Test 101', units=3)
+            section = Section.objects.create(course=course, section_number=1, capacity=options['capacity'])
+            users = User.objects.bulk_create(
+                User(username=f'load-{number}') for number in range(options['students'])
+            )
+            if not all(user.pk for user in users):
+                users = list(User.objects.filter(username__startswith='load-'))
+            UserProfile.objects.bulk_create(UserProfile(user=user) for user in users)
+            profiles = list(UserProfile.objects.filter(user__in=users))
+
+            retries = 0
+            lock = threading.Lock()
+
+            def attempt(profile):
+                nonlocal retries
+                close_old_connections()
+                try:
+                    while True:
+                        try:
+                            return enroll_in_sections(profile, [section.pk], waitlist=True)[0].status
+                        except OperationalError:
+                            # SQLite serializes writers and reports contention as "database is locked".
+                            with lock:
+                                retries += 1
+                            time.sleep(0.001)
+                finally:
+                    connection.close()
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+                statuses = list(pool.map(attempt, profiles))
+            elapsed = time.perf_counter() - started
+
+            section.refresh_from_db()
+            seated = Enrollment.objects.filter(section=section, status=Enrollment.ENROLLED).count()
+            self.stdout.write(
+                f"{len(statuses)} requests on {options['threads']} threads ({connection.vendor}) in {elapsed:.2f}s: "
+                f"{len(statuses) / elapsed:.0f} enrollments/s, {retries} lock retries"
+            )
+            self.stdout.write(
+                f"enrolled counter={section.enrolled} enrolled rows={seated} "
+                f"waitlisted={statuses.count(Enrollment.WAITLISTED)} capacity={section.capacity}"
+            )
+            if section.enrolled != seated or seated > section.capacity:
+                raise CommandError('Section was overbooked or its counter drifted.')
+            self.stdout.write(self.style.SUCCESS('No overbooking.'))
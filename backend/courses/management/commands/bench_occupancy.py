@@ -0,0 +1,67 @@
+from datetime import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models.functions import Trim
+from rest_framework.test import APIClient
+
+from courses.models import SectionTime
+from courses.occupancy import OccupancyMatrix, bump_times_generation
+from courses.synthetic import generate_catalog
+from unipath_backend.benchmarking import format_stats, measure, scratch_database, without_throttling
+
+
+def free_rooms_query(day, start, end):
+    """The same answer from the database: every room minus those with an overlapping meeting."""
+    rooms = SectionTime.objects.exclude(location='').values_list(Trim('location'), flat=True).distinct()
+    busy = set(SectionTime.objects.filter(day=day, start_time__lt=end, end_time__gt=start)
+               .values_list(Trim('location'), flat=True))
+    return sorted(set(rooms) - busy)
+
+
+class Command(BaseCommand):
+    help = 'Time the room occupancy matrix and its endpoints on a scratch database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--courses', type=int, default=10000)
+        parser.add_argument('--sections-per-course', type=int, default=5)
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        window = {'day': 'mon', 'start': '10:00', 'end': '11:30'}
+        with scratch_database(), without_throttling():
+            generate_catalog(options['courses'], options['sections_per_course'])
+            client = APIClient()
+            client.force_authenticate(User.objects.create_user(username='bench', password='bench-pass-123'))
+            matrix = OccupancyMatrix.from_database()
+            self.stdout.write(
+                f'meetings: {SectionTime.objects.count()}, rooms: {len(matrix.rooms)}, '
+                f'matrix: {matrix.busy.nbytes / 1024:.0f} KiB, database: {connection.vendor}'
+            )
+
+            def fetch(url, params):
+                response = client.get(url, params)
+                assert response.status_code == 200, response.status_code
+                return response.data
+
+            self.stdout.write(format_stats('build matrix', measure(OccupancyMatrix.from_database, 5, 1)))
+            self.stdout.write(format_stats(
+                'free rooms (database)', measure(lambda: free_rooms_query('mon', time(10), time(11, 30)), 10, 1)
+            ))
+            self.stdout.write(format_stats(
+                'free rooms (matrix)', measure(lambda: matrix.free_rooms('mon', time(10), time(11, 30)), options['repeat'])
+            ))
+            self.stdout.write(format_stats(
+                'GET rooms/free/', measure(lambda: fetch('/api/v1/courses/rooms/free/', window), options['repeat'])
+            ))
+            self.stdout.write(format_stats(
+                'GET rooms/utilization/',
+                measure(lambda: fetch('/api/v1/courses/rooms/utilization/', {}), options['repeat']),
+            ))
+
+            def cold():
+                bump_times_generation()
+                return fetch('/api/v1/courses/rooms/free/', window)
+
+            self.stdout.write(format_stats('GET rooms/free/ after a change', measure(cold, 5, 1)))
@@ -0,0 +1,53 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.test import APIClient
+
+from courses.pagination import KeysetPagination
+from courses.synthetic import generate_catalog
+from courses.views import SectionViewSet
+from unipath_backend.benchmarking import format_stats, measure, scratch_database, without_throttling
+
+
+class Command(BaseCommand):
+    help = 'Compare page 1 and deep page latency for offset and keyset pagination on a scratch database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--courses', type=int, default=2000)
+        parser.add_argument('--sections-per-course', type=int, default=6)
+        parser.add_argument('--deep-page', type=int, default=500)
+        parser.add_argument('--repeat', type=int, default=30)
+
+    def handle(self, *args, **options):
+        with scratch_database(), without_throttling():
+            generate_catalog(options['courses'], options['sections_per_course'])
+            client = APIClient()
+            client.force_authenticate(User.objects.create_user(username='bench', password='bench-pass-123'))
+            page_size = KeysetPagination.page_size
+            url = '/api/v1/courses/sections/?ordering=capacity'
+
+            # Walk to the deep page once to obtain its keyset cursor.
+            next_url = url
+            for _ in range(options['deep_page'] - 1):
+                next_url = client.get(next_url).data['next']
+                if next_url is None:
+                    break
+            deep_cursor = next_url
+            self.stdout.write(
+                f"sections: {options['courses'] * options['sections_per_course']}, page size {page_size}"
+            )
+
+            def fetch(target):
+                response = client.get(target)
+                assert response.status_code == 200, response.status_code
+
+            with mock.patch.object(SectionViewSet, 'pagination_class', PageNumberPagination):
+                self.stdout.write(format_stats('offset page 1', measure(lambda: fetch(url), options['repeat'])))
+                deep = f"{url}&page={options['deep_page']}"
+                self.stdout.write(format_stats(f"offset page {options['deep_page']}", measure(lambda: fetch(deep), options['repeat'])))
+
+            self.stdout.write(format_stats('keyset page 1', measure(lambda: fetch(url), options['repeat'])))
+            if deep_cursor:
+                self.stdout.write(format_stats(f"keyset page {options['deep_page']}", measure(lambda: fetch(deep_cursor), options['repeat'])))
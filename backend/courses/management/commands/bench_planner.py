@@ -0,0 +1,86 @@
+import random
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from courses.models import Course
+from courses.planner import PlanningCatalog, TermSearch, build_plan, plan_courses
+from unipath_backend.benchmarking import format_stats, measure, scratch_database
+
+
+def synthetic_catalog(courses, depth, rng, coreq_ratio=0.03):
+    """Courses in ``depth`` levels; each requires one to three courses from lower levels, mostly the level below."""
+    levels = [[] for _ in range(depth)]
+    for course_id in range(1, courses + 1):
+        levels[min(depth - 1, (course_id - 1) * depth // courses)].append(course_id)
+    units = {course_id: rng.choice([2, 3, 3, 3, 4]) for course_id in range(1, courses + 1)}
+    prerequisites = set()
+    corequisites = []
+    for level in range(1, depth):
+        for course_id in levels[level]:
+            prerequisites.add((course_id, rng.choice(levels[level - 1])))
+            for _ in range(rng.randint(0, 2)):
+                prerequisites.add((course_id, rng.choice(levels[rng.randrange(level)])))
+            if rng.random() < coreq_ratio:
+                corequisites.append((course_id, rng.choice(levels[level - 1])))
+    return PlanningCatalog(units.items(), sorted(prerequisites), corequisites), levels
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the degree planner on synthetic catalogs with deep prerequisite chains'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--courses', type=int, default=400)
+        parser.add_argument('--depths', default='8,16,32')
+        parser.add_argument('--targets', type=int, default=12, help='Courses requested per plan, from the top levels.')
+        parser.add_argument('--max-units', type=int, default=18)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--time-budget', type=float, default=1.0)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        max_units = options['max_units']
+        for depth in (int(value) for value in options['depths'].split(',')):
+            catalog, levels = synthetic_catalog(options['courses'], depth, rng)
+            top = [course_id for level in levels[depth // 2:] for course_id in level]
+            requests = [rng.sample(top, min(options['targets'], len(top))) for _ in range(options['repeat'])]
+            plans = []
+            greedy_terms = []
+
+            def run():
+                targets = requests[len(plans) % len(requests)]
+                search = TermSearch(catalog, catalog.closure(targets), max_units)
+                greedy_terms.append(len(search.greedy_plan()))
+                plans.append(build_plan(catalog, targets, (), max_units, options['time_budget']))
+
+            stats = measure(run, repeat=options['repeat'], warmup=0)
+            needed = sum(len(catalog.closure(targets)) for targets in requests) / len(requests)
+            self.stdout.write(format_stats(f'depth {depth}, {needed:.0f} courses/plan', stats))
+            self.stdout.write(
+                f'  terms: greedy {sum(greedy_terms) / len(plans):.2f}, searched '
+                f'{sum(len(plan.terms) for plan in plans) / len(plans):.2f}, lower bound '
+                f'{sum(plan.lower_bound for plan in plans) / len(plans):.2f}; '
+                f'optimal {sum(plan.optimal for plan in plans)}/{len(plans)}, '
+                f'truncated {sum(plan.truncated for plan in plans)}/{len(plans)}, '
+                f'states explored/plan {sum(plan.explored for plan in plans) / len(plans):.0f}'
+            )
+
+        with scratch_database():
+            catalog, levels = synthetic_catalog(options['courses'], 16, random.Random(options['seed']))
+            Course.objects.bulk_create(
+                Course(id=course_id, name=f'Course {course_id}', units=units) for course_id, units in catalog.units.items()
+            )
+            Course.prerequisites.through.objects.bulk_create(
+                Course.prerequisites.through(from_course_id=course_id, to_course_id=other_id)
+                for course_id, others in catalog.prerequisites.items() for other_id in others
+            )
+            targets = levels[-1][:options['targets']]
+            cache.clear()
+            started = time.perf_counter()
+            plan_courses(targets, max_units=max_units, time_budget=options['time_budget'])
+            self.stdout.write(f'plan_courses, cold: {(time.perf_counter() - started) * 1000:.1f}ms')
+            self.stdout.write(format_stats('plan_courses, cached', measure(
+                lambda: plan_courses(targets, max_units=max_units, time_budget=options['time_budget']), 200,
+            )))
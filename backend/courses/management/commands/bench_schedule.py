@@ -0,0 +1,68 @@
+import random
+from datetime import time
+
+from django.core.management.base import BaseCommand
+
+from courses.models import SectionTime
+from courses.scheduling import ScheduleIndex, SectionSlot, generate_schedules, time_range_mask
+from unipath_backend.benchmarking import format_stats, measure
+
+DAYS = [code for code, _ in SectionTime.DAYS_CHOICES]
+START_HOURS = [8, 9, 10, 11, 13, 14, 15, 16, 17]
+
+
+def synthetic_index(courses, sections_per_course, coreq_ratio, rng):
+    slots = []
+    section_id = 0
+    for course_id in range(1, courses + 1):
+        for _ in range(sections_per_course):
+            section_id += 1
+            mask = 0
+            for day in rng.sample(DAYS, 2):
+                hour = rng.choice(START_HOURS)
+                mask |= time_range_mask(day, time(hour), time(hour + 1, 30))
+            capacity = rng.choice([25, 30, 40, 60])
+            slots.append(SectionSlot(section_id, course_id, mask, capacity, rng.randint(0, capacity)))
+    corequisites = {}
+    for course_id in range(2, courses + 1):
+        if rng.random() < coreq_ratio:
+            corequisites[course_id] = {course_id - 1}
+    return ScheduleIndex(slots, corequisites)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the conflict-free schedule generator on a synthetic catalog'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--courses', type=int, default=500)
+        parser.add_argument('--sections-per-course', type=int, default=8)
+        parser.add_argument('--request-size', type=int, default=6)
+        parser.add_argument('--coreq-ratio', type=float, default=0.05)
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--time-budget', type=float, default=1.0)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        index = synthetic_index(options['courses'], options['sections_per_course'], options['coreq_ratio'], rng)
+        total_sections = sum(len(slots) for slots in index.sections.values())
+        self.stdout.write(f"catalog: {options['courses']} courses, {total_sections} sections")
+
+        requests = [
+            rng.sample(range(1, options['courses'] + 1), options['request_size'])
+            for _ in range(options['repeat'] + 3)
+        ]
+        outcomes = []
+
+        def run():
+            result = generate_schedules(index, requests[len(outcomes)], time_budget=options['time_budget'])
+            outcomes.append(result)
+
+        stats = measure(run, repeat=options['repeat'], warmup=3)
+        self.stdout.write(format_stats('generate_schedules', stats))
+        measured = outcomes[3:]
+        self.stdout.write(
+            f"explored/request={sum(r.explored for r in measured) / len(measured):.0f} "
+            f"solved={sum(1 for r in measured if r.schedules)}/{len(measured)} "
+            f"truncated={sum(1 for r in measured if r.truncated)}"
+        )
@@ -0,0 +1,46 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework.test import APIClient
+
+from courses.synthetic import generate_catalog
+from unipath_backend.benchmarking import format_stats, measure, scratch_database, without_throttling
+
+
+class Command(BaseCommand):
+    help = 'Compare icontains search on the sections endpoint with the indexed catalog search on a scratch database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--courses', type=int, default=10000)
+        parser.add_argument('--sections-per-course', type=int, default=5)
+        parser.add_argument('--repeat', type=int, default=30)
+        parser.add_argument('--query', action='append', dest='queries')
+
+    def handle(self, *args, **options):
+        queries = options['queries'] or ['Karimi', 'karimy', 'Thermodynamics', 'algoritms']
+        with scratch_database(), without_throttling():
+            generate_catalog(options['courses'], options['sections_per_course'])
+            client = APIClient()
+            client.force_authenticate(User.objects.create_user(username='bench', password='bench-pass-123'))
+            self.stdout.write(
+                f"sections: {options['courses'] * options['sections_per_course']}, database: {connection.vendor}"
+            )
+
+            def fetch(url, params):
+                response = client.get(url, params)
+                assert response.status_code == 200, response.status_code
+                return response.data
+
+            for query in queries:
+                icontains = fetch('/api/v1/courses/sections/', {'search': query})
+                search = fetch('/api/v1/courses/search/', {'q': query})
+                self.stdout.write(
+                    f"{query!r}: icontains first page {len(icontains['results'])} rows, "
+                    f"search {len(search['results'])} hits"
+                )
+                self.stdout.write(format_stats(
+                    '  icontains', measure(lambda: fetch('/api/v1/courses/sections/', {'search': query}), options['repeat'])
+                ))
+                self.stdout.write(format_stats(
+                    '  search', measure(lambda: fetch('/api/v1/courses/search/', {'q': query}), options['repeat'])
+                ))
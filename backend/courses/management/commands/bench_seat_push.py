@@ -0,0 +1,118 @@
+import asyncio
+import random
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import F
+from django.test.utils import override_settings
+
+from courses.catalog import bump_catalog_generation
+from courses.live import SeatBroker, format_event, read_seats
+from courses.models import Section
+from courses.synthetic import generate_catalog
+from unipath_backend.benchmarking import scratch_database, summarize
+
+
+class Command(BaseCommand):
+    help = 'Measure live seat fan-out latency to many simulated subscribers on a scratch database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscribers', type=int, default=5000)
+        parser.add_argument('--sections-per-subscriber', type=int, default=5)
+        parser.add_argument('--hot-sections', type=int, default=200, help='Sections the subscribers pick from.')
+        parser.add_argument('--rounds', type=int, default=50)
+        parser.add_argument('--updates-per-round', type=int, default=10)
+        parser.add_argument('--interval', type=float, default=0.1, help='Broker poll interval in seconds.')
+
+    def handle(self, *args, **options):
+        # A single process, so its local-memory cache counts as shared.
+        with scratch_database(), override_settings(CACHE_SHARED=True):
+            generate_catalog(max(options['hot_sections'] // 5, 1), 5)
+            section_ids = list(Section.objects.values_list('pk', flat=True)[:options['hot_sections']])
+            self.stdout.write(
+                f"subscribers: {options['subscribers']}, sections: {len(section_ids)}, database: {connection.vendor}"
+            )
+            asyncio.run(self.run(section_ids, options))
+
+    def report(self, label, latencies, events):
+        stats = summarize(latencies)
+        self.stdout.write(
+            f"{label:<24} deliveries={stats['runs']:<7} events={events:<7} "
+            f"p50={stats['p50_ms']:.2f}ms p95={stats['p95_ms']:.2f}ms p99={stats['p99_ms']:.2f}ms"
+        )
+
+    async def run(self, section_ids, options):
+        rng = random.Random(0)
+        broker = SeatBroker(interval=options['interval'])
+        seats = await sync_to_async(read_seats)(section_ids)
+        published = {}
+        latencies = []
+        events = 0
+
+        async def subscriber(subscription):
+            nonlocal events
+            while True:
+                batch = await subscription.next_batch()
+                received = time.perf_counter()
+                format_event(batch)
+                events += 1
+                latencies.extend(received - published[section_id] for section_id in batch)
+
+        subscriptions = [
+            broker.subscribe(rng.sample(section_ids, options['sections_per_subscriber']), seats)
+            for _ in range(options['subscribers'])
+        ]
+        tasks = [asyncio.create_task(subscriber(subscription)) for subscription in subscriptions]
+        await asyncio.sleep(options['interval'] * 2)
+
+        # End to end first, while the broker's seats still match the database.
+        for _ in range(min(options['rounds'], 20)):
+            changed = rng.sample(section_ids, options['updates_per_round'])
+
+            def commit():
+                Section.objects.filter(pk__in=changed).update(enrolled=F('enrolled') + 1)
+                bump_catalog_generation()
+
+            await sync_to_async(commit)()
+            now = time.perf_counter()
+            published.update((section_id, now) for section_id in changed)
+            await asyncio.sleep(options['interval'] * 2)
+        self.report('commit to delivery', latencies, events)
+
+        # Fan-out alone: publish straight into the broker and time delivery to every subscriber.
+        latencies.clear()
+        events = 0
+        for _ in range(options['rounds']):
+            changes = {}
+            for section_id in rng.sample(section_ids, options['updates_per_round']):
+                enrolled, capacity = broker.seats[section_id]
+                changes[section_id] = (enrolled + 1, capacity)
+                published[section_id] = time.perf_counter()
+            broker.publish(changes)
+            await asyncio.sleep(0.005)
+        await asyncio.sleep(0.05)
+        self.report('broker fan-out', latencies, events)
+
+        # Coalescing: a burst on one section reaches each subscriber as one event.
+        latencies.clear()
+        events = 0
+        hot = section_ids[0]
+        watchers = sum(1 for subscription in subscriptions if hot in subscription.section_ids)
+        for _ in range(100):
+            enrolled, capacity = broker.seats[hot]
+            published[hot] = time.perf_counter()
+            broker.publish({hot: (enrolled + 1, capacity)})
+        await asyncio.sleep(0.05)
+        self.stdout.write(f'burst of 100 updates to one section: {events} events for {watchers} subscribers')
+
+        for task in tasks:
+            task.cancel()
+        for subscription in subscriptions:
+            broker.unsubscribe(subscription)
+        polls = options['subscribers'] / 2
+        self.stdout.write(
+            f"clients polling every 2s would send {polls:.0f} requests/s; the broker reads the cache "
+            f"{1 / options['interval']:.0f} times/s and the database only after a change"
+        )
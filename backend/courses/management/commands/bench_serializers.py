@@ -0,0 +1,56 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from courses.models import Course, Section
+from courses.readers import course_list, section_list
+from courses.serializers import CourseSerializer, SectionSerializer
+from courses.synthetic import generate_catalog
+from unipath_backend.benchmarking import format_stats, measure, scratch_database, without_throttling
+from unipath_backend.renderers import ORJSONRenderer, orjson
+
+
+class Command(BaseCommand):
+    help = 'Compare the model serializers with the values-based list readers and the two JSON renderers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sections', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        with scratch_database(), without_throttling():
+            generate_catalog(max(options['sections'] // 5, 1), 5)
+            sections = Section.objects.with_times().order_by('id')[:options['sections']]
+            courses = Course.objects.with_catalog_tree().order_by('id')[:100]
+            self.stdout.write(f'sections: {sections.count()}, database: {connection.vendor}')
+
+            model_stats = measure(lambda: SectionSerializer(sections, many=True).data, repeat, 1)
+            values_stats = measure(lambda: section_list(sections), repeat, 1)
+            self.stdout.write(format_stats('SectionSerializer', model_stats))
+            self.stdout.write(format_stats('section_list', values_stats))
+            self.stdout.write(f"speedup: {model_stats['mean_ms'] / values_stats['mean_ms']:.1f}x")
+            self.stdout.write(format_stats('CourseSerializer, 100 courses',
+                                           measure(lambda: CourseSerializer(courses, many=True).data, repeat, 1)))
+            self.stdout.write(format_stats('course_list, 100 courses', measure(lambda: course_list(courses), repeat, 1)))
+
+            data = section_list(sections)
+            assert data == SectionSerializer(sections, many=True).data
+            self.stdout.write(format_stats('JSONRenderer', measure(lambda: JSONRenderer().render(data), repeat, 1)))
+            if orjson is None:
+                self.stdout.write('orjson is not installed; ORJSONRenderer falls back to JSONRenderer')
+            else:
+                assert ORJSONRenderer().render(data) == JSONRenderer().render(data)
+                self.stdout.write(format_stats('ORJSONRenderer', measure(lambda: ORJSONRenderer().render(data), repeat, 1)))
+
+            client = APIClient()
+            client.force_authenticate(User.objects.create_user(username='bench'))
+            for label, path in [
+                ('GET sections/ ?fast=0', '/api/v1/courses/sections/?page_size=100&fast=0'),
+                ('GET sections/', '/api/v1/courses/sections/?page_size=100'),
+                ('GET courses/ ?fast=0', '/api/v1/courses/courses/?page_size=100&fast=0'),
+                ('GET courses/', '/api/v1/courses/courses/?page_size=100'),
+            ]:
+                self.stdout.write(format_stats(label, measure(lambda: client.get(path), repeat * 10, 3)))
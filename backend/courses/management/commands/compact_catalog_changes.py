@@ -0,0 +1,21 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from courses.changes import compact_changes
+
+
+class Command(BaseCommand):
+    help = 'Collapse superseded catalog change log entries and purge old tombstones'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tombstone-days', type=int, default=90,
+            help='Delete tombstones older than this; clients behind them must resync from the snapshot.',
+        )
+
+    def handle(self, *args, **options):
+        superseded, purged = compact_changes(timedelta(days=options['tombstone_days']))
+        self.stdout.write(self.style.SUCCESS(
+            f'Removed {superseded} superseded entries and {purged} expired tombstones.'
+        ))
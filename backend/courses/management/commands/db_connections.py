@@ -0,0 +1,72 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from unipath_backend.database import connection_stats, pool_stats
+
+
+class Command(BaseCommand):
+    help = 'Open connections from several threads like concurrent requests would, and report acquisition time and pool use'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--hold-ms', type=float, default=20.0, help='How long each request keeps its connection.')
+
+    def handle(self, *args, **options):
+        alias = options['database']
+        hold = options['hold_ms'] / 1000
+        connection_stats.reset()
+        peak = {'saturation': 0.0, 'requests_waiting': 0}
+        done = threading.Event()
+
+        def request(_):
+            connection = connections[alias]
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                time.sleep(hold)
+            finally:
+                # What the end of a request does: persistent connections stay open, pooled ones go back.
+                connection.close_if_unusable_or_obsolete()
+
+        def sample():
+            while not done.wait(0.01):
+                stats = pool_stats(connections[alias])
+                if stats:
+                    peak['saturation'] = max(peak['saturation'], stats['saturation'])
+                    peak['requests_waiting'] = max(peak['requests_waiting'], stats.get('requests_waiting', 0))
+
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as executor:
+            list(executor.map(request, range(options['requests'])))
+        elapsed = time.perf_counter() - started
+        done.set()
+        sampler.join()
+
+        settings_dict = connections[alias].settings_dict
+        self.stdout.write(
+            f"{options['requests']} requests on {options['threads']} threads in {elapsed:.2f}s, "
+            f"vendor: {connections[alias].vendor}, CONN_MAX_AGE={settings_dict.get('CONN_MAX_AGE')}, "
+            f"pool: {'yes' if settings_dict['OPTIONS'].get('pool') else 'no'}"
+        )
+        for name, stats in connection_stats.snapshot().items():
+            self.stdout.write(
+                f"{name}: {stats['acquired']} connections acquired, {stats['failed']} failed, "
+                f"mean={stats['mean_ms']:.1f}ms p95={stats['p95_ms']:.1f}ms max={stats['max_ms']:.1f}ms"
+            )
+        stats = pool_stats(connections[alias])
+        if stats is None:
+            self.stdout.write('not pooled: each thread keeps its own connection for CONN_MAX_AGE seconds')
+            return
+        self.stdout.write(
+            f"pool: size={stats.get('pool_size')} available={stats.get('pool_available')} "
+            f"max={stats.get('pool_max')} peak saturation={peak['saturation']:.0%} "
+            f"peak waiting={peak['requests_waiting']} timeouts={stats.get('requests_errors', 0)}"
+        )
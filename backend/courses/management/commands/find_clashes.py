@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from courses.clashes import INSTRUCTOR, ROOM, describe, find_clashes
+
+
+class Command(BaseCommand):
+    help = 'List meetings that double-book a room or an instructor'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=[ROOM, INSTRUCTOR])
+        parser.add_argument('--limit', type=int, default=50, help='Print at most this many clashes; 0 prints all.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        clashes = find_clashes()
+        elapsed = (time.perf_counter() - started) * 1000
+        if options['kind']:
+            clashes = {clash for clash in clashes if clash[0] == options['kind']}
+        shown = sorted(clashes)[:options['limit'] or None]
+        for clash in describe(shown):
+            first, second = clash['meetings']
+            self.stdout.write(
+                f"{clash['kind']} {clash['resource']!r} {clash['day']}: "
+                f"section {first['section']} {first['start_time']:%H:%M}-{first['end_time']:%H:%M} / "
+                f"section {second['section']} {second['start_time']:%H:%M}-{second['end_time']:%H:%M}"
+            )
+        if len(shown) < len(clashes):
+            self.stdout.write(f'... {len(clashes) - len(shown)} more')
+        self.stdout.write(self.style.SUCCESS(f'{len(clashes)} clashes found in {elapsed:.1f} ms.'))
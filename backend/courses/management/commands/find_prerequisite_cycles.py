@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from courses.models import Course
+from courses.prerequisites import graph_cycles
+
+
+class Command(BaseCommand):
+    help = 'List courses whose prerequisites form a cycle, so no student can ever take them'
+
+    def handle(self, *args, **options):
+        cycles = graph_cycles()
+        names = Course.objects.in_bulk([course_id for cycle in cycles for course_id in cycle])
+        for cycle in cycles:
+            self.stdout.write(', '.join(f'{course_id} {names[course_id].name!r}' for course_id in cycle))
+        style = self.style.WARNING if cycles else self.style.SUCCESS
+        self.stdout.write(style(f'{len(cycles)} prerequisite cycles found.'))
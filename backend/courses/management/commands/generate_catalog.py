@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.models import Course, Section, SectionTime
+from courses.synthetic import generate_catalog, generate_students
+
+
+class Command(BaseCommand):
+    help = (
+        'Fill the configured database with a seeded synthetic catalog, requisite DAG and student accounts, '
+        'for load tests and benchmarks. Writes bypass the catalog change log.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--courses', type=int, default=1000)
+        parser.add_argument('--sections-per-course', type=int, default=5)
+        parser.add_argument('--times-per-section', type=int, default=2)
+        parser.add_argument('--max-prerequisites', type=int, default=3, help='Per course, drawn from lower ids.')
+        parser.add_argument('--corequisite-ratio', type=float, default=0.02)
+        parser.add_argument('--first-course-id', type=int, default=1)
+        parser.add_argument('--students', type=int, default=1000)
+        parser.add_argument('--password', default='Student-Pass-1', help='Shared by every generated student.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        first, count = options['first_course_id'], options['courses']
+        if Course.objects.filter(id__gte=first, id__lt=first + count).exists():
+            raise CommandError(f'Courses {first}..{first + count - 1} already exist; pick another --first-course-id.')
+        started = time.perf_counter()
+        generate_catalog(
+            count, options['sections_per_course'], options['times_per_section'], first_course_id=first,
+            seed=options['seed'], max_prerequisites=options['max_prerequisites'],
+            corequisite_ratio=options['corequisite_ratio'],
+        )
+        courses = Course.objects.filter(id__gte=first, id__lt=first + count)
+        self.stdout.write(
+            f'catalog: {count} courses, {Section.objects.filter(course__in=courses).count()} sections, '
+            f'{SectionTime.objects.filter(section__course__in=courses).count()} meeting times, '
+            f'{Course.prerequisites.through.objects.filter(from_course__in=courses).count()} prerequisites, '
+            f'{Course.corequisites.through.objects.filter(from_course__in=courses).count()} corequisites'
+        )
+        if options['students']:
+            report = generate_students(options['students'], options['password'], seed=options['seed'])
+            self.stdout.write(f'students: {report.created} created, {report.skipped} already existed')
+        self.stdout.write(self.style.SUCCESS(f'Generated in {time.perf_counter() - started:.2f}s.'))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.importer import COLUMNS, CatalogImportError, import_catalog, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        'Import a term catalog from CSV, JSON Lines, JSON or XLSX, one row per meeting time with the columns: '
+        + ', '.join(COLUMNS)
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl', 'json', 'xlsx'], help='Defaults to the file extension.')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Courses written per transaction.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per INSERT statement.')
+        parser.add_argument(
+            '--prune', action='store_true',
+            help='Delete sections and meeting times of imported courses that are not in the file.',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            report = import_catalog(
+                read_rows(options['path'], options['format']),
+                chunk_size=options['chunk_size'], batch_size=options['batch_size'], prune=options['prune'],
+            )
+        except CatalogImportError as error:
+            for message in error.errors[:50]:
+                self.stderr.write(message)
+            raise CommandError(f'Import aborted: {error}')
+        except (OSError, ValueError) as error:
+            raise CommandError(f'Could not read {options["path"]}: {error}')
+
+        for label, counts in (('created', report.created), ('updated', report.updated), ('deleted', report.deleted)):
+            self.stdout.write(f'{label}: ' + ', '.join(f'{count} {name}' for name, count in counts.items()))
+        self.stdout.write(f'requisite links: +{report.requisites_added} -{report.requisites_removed}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {report.rows} rows in {report.seconds:.2f}s ({report.rows_per_second:.0f} rows/s).'
+        ))
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0003_catalog_changes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['name', 'id'], name='courses_cou_name_5eefc4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['units', 'id'], name='courses_cou_units_2604c9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='section',
+            index=models.Index(fields=['section_number', 'id'], name='courses_sec_section_fc2320_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='section',
+            index=models.Index(fields=['capacity', 'id'], name='courses_sec_capacit_c9d63c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sectiontime',
+            index=models.Index(fields=['day', 'start_time', 'id'], name='courses_sec_day_f59887_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sectiontime',
+            index=models.Index(fields=['start_time', 'id'], name='courses_sec_start_t_ebd4a9_idx'),
+        ),
+    ]
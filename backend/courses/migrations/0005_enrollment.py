@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0002_alter_userprofile_student_id'),
+        ('courses', '0004_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Enrollment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('enrolled', 'Enrolled'), ('waitlisted', 'Waitlisted')], max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('section', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='enrollments', to='courses.section')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='enrollments', to='authentication.userprofile')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['section', 'status', 'created_at'], name='courses_enr_section_a0e681_idx')],
+                'constraints': [models.UniqueConstraint(fields=('student', 'section'), name='unique_student_section_enrollment')],
+            },
+        ),
+    ]
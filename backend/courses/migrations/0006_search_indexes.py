@@ -0,0 +1,42 @@
+from django.db import migrations
+
+# pg_trgm GIN indexes for catalog search: one on the column for the
+# word-similarity operator, one on UPPER(column) for Django's icontains
+# (UPPER(col) LIKE UPPER('%term%')). Other databases fall back to the
+# in-process index in courses.search and skip this.
+INDEXES = [
+    ('courses_course_name_trgm', 'courses_course', 'name'),
+    ('courses_course_name_upper_trgm', 'courses_course', '(UPPER(name))'),
+    ('courses_section_instructor_trgm', 'courses_section', 'instructor'),
+    ('courses_section_instructor_upper_trgm', 'courses_section', '(UPPER(instructor))'),
+    ('courses_sectiontime_location_trgm', 'courses_sectiontime', 'location'),
+    ('courses_sectiontime_location_upper_trgm', 'courses_sectiontime', '(UPPER(location))'),
+]
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, expression in INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin ({expression} gin_trgm_ops)'
+        )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _ in INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0005_enrollment'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
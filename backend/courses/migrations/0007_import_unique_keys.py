@@ -0,0 +1,21 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0006_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='section',
+            constraint=models.UniqueConstraint(fields=('course', 'section_number'), name='unique_course_section_number'),
+        ),
+        migrations.AddConstraint(
+            model_name='sectiontime',
+            constraint=models.UniqueConstraint(fields=('section', 'day', 'start_time'), name='unique_section_meeting'),
+        ),
+    ]
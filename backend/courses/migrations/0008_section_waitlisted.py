@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:29
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_waitlists(apps, schema_editor):
+    Enrollment = apps.get_model('courses', 'Enrollment')
+    Section = apps.get_model('courses', 'Section')
+    waiting = (
+        Enrollment.objects.filter(section=OuterRef('pk'), status='waitlisted')
+        .values('section').annotate(count=Count('pk')).values('count')
+    )
+    Section.objects.update(waitlisted=Coalesce(Subquery(waiting, output_field=models.IntegerField()), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0007_import_unique_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='section',
+            name='waitlisted',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(count_waitlists, migrations.RunPython.noop),
+    ]
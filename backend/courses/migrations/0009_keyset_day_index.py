@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-18 20:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0008_section_waitlisted'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sectiontime',
+            index=models.Index(fields=['day', 'id'], name='courses_sec_day_2b11fb_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.5 on 2026-10-18 20:29
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0009_keyset_day_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='section',
+            index=models.Index(django.db.models.functions.text.Lower(django.db.models.functions.text.Trim('instructor')), name='courses_section_teacher_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sectiontime',
+            index=models.Index(django.db.models.functions.text.Lower(django.db.models.functions.text.Trim('location')), models.F('day'), name='courses_time_room_day_idx'),
+        ),
+    ]
@@ -1,4 +1,13 @@
 from django.db import models
+from django.db.models.functions import Lower, Trim
+
+class CourseQuerySet(models.QuerySet):
+    def with_catalog_tree(self):
+        return self.prefetch_related(
+            'prerequisites',
+            'corequisites',
+            models.Prefetch('sections', queryset=Section.objects.prefetch_related('times')),
+        )
 
 class Course(models.Model):
     id = models.IntegerField(primary_key=True)
@@ -7,15 +16,42 @@ class Course(models.Model):
     prerequisites = models.ManyToManyField('self', blank=True, symmetrical=False, related_name='prereq_for')
     corequisites = models.ManyToManyField('self', blank=True, symmetrical=False, related_name='coreq_for')
 
+    objects = CourseQuerySet.as_manager()
+
+    class Meta:
+        # One index per ordering offered by the API, ending in the keyset tie-breaker.
+        indexes = [
+            models.Index(fields=['name', 'id']),
+            models.Index(fields=['units', 'id']),
+        ]
+
     def __str__(self):
         return self.name
 
+class SectionQuerySet(models.QuerySet):
+    def with_times(self):
+        return self.select_related('course').prefetch_related('times')
+
 class Section(models.Model):
-    course = models.ForeignKey(Course, on_delete=models.CASCADE)
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='sections')
     section_number = models.IntegerField()
     instructor = models.CharField(max_length=100, blank=True)
     capacity = models.IntegerField(default=0)
     enrolled = models.IntegerField(default=0)
+    waitlisted = models.IntegerField(default=0)
+
+    objects = SectionQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['course', 'section_number'], name='unique_course_section_number'),
+        ]
+        indexes = [
+            models.Index(fields=['section_number', 'id']),
+            models.Index(fields=['capacity', 'id']),
+            # Clash detection looks instructors up by their normalized name.
+            models.Index(Lower(Trim('instructor')), name='courses_section_teacher_idx'),
+        ]
 
     def __str__(self):
         return f"{self.course.name} - Section {self.section_number}"
@@ -31,11 +67,70 @@ class SectionTime(models.Model):
         ('fri', 'Friday'),
     ]
     
-    section = models.ForeignKey(Section, on_delete=models.CASCADE)
+    section = models.ForeignKey(Section, on_delete=models.CASCADE, related_name='times')
     day = models.CharField(max_length=3, choices=DAYS_CHOICES)
     start_time = models.TimeField()
     end_time = models.TimeField()
     location = models.CharField(max_length=100, blank=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['section', 'day', 'start_time'], name='unique_section_meeting'),
+        ]
+        indexes = [
+            models.Index(fields=['day', 'id']),
+            models.Index(fields=['day', 'start_time', 'id']),
+            models.Index(fields=['start_time', 'id']),
+            models.Index(Lower(Trim('location')), 'day', name='courses_time_room_day_idx'),
+        ]
+
     def __str__(self):
         return f"{self.section} - {self.day} {self.start_time}-{self.end_time}"
+
+class CatalogChange(models.Model):
+    KIND_CHOICES = [
+        ('course', 'Course'),
+        ('section', 'Section'),
+        ('section_time', 'Section time'),
+    ]
+
+    version = models.BigAutoField(primary_key=True)
+    kind = models.CharField(max_length=12, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    deleted = models.BooleanField(default=False)
+    changed_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['kind', 'object_id', 'version'])]
+
+    def __str__(self):
+        return f"{self.version}: {'delete' if self.deleted else 'upsert'} {self.kind} {self.object_id}"
+
+class CatalogCompaction(models.Model):
+    purged_through = models.BigIntegerField()
+    compacted_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Tombstones purged through version {self.purged_through}"
+
+class Enrollment(models.Model):
+    ENROLLED = 'enrolled'
+    WAITLISTED = 'waitlisted'
+    STATUS_CHOICES = [
+        (ENROLLED, 'Enrolled'),
+        (WAITLISTED, 'Waitlisted'),
+    ]
+
+    student = models.ForeignKey('authentication.UserProfile', on_delete=models.CASCADE, related_name='enrollments')
+    section = models.ForeignKey(Section, on_delete=models.CASCADE, related_name='enrollments')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'section'], name='unique_student_section_enrollment'),
+        ]
+        indexes = [models.Index(fields=['section', 'status', 'created_at'])]
+
+    def __str__(self):
+        return f"{self.student} - {self.section} ({self.status})"
@@ -0,0 +1,131 @@
+"""
+Room occupancy as a NumPy matrix for free-room and utilization queries.
+
+Meetings are rasterized into a boolean array of rooms x days x 5-minute
+slots, so "which rooms are free" is one slice reduced with ``any`` and a
+utilization heatmap is a few sums over axes. Each worker keeps the matrix
+until a meeting time changes, which bumps ``TIMES_GENERATION_KEY``, or
+without a shared cache for at most ``LOCAL_STATE_TTL`` seconds.
+"""
+import threading
+
+import numpy as np
+from django.db import transaction
+
+from .clashes import resource_key
+from .models import SectionTime
+from .versioning import bump_counter, read_generation
+
+TIMES_GENERATION_KEY = 'courses:section-times:generation'
+SLOT_MINUTES = 5
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+DAYS = [code for code, _ in SectionTime.DAYS_CHOICES]
+DAY_INDEX = {day: position for position, day in enumerate(DAYS)}
+
+
+def slot_floor(value):
+    return (value.hour * 60 + value.minute) // SLOT_MINUTES
+
+
+def slot_ceil(value):
+    return -(-(value.hour * 60 + value.minute + (value.second > 0)) // SLOT_MINUTES)
+
+
+def slot_time(index):
+    minutes = index * SLOT_MINUTES
+    return f'{minutes // 60:02d}:{minutes % 60:02d}'
+
+
+class OccupancyMatrix:
+    """``busy[room, day, slot]`` is true while any meeting uses the room.
+
+    Meetings are widened to whole slots, so a room counts as busy for the
+    full slot a meeting starts or ends in. Rooms match the way clash
+    detection does (case and surrounding spaces ignored) and are reported
+    with the spelling of their first meeting.
+    """
+
+    def __init__(self, meetings):
+        index = {}
+        rooms = []
+        cells = []
+        for day, start, end, location in meetings:
+            if not location.strip():
+                continue
+            key = resource_key(location)
+            if key not in index:
+                index[key] = len(rooms)
+                rooms.append(location.strip())
+            base = (index[key] * len(DAYS) + DAY_INDEX[day]) * (SLOTS_PER_DAY + 1)
+            cells.append((base + slot_floor(start), base + slot_ceil(end)))
+        self.rooms = rooms
+        self.index = index
+        # Mark where each meeting starts (+1) and ends (-1); a running sum
+        # along the slot axis then counts the meetings using each slot.
+        size = len(rooms) * len(DAYS) * (SLOTS_PER_DAY + 1)
+        starts, ends = np.array(cells, dtype=np.int64).reshape(-1, 2).T
+        delta = np.bincount(starts, minlength=size) - np.bincount(ends, minlength=size)
+        counts = delta.reshape(len(rooms), len(DAYS), SLOTS_PER_DAY + 1).cumsum(axis=2)
+        self.busy = counts[:, :, :SLOTS_PER_DAY] > 0
+
+    @classmethod
+    def from_database(cls):
+        return cls(SectionTime.objects.order_by('id').values_list('day', 'start_time', 'end_time', 'location')
+                   .iterator(chunk_size=5000))
+
+    def free_rooms(self, day, start, end):
+        """Rooms with no meeting on ``day`` between ``start`` and ``end``."""
+        window = self.busy[:, DAY_INDEX[day], slot_floor(start):slot_ceil(end)]
+        return [self.rooms[room] for room in np.flatnonzero(~window.any(axis=1))]
+
+    def utilization(self, start, end, bucket_minutes=60, rooms=None):
+        """Busy share of the ``start``-``end`` window per room and day, and a campus heatmap.
+
+        The heatmap holds, per day and ``bucket_minutes`` bucket, the share
+        of room-slots in use; the last bucket is shorter when the window
+        does not divide evenly.
+        """
+        first, last = slot_floor(start), slot_ceil(end)
+        busy = self.busy[:, :, first:last]
+        if rooms is not None:
+            busy = busy[[self.index[key] for key in rooms]]
+        names = [self.rooms[self.index[key]] for key in rooms] if rooms is not None else self.rooms
+        per_room = busy.mean(axis=2)
+        edges = np.arange(0, last - first, bucket_minutes // SLOT_MINUTES)
+        widths = np.diff(np.append(edges, last - first))
+        in_use = np.add.reduceat(busy.sum(axis=0), edges, axis=1)
+        heatmap = in_use / (widths * max(len(names), 1))
+        return {
+            'buckets': [slot_time(first + edge) for edge in edges],
+            'heatmap': {day: [round(float(value), 4) for value in heatmap[position]] for position, day in enumerate(DAYS)},
+            'rooms': [
+                {
+                    'room': name,
+                    'overall': round(float(per_room[position].mean()), 4),
+                    'days': {day: round(float(per_room[position, column]), 4) for column, day in enumerate(DAYS)},
+                }
+                for position, name in enumerate(names)
+            ],
+        }
+
+
+def bump_times_generation():
+    return bump_counter(TIMES_GENERATION_KEY)
+
+
+def times_changed():
+    """Retire every worker's matrix once the caller's transaction commits."""
+    transaction.on_commit(bump_times_generation)
+
+
+_matrix_lock = threading.Lock()
+_matrix = (None, None)
+
+
+def occupancy():
+    global _matrix
+    generation = read_generation(TIMES_GENERATION_KEY)
+    with _matrix_lock:
+        if _matrix[0] != generation:
+            _matrix = (generation, OccupancyMatrix.from_database())
+        return _matrix[1]
@@ -0,0 +1,164 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import date, datetime, time
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def _encode_value(value):
+    if isinstance(value, (date, datetime, time)):
+        return value.isoformat()
+    return value
+
+
+class KeysetPagination(BasePagination):
+    """Seek pagination over the view's ordering plus ``id`` as a tie-breaker.
+
+    The cursor carries the ordering values of the last row of a page, and the
+    next page is fetched with ``(a, b, id) > (x, y, z)`` expanded into plain
+    comparisons, so every page is an index range scan instead of an
+    ``OFFSET`` and no ``COUNT(*)`` is issued. Rows inserted or reordered
+    while a client is paging cannot shift the pages it has not read yet.
+    """
+
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+    tiebreaker = 'id'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, 'ordering', None) or ()
+        for backend in getattr(view, 'filter_backends', []):
+            if hasattr(backend, 'get_ordering'):
+                ordering = backend().get_ordering(request, queryset, view) or ordering
+                break
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        fields = [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+        if self.tiebreaker not in {name for name, _ in fields}:
+            descending = fields[-1][1] if fields else False
+            fields.append((self.tiebreaker, descending))
+        return fields
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(urlsafe_b64decode(encoded.encode()))
+            values = list(cursor['v'])
+            if len(values) != len(self.fields) or None in values:
+                raise ValueError
+            # Values reach SQL comparisons, so each one must be a valid value of its column.
+            values = [
+                model._meta.get_field(name).to_python(value) for (name, _), value in zip(self.fields, values)
+            ]
+            return values, bool(cursor.get('r'))
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, values, reverse=False):
+        payload = {'v': [_encode_value(value) for value in values]}
+        if reverse:
+            payload['r'] = 1
+        encoded = urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    @staticmethod
+    def keyset_filter(fields, values, reverse):
+        # (f1, f2, ..., fn) after (v1, v2, ..., vn) in the requested directions.
+        condition = Q()
+        for position, (name, descending) in enumerate(fields):
+            lookup = 'lt' if descending != reverse else 'gt'
+            clause = Q(**{f'{name}__{lookup}': values[position]})
+            for previous, (previous_name, _) in enumerate(fields[:position]):
+                clause &= Q(**{previous_name: values[previous]})
+            condition |= clause
+        if len(fields) > 1:
+            # The disjunction alone gives the planner no index bound; f1 >= v1 makes the page a range scan.
+            name, descending = fields[0]
+            condition &= Q(**{f"{name}__{'lte' if descending != reverse else 'gte'}": values[0]})
+        return condition
+
+    def position_of(self, item):
+        if isinstance(item, dict):
+            return [item[name] for name, _ in self.fields]
+        return [getattr(item, name) for name, _ in self.fields]
+
+    def page_queryset(self, queryset, request, view=None):
+        """The queryset slice for the requested page; evaluate it and pass the rows to ``build_page``."""
+        self.base_url = request.build_absolute_uri()
+        self.fields = self.get_ordering(request, queryset, view)
+        self.size = self.get_page_size(request)
+        cursor = self.decode_cursor(request, queryset.model)
+        values, self.reverse = cursor if cursor else (None, False)
+        self.has_cursor = values is not None
+
+        order_by = [
+            ('-' if descending != self.reverse else '') + name
+            for name, descending in self.fields
+        ]
+        queryset = queryset.order_by(*order_by)
+        if values is not None:
+            queryset = queryset.filter(self.keyset_filter(self.fields, values, self.reverse))
+        return queryset[:self.size + 1]
+
+    def build_page(self, rows):
+        rows = list(rows)
+        has_more = len(rows) > self.size
+        rows = rows[:self.size]
+        if self.reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = self.has_cursor, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.has_cursor
+        self.page = rows
+        return rows
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.build_page(self.page_queryset(queryset, request, view))
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.position_of(self.page[-1]))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.position_of(self.page[0]), reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,339 @@
+"""
+Multi-term degree plans.
+
+``plan_courses`` takes the courses a student wants to finish and the ones
+already completed, adds every prerequisite and corequisite still missing,
+and splits them into the fewest terms of at most ``max_units`` units each.
+A course comes after all of its prerequisites and no earlier than the term
+of each of its corequisites.
+
+Fitting precedence-ordered courses into capped terms is NP-hard, so the
+planner first fills terms greedily, most urgent course first, where urgency
+is the length of the prerequisite chain a course still has to unlock. It
+then searches for a shorter plan, branching term by term over the maximal
+sets of courses that can be taken together. The search prunes on a lower
+bound (the longest remaining chain, and the remaining units over the cap),
+memoizes the fewest terms in which each set of completed courses was
+reached, and stops at the time budget with the best plan so far.
+
+Plans are cached per (courses, relevant completed courses, cap) until a
+course or requisite changes.
+"""
+import hashlib
+import json
+import math
+import threading
+import time
+from dataclasses import dataclass, field
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Course
+from .versioning import bump_counter, read_generation
+
+GENERATION_KEY = 'courses:planner:generation'
+PLAN_KEY = 'courses:plan:{generation}:{digest}'
+PLAN_TIMEOUT = 60 * 60 * 24
+
+
+class UnknownCourses(Exception):
+    def __init__(self, course_ids):
+        self.course_ids = sorted(course_ids)
+        super().__init__(self.course_ids)
+
+
+def _bits(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class PlanningCatalog:
+    """Units, prerequisites and corequisites of every course, keyed by course id."""
+
+    def __init__(self, units, prerequisites=(), corequisites=()):
+        self.units = dict(units)
+        self.prerequisites = {}
+        self.corequisites = {}
+        for course_id, other_id in prerequisites:
+            self.prerequisites.setdefault(course_id, set()).add(other_id)
+        for course_id, other_id in corequisites:
+            self.corequisites.setdefault(course_id, set()).add(other_id)
+
+    @classmethod
+    def from_db(cls):
+        return cls(
+            Course.objects.values_list('id', 'units'),
+            Course.prerequisites.through.objects.values_list('from_course_id', 'to_course_id'),
+            Course.corequisites.through.objects.values_list('from_course_id', 'to_course_id'),
+        )
+
+    def requirements(self, course_id):
+        return self.prerequisites.get(course_id, set()) | self.corequisites.get(course_id, set())
+
+    def closure(self, course_ids, completed=frozenset()):
+        """``course_ids`` and everything they require, without looking behind completed courses."""
+        needed = set()
+        stack = [course_id for course_id in course_ids if course_id not in completed]
+        while stack:
+            course_id = stack.pop()
+            if course_id not in needed:
+                needed.add(course_id)
+                stack.extend(other_id for other_id in self.requirements(course_id) if other_id not in completed)
+        return needed
+
+
+@dataclass
+class Plan:
+    courses: list
+    max_units: int
+    terms: list = field(default_factory=list)
+    unplannable: list = field(default_factory=list)
+    lower_bound: int = 0
+    optimal: bool = True
+    truncated: bool = False
+    explored: int = 0
+
+    def as_dict(self):
+        return {
+            'courses': self.courses,
+            'max_units': self.max_units,
+            'terms': self.terms,
+            'unplannable': self.unplannable,
+            'lower_bound': self.lower_bound,
+            'optimal': self.optimal,
+            'truncated': self.truncated,
+        }
+
+
+class TermSearch:
+    """The needed courses as bit positions, most urgent first, and the search over them."""
+
+    def __init__(self, catalog, needed, max_units):
+        self.max_units = max_units
+        height = self._heights(catalog, needed)
+        self.ids = sorted(needed, key=lambda course_id: (-height[course_id], -catalog.units[course_id], course_id))
+        position = {course_id: index for index, course_id in enumerate(self.ids)}
+        self.height = [height[course_id] for course_id in self.ids]
+        self.units = [catalog.units[course_id] for course_id in self.ids]
+        self.requires = [self._mask(catalog.prerequisites.get(course_id, ()), position) for course_id in self.ids]
+        # Each course with every needed corequisite it pulls in, directly or not: they are taken together.
+        coreqs = [self._mask(catalog.corequisites.get(course_id, ()), position) for course_id in self.ids]
+        self.group = []
+        for index in range(len(self.ids)):
+            group = pending = 1 << index
+            while pending:
+                found = 0
+                for member in _bits(pending):
+                    found |= coreqs[member]
+                pending = found & ~group
+                group |= found
+            self.group.append(group)
+        self.full = (1 << len(self.ids)) - 1
+        self.deadline = None
+        self.expired = False
+        self.steps = 0
+
+    @staticmethod
+    def _mask(course_ids, position):
+        mask = 0
+        for course_id in course_ids:
+            if course_id in position:
+                mask |= 1 << position[course_id]
+        return mask
+
+    @staticmethod
+    def _heights(catalog, needed):
+        # Terms from each course to the end of the longest prerequisite chain it starts; Kahn's
+        # algorithm from the last courses backwards. Courses on or behind a cycle keep height 0.
+        dependents = {course_id: [] for course_id in needed}
+        for course_id in needed:
+            for prerequisite_id in catalog.prerequisites.get(course_id, ()):
+                if prerequisite_id in needed:
+                    dependents[prerequisite_id].append(course_id)
+        pending = {course_id: len(dependents[course_id]) for course_id in needed}
+        height = dict.fromkeys(needed, 0)
+        ready = [course_id for course_id, count in pending.items() if count == 0]
+        while ready:
+            course_id = ready.pop()
+            height[course_id] = 1 + max((height[other_id] for other_id in dependents[course_id]), default=0)
+            for prerequisite_id in catalog.prerequisites.get(course_id, ()):
+                if prerequisite_id in pending:
+                    pending[prerequisite_id] -= 1
+                    if pending[prerequisite_id] == 0:
+                        ready.append(prerequisite_id)
+        return height
+
+    def units_of(self, mask):
+        return sum(self.units[index] for index in _bits(mask))
+
+    def _groups(self, done):
+        """Takeable group per course not yet done: its corequisites are free to take with it."""
+        available = 0
+        for index in _bits(self.full & ~done):
+            if not self.requires[index] & ~done:
+                available |= 1 << index
+        groups = []
+        for index in _bits(available):
+            group = self.group[index] & ~done
+            if not group & ~available and self.units_of(group) <= self.max_units:
+                groups.append(group)
+        return groups
+
+    def greedy_term(self, done):
+        chosen = units = 0
+        for group in self._groups(done):
+            extra = group & ~chosen
+            if extra and units + self.units_of(extra) <= self.max_units:
+                chosen |= group
+                units += self.units_of(extra)
+        return chosen
+
+    def term_choices(self, done):
+        """Every maximal set of groups that fits in one term, most urgent courses first.
+
+        Only maximal sets matter: taking a course earlier never delays the rest of a plan.
+        """
+        groups = self._groups(done)
+        group_units = [self.units_of(group) for group in groups]
+        later_units = [sum(group_units[position:]) for position in range(len(groups) + 1)]
+        seen = set()
+
+        def extend(position, chosen, units):
+            self.steps += 1
+            if self.steps & 0x3FF == 0 and self.deadline is not None and time.monotonic() > self.deadline:
+                self.expired = True
+            if self.expired:
+                return
+            if position == len(groups):
+                for group in groups:
+                    extra = group & ~chosen
+                    if extra and units + self.units_of(extra) <= self.max_units:
+                        return
+                if chosen and chosen not in seen:
+                    seen.add(chosen)
+                    yield chosen
+                return
+            group = groups[position]
+            extra = group & ~chosen
+            extra_units = self.units_of(extra)
+            fits = extra and units + extra_units <= self.max_units
+            if fits:
+                yield from extend(position + 1, chosen | group, units + extra_units)
+            # Leaving out a group that fits only leads to a maximal set if the later ones fill its room.
+            if not fits or units + later_units[position + 1] > self.max_units - extra_units:
+                yield from extend(position + 1, chosen, units)
+
+        return extend(0, 0, 0)
+
+    def greedy_plan(self):
+        terms = []
+        done = 0
+        while done != self.full:
+            term = self.greedy_term(done)
+            if not term:
+                # The rest sit on a prerequisite cycle, exceed the cap, or wait on such a course.
+                break
+            terms.append(term)
+            done |= term
+        return terms
+
+    def lower_bound(self, done, units_left):
+        remaining = self.full & ~done
+        if not remaining:
+            return 0
+        # Positions are ordered by height, so the lowest remaining bit has the longest chain.
+        longest = self.height[(remaining & -remaining).bit_length() - 1]
+        return max(longest, math.ceil(units_left / self.max_units))
+
+
+def build_plan(catalog, course_ids, completed, max_units, time_budget=1.0):
+    plan = Plan(courses=sorted(course_ids), max_units=max_units)
+    search = TermSearch(catalog, catalog.closure(course_ids, set(completed)), max_units)
+    greedy = search.greedy_plan()
+    placed = set()
+    for term in greedy:
+        placed.update(search.ids[index] for index in _bits(term))
+    plan.unplannable = sorted(set(search.ids) - placed)
+    if plan.unplannable:
+        # Chain lengths through the unplannable courses would overstate the lower bound.
+        search = TermSearch(catalog, placed, max_units)
+        greedy = search.greedy_plan()
+    total_units = search.units_of(search.full)
+    plan.lower_bound = search.lower_bound(0, total_units)
+
+    best = greedy
+    if len(best) > plan.lower_bound:
+        search.deadline = time.monotonic() + time_budget
+        reached = {}
+        terms = []
+
+        def explore(done, units_left):
+            nonlocal best
+            plan.explored += 1
+            if done == search.full:
+                best = list(terms)
+                return
+            if len(terms) + search.lower_bound(done, units_left) >= len(best):
+                return
+            # Memoization: reaching the same completed set again in as many terms or more cannot help.
+            if reached.get(done, math.inf) <= len(terms):
+                return
+            reached[done] = len(terms)
+            for term in search.term_choices(done):
+                terms.append(term)
+                explore(done | term, units_left - search.units_of(term))
+                terms.pop()
+                if search.expired or len(best) == plan.lower_bound:
+                    return
+
+        explore(0, total_units)
+        plan.truncated = search.expired
+    plan.optimal = len(best) == plan.lower_bound or not plan.truncated
+    plan.terms = [
+        {'courses': sorted(search.ids[index] for index in _bits(term)), 'units': search.units_of(term)}
+        for term in best
+    ]
+    return plan
+
+
+_lock = threading.Lock()
+_catalog = None
+_generation = None
+
+
+def current_catalog():
+    global _catalog, _generation
+    generation = read_generation(GENERATION_KEY)
+    with _lock:
+        if _catalog is None or generation != _generation:
+            _catalog = PlanningCatalog.from_db()
+            _generation = generation
+        return _catalog, generation
+
+
+def bump_planner_generation():
+    return bump_counter(GENERATION_KEY)
+
+
+def plans_changed():
+    """Retire cached plans and every worker's planning catalog once the caller's transaction commits."""
+    transaction.on_commit(bump_planner_generation)
+
+
+def plan_courses(course_ids, completed=(), max_units=18, time_budget=1.0):
+    catalog, generation = current_catalog()
+    unknown = (set(course_ids) | set(completed)) - catalog.units.keys()
+    if unknown:
+        raise UnknownCourses(unknown)
+    # Completed courses the plan could never need do not change it, so they stay out of the key.
+    relevant = set(completed) & catalog.closure(course_ids)
+    digest = hashlib.sha1(json.dumps([sorted(set(course_ids)), sorted(relevant), max_units]).encode()).hexdigest()
+    key = PLAN_KEY.format(generation=generation, digest=digest)
+    result = cache.get(key)
+    if result is None:
+        result = build_plan(catalog, set(course_ids), relevant, max_units, time_budget).as_dict()
+        cache.set(key, result, PLAN_TIMEOUT)
+    return result
@@ -0,0 +1,215 @@
+import threading
+from functools import cached_property
+
+from .models import Course
+from .versioning import bump_counter, read_generation, worker_generation
+
+GENERATION_KEY = 'courses:prerequisite-graph:generation'
+
+
+class PrerequisiteGraph:
+    """In-memory view of ``Course.prerequisites``.
+
+    ``requires[c]`` holds the direct prerequisites of ``c`` and ``unlocks[p]``
+    the courses that list ``p`` as a prerequisite. The topological order, the
+    cycles and the transitive closure are derived lazily and dropped whenever
+    an edge or course changes.
+    """
+
+    def __init__(self, course_ids=(), edges=()):
+        self.requires = {course_id: set() for course_id in course_ids}
+        self.unlocks = {course_id: set() for course_id in course_ids}
+        for course_id, prerequisite_id in edges:
+            self._link(course_id, prerequisite_id)
+
+    @classmethod
+    def from_db(cls):
+        Through = Course.prerequisites.through
+        return cls(
+            Course.objects.values_list('id', flat=True),
+            Through.objects.values_list('from_course_id', 'to_course_id'),
+        )
+
+    def _link(self, course_id, prerequisite_id):
+        self.requires.setdefault(course_id, set()).add(prerequisite_id)
+        self.unlocks.setdefault(course_id, set())
+        self.requires.setdefault(prerequisite_id, set())
+        self.unlocks.setdefault(prerequisite_id, set()).add(course_id)
+
+    def _reset(self):
+        for name in ('_analysis', 'roots', 'closure'):
+            self.__dict__.pop(name, None)
+
+    def add_course(self, course_id):
+        if course_id not in self.requires:
+            self.requires[course_id] = set()
+            self.unlocks[course_id] = set()
+            self._reset()
+
+    def remove_course(self, course_id):
+        for prerequisite_id in self.requires.pop(course_id, ()):
+            self.unlocks[prerequisite_id].discard(course_id)
+        for dependent_id in self.unlocks.pop(course_id, ()):
+            self.requires[dependent_id].discard(course_id)
+        self._reset()
+
+    def add_edges(self, edges):
+        for course_id, prerequisite_id in edges:
+            self._link(course_id, prerequisite_id)
+        self._reset()
+
+    def remove_edges(self, edges):
+        for course_id, prerequisite_id in edges:
+            self.requires.get(course_id, set()).discard(prerequisite_id)
+            self.unlocks.get(prerequisite_id, set()).discard(course_id)
+        self._reset()
+
+    @cached_property
+    def _analysis(self):
+        # Kahn's algorithm: whatever cannot be ordered sits on or behind a cycle.
+        pending = {course_id: len(prerequisites) for course_id, prerequisites in self.requires.items()}
+        ready = sorted(course_id for course_id, count in pending.items() if count == 0)
+        order = []
+        while ready:
+            course_id = ready.pop()
+            order.append(course_id)
+            for dependent_id in self.unlocks[course_id]:
+                pending[dependent_id] -= 1
+                if pending[dependent_id] == 0:
+                    ready.append(dependent_id)
+        blocked = {course_id for course_id, count in pending.items() if count}
+        return order, self._find_cycles(blocked)
+
+    def _find_cycles(self, blocked):
+        # Tarjan's strongly connected components restricted to the blocked courses.
+        index = {}
+        lowlink = {}
+        stack = []
+        on_stack = set()
+        cycles = []
+        counter = 0
+        for root in sorted(blocked):
+            if root in index:
+                continue
+            work = [(root, iter(sorted(self.requires[root] & blocked)))]
+            index[root] = lowlink[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack.add(root)
+            while work:
+                node, children = work[-1]
+                for child in children:
+                    if child not in index:
+                        index[child] = lowlink[child] = counter
+                        counter += 1
+                        stack.append(child)
+                        on_stack.add(child)
+                        work.append((child, iter(sorted(self.requires[child] & blocked))))
+                        break
+                    if child in on_stack:
+                        lowlink[node] = min(lowlink[node], index[child])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        lowlink[parent] = min(lowlink[parent], lowlink[node])
+                    if lowlink[node] == index[node]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component.append(member)
+                            if member == node:
+                                break
+                        if len(component) > 1 or node in self.requires[node]:
+                            cycles.append(sorted(component))
+        return cycles
+
+    @property
+    def topological_order(self):
+        """Courses ordered so every prerequisite precedes its dependents; cyclic courses are left out."""
+        return self._analysis[0]
+
+    @property
+    def cycles(self):
+        return self._analysis[1]
+
+    @cached_property
+    def roots(self):
+        return frozenset(course_id for course_id, prerequisites in self.requires.items() if not prerequisites)
+
+    @cached_property
+    def closure(self):
+        """Every direct or indirect prerequisite of each orderable course."""
+        closure = {}
+        for course_id in self.topological_order:
+            ancestors = set()
+            for prerequisite_id in self.requires[course_id]:
+                ancestors.add(prerequisite_id)
+                ancestors |= closure[prerequisite_id]
+            closure[course_id] = frozenset(ancestors)
+        return closure
+
+    def all_prerequisites(self, course_id):
+        return self.closure.get(course_id, frozenset())
+
+    def eligible(self, completed):
+        """Courses not yet completed whose direct prerequisites are all in ``completed``.
+
+        Only courses without prerequisites and courses unlocked by a completed
+        course can qualify, so the work is proportional to the completed set
+        rather than to the catalog.
+        """
+        completed = set(completed)
+        candidates = set(self.roots)
+        for course_id in completed:
+            candidates |= self.unlocks.get(course_id, ())
+        return sorted(
+            course_id for course_id in candidates - completed
+            if self.requires[course_id] <= completed
+        )
+
+
+_lock = threading.Lock()
+_graph = None
+_generation = None
+
+
+def _current_graph():
+    # Other workers publish their changes by bumping the shared generation;
+    # a mismatch means this process missed one and must reload.
+    global _graph, _generation
+    generation = read_generation(GENERATION_KEY)
+    if _graph is None or generation != _generation:
+        _graph = PrerequisiteGraph.from_db()
+        _generation = generation
+    return _graph
+
+
+def eligible_courses(completed):
+    with _lock:
+        return _current_graph().eligible(completed)
+
+
+def graph_cycles():
+    with _lock:
+        return _current_graph().cycles
+
+
+def invalidate_graph():
+    global _graph
+    with _lock:
+        _graph = None
+        bump_counter(GENERATION_KEY)
+
+
+def update_graph(method, *args):
+    """Apply an incremental change to this process's graph and tell the other workers."""
+    global _graph, _generation
+    with _lock:
+        generation = bump_counter(GENERATION_KEY)
+        if _graph is not None and _generation == worker_generation(generation - 1):
+            getattr(_graph, method)(*args)
+            _generation = worker_generation(generation)
+        else:
+            _graph = None
@@ -0,0 +1,76 @@
+"""
+Read-only list serialization straight from ``values_list`` rows.
+
+Each function takes a (possibly sliced) queryset and returns the same dicts
+``CourseSerializer``, ``SectionSerializer`` and ``SectionTimeSerializer``
+would, without building model instances or running per-field serializer
+code. Nested sections and times are fetched with one ``IN`` query per
+level, in id order.
+"""
+from .catalog import _related_ids
+from .models import Course, Section, SectionTime
+
+TIME_COLUMNS = ('id', 'day', 'start_time', 'end_time', 'location', 'section_id')
+SECTION_COLUMNS = ('id', 'section_number', 'instructor', 'capacity', 'enrolled', 'waitlisted', 'course_id')
+
+
+def _rows(queryset, columns):
+    return queryset.select_related(None).prefetch_related(None).values_list(*columns)
+
+
+def _time(row):
+    time_id, day, start_time, end_time, location, section_id = row
+    return {
+        'id': time_id,
+        'day': day,
+        'start_time': start_time.isoformat(),
+        'end_time': end_time.isoformat(),
+        'location': location,
+        'section': section_id,
+    }
+
+
+def section_time_list(queryset):
+    return [_time(row) for row in _rows(queryset, TIME_COLUMNS)]
+
+
+def section_list(queryset):
+    rows = list(_rows(queryset, SECTION_COLUMNS))
+    section_ids = [row[0] for row in rows]
+    times = {}
+    for row in _rows(SectionTime.objects.filter(section_id__in=section_ids).order_by('id'), TIME_COLUMNS):
+        times.setdefault(row[5], []).append(_time(row))
+    return [
+        {
+            'id': section_id,
+            'times': times.get(section_id, []),
+            'section_number': section_number,
+            'instructor': instructor,
+            'capacity': capacity,
+            'enrolled': enrolled,
+            'waitlisted': waitlisted,
+            'course': course_id,
+        }
+        for section_id, section_number, instructor, capacity, enrolled, waitlisted, course_id in rows
+    ]
+
+
+def course_list(queryset):
+    rows = list(_rows(queryset, ('id', 'name', 'units')))
+    course_ids = [row[0] for row in rows]
+    prerequisites = _related_ids(Course.prerequisites.through, course_ids)
+    corequisites = _related_ids(Course.corequisites.through, course_ids)
+    sections = {}
+    for section in section_list(Section.objects.filter(course_id__in=course_ids).order_by('id')):
+        sections.setdefault(section['course'], []).append(section)
+    return [
+        {
+            'id': course_id,
+            'prerequisites': prerequisites.get(course_id, []),
+            'corequisites': corequisites.get(course_id, []),
+            'sections': sections.get(course_id, []),
+            'name': name,
+            'units': units,
+        }
+        for course_id, name, units in rows
+    ]
@@ -0,0 +1,233 @@
+import heapq
+import time
+from dataclasses import dataclass, field
+
+from .models import Course, Section, SectionTime
+
+MINUTES_PER_DAY = 24 * 60
+DAY_INDEX = {code: index for index, (code, _) in enumerate(SectionTime.DAYS_CHOICES)}
+DAY_MASK = (1 << MINUTES_PER_DAY) - 1
+
+
+def time_range_mask(day, start_time, end_time):
+    """Bitmask of the minutes in [start_time, end_time) on the given day of the week."""
+    start = start_time.hour * 60 + start_time.minute
+    end = end_time.hour * 60 + end_time.minute
+    if end <= start:
+        return 0
+    offset = DAY_INDEX[day] * MINUTES_PER_DAY
+    return ((1 << (end - start)) - 1) << (offset + start)
+
+
+def day_masks(mask):
+    for day in range(len(DAY_INDEX)):
+        bits = (mask >> (day * MINUTES_PER_DAY)) & DAY_MASK
+        if bits:
+            yield bits
+
+
+def days_used(mask):
+    """Seven-bit set of the days of the week the mask touches."""
+    days = 0
+    for day in range(len(DAY_INDEX)):
+        if (mask >> (day * MINUTES_PER_DAY)) & DAY_MASK:
+            days |= 1 << day
+    return days
+
+
+@dataclass(frozen=True)
+class SectionSlot:
+    id: int
+    course_id: int
+    mask: int
+    capacity: int = 0
+    enrolled: int = 0
+
+    @property
+    def has_seats(self):
+        return self.enrolled < self.capacity
+
+
+@dataclass(order=True)
+class Schedule:
+    score: tuple
+    sections: tuple = field(compare=False)
+    days: int = field(compare=False)
+    gap_minutes: int = field(compare=False)
+
+    def as_dict(self):
+        return {
+            'sections': [{'course': slot.course_id, 'section': slot.id} for slot in self.sections],
+            'days': self.days,
+            'gap_minutes': self.gap_minutes,
+            'open_seats': sum(max(slot.capacity - slot.enrolled, 0) for slot in self.sections),
+        }
+
+
+@dataclass
+class ScheduleResult:
+    courses: list
+    schedules: list
+    unavailable: list = field(default_factory=list)
+    truncated: bool = False
+    explored: int = 0
+
+
+class ScheduleIndex:
+    """Sections of a set of courses compiled to weekly minute bitmasks.
+
+    Two sections clash exactly when ``a.mask & b.mask`` is non-zero, so the
+    solver never compares datetimes.
+    """
+
+    def __init__(self, slots, corequisites=None):
+        self.sections = {}
+        for slot in slots:
+            self.sections.setdefault(slot.course_id, []).append(slot)
+        self.corequisites = {course: set(coreqs) for course, coreqs in (corequisites or {}).items()}
+
+    @classmethod
+    def for_courses(cls, course_ids):
+        course_ids = set(course_ids)
+        corequisites = {}
+        pending = set(course_ids)
+        Through = Course.corequisites.through
+        while pending:
+            rows = Through.objects.filter(from_course_id__in=pending).values_list('from_course_id', 'to_course_id')
+            pending = set()
+            for course_id, coreq_id in rows:
+                corequisites.setdefault(course_id, set()).add(coreq_id)
+                if coreq_id not in course_ids:
+                    course_ids.add(coreq_id)
+                    pending.add(coreq_id)
+
+        masks = {}
+        times = SectionTime.objects.filter(section__course_id__in=course_ids).values_list(
+            'section_id', 'day', 'start_time', 'end_time'
+        )
+        for section_id, day, start_time, end_time in times:
+            masks[section_id] = masks.get(section_id, 0) | time_range_mask(day, start_time, end_time)
+
+        sections = Section.objects.filter(course_id__in=course_ids).values_list('id', 'course_id', 'capacity', 'enrolled')
+        slots = [
+            SectionSlot(id=section_id, course_id=course_id, mask=masks.get(section_id, 0), capacity=capacity, enrolled=enrolled)
+            for section_id, course_id, capacity, enrolled in sections
+        ]
+        return cls(slots, corequisites)
+
+    def with_corequisites(self, course_ids):
+        required = set(course_ids)
+        stack = list(required)
+        while stack:
+            for coreq in self.corequisites.get(stack.pop(), ()):
+                if coreq not in required:
+                    required.add(coreq)
+                    stack.append(coreq)
+        return required
+
+
+def score_schedule(slots):
+    mask = 0
+    for slot in slots:
+        mask |= slot.mask
+    days = 0
+    gaps = 0
+    for bits in day_masks(mask):
+        days += 1
+        first = (bits & -bits).bit_length() - 1
+        span = bits.bit_length() - first
+        gaps += span - bits.bit_count()
+    return days, gaps
+
+
+def generate_schedules(index, course_ids, limit=10, include_full=False, time_budget=1.0):
+    """Rank conflict-free section combinations, one section per course.
+
+    Courses are expanded with their corequisites so they are always
+    co-scheduled. Sections without free seats are skipped unless
+    ``include_full`` is set. Search stops after ``time_budget`` seconds and
+    reports the best schedules found so far.
+    """
+    courses = sorted(index.with_corequisites(course_ids))
+    candidates = {}
+    for course_id in courses:
+        slots = [slot for slot in index.sections.get(course_id, ()) if include_full or slot.has_seats]
+        # Trying compact sections first fills the ranking with good schedules
+        # early, which tightens the days bound below.
+        candidates[course_id] = sorted(
+            ((slot, days_used(slot.mask)) for slot in slots),
+            key=lambda item: item[1].bit_count(),
+        )
+    unavailable = [course_id for course_id in courses if not candidates[course_id]]
+    if unavailable:
+        return ScheduleResult(courses=courses, schedules=[], unavailable=unavailable)
+
+    # Most constrained course first keeps the branching factor low near the root.
+    order = sorted(courses, key=lambda course_id: len(candidates[course_id]))
+
+    # Flatten the candidates and precompute, for every section, the set of
+    # candidate sections it does not clash with. The search state is then the
+    # intersection of those sets, so both the overlap test and forward checking
+    # are single integer ANDs.
+    flat = []
+    course_bits = {}
+    for course_id in order:
+        bits = 0
+        for slot, slot_days in candidates[course_id]:
+            bits |= 1 << len(flat)
+            flat.append((slot, slot_days))
+        course_bits[course_id] = bits
+    compatible = []
+    for slot, _ in flat:
+        bits = 0
+        for position, (other, _) in enumerate(flat):
+            if other.course_id != slot.course_id and not slot.mask & other.mask:
+                bits |= 1 << position
+        compatible.append(bits)
+    positions = {
+        course_id: [position for position, (slot, _) in enumerate(flat) if slot.course_id == course_id]
+        for course_id in order
+    }
+
+    deadline = time.monotonic() + time_budget
+    best = []
+    result = ScheduleResult(courses=courses, schedules=[])
+    chosen = []
+
+    def search(depth, allowed, occupied_days):
+        result.explored += 1
+        if result.explored & 0x3FF == 0 and time.monotonic() > deadline:
+            result.truncated = True
+            return
+        if depth == len(order):
+            days, gaps = score_schedule(chosen)
+            schedule = Schedule(score=(-days, -gaps), sections=tuple(chosen), days=days, gap_minutes=gaps)
+            if len(best) < limit:
+                heapq.heappush(best, schedule)
+            elif schedule.score > best[0].score:
+                heapq.heapreplace(best, schedule)
+            return
+        remaining = order[depth + 1:]
+        for position in positions[order[depth]]:
+            if not allowed >> position & 1:
+                continue
+            slot, slot_days = flat[position]
+            taken_days = occupied_days | slot_days
+            # Days on campus only grow as sections are added, so once the
+            # ranking is full a branch that already uses more days than the
+            # worst kept schedule cannot improve it.
+            if len(best) == limit and taken_days.bit_count() > -best[0].score[0]:
+                continue
+            still_allowed = allowed & compatible[position]
+            # Forward check: every remaining course must keep a compatible section.
+            if not all(still_allowed & course_bits[course_id] for course_id in remaining):
+                continue
+            chosen.append(slot)
+            search(depth + 1, still_allowed, taken_days)
+            chosen.pop()
+            if result.truncated:
+                return
+
+    search(0, (1 << len(flat)) - 1, 0)
+    result.schedules = sorted(best, reverse=True)
+    return result
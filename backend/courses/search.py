@@ -0,0 +1,135 @@
+import re
+import threading
+
+from django.db import connection
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import Greatest
+
+from .catalog import content_generation
+from .models import Course, Section, SectionTime
+
+# (kind, model, searched field, course id path)
+TARGETS = [
+    ('course', Course, 'name', 'id'),
+    ('section', Section, 'instructor', 'course_id'),
+    ('section_time', SectionTime, 'location', 'section__course_id'),
+]
+SIMILARITY_THRESHOLD = 0.3
+WORD_PATTERN = re.compile(r'\w+')
+
+
+def normalize_query(query):
+    return ' '.join(query.split())[:100]
+
+
+def search_catalog(query, limit=20):
+    """Ranked, typo-tolerant matches on course names, instructors and locations."""
+    query = normalize_query(query)
+    if not query:
+        return []
+    if connection.vendor == 'postgresql':
+        hits = _search_postgres(query, limit)
+    else:
+        hits = _search_fallback(query, limit)
+    hits.sort(key=lambda hit: (-hit['score'], hit['kind'], hit['id']))
+    return hits[:limit]
+
+
+def _search_postgres(query, limit):
+    # Candidates come from the pg_trgm GIN indexes, which serve both ILIKE and
+    # the word-similarity operator; only those rows are ranked.
+    from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity
+
+    search_query = SearchQuery(query, config='simple', search_type='websearch')
+    hits = []
+    for kind, model, field, course_path in TARGETS:
+        rows = (
+            model.objects.filter(Q(**{f'{field}__icontains': query}) | Q(**{f'{field}__trigram_word_similar': query}))
+            .annotate(
+                score=Greatest(
+                    TrigramWordSimilarity(query, field),
+                    SearchRank(SearchVector(field, config='simple'), search_query),
+                    output_field=FloatField(),
+                ),
+                text=F(field),
+                course_ref=F(course_path),
+            )
+            .order_by('-score', 'id')
+            .values_list('id', 'text', 'course_ref', 'score')[:limit]
+        )
+        hits.extend(
+            {'kind': kind, 'field': field, 'id': object_id, 'text': text, 'course': course_id, 'score': score}
+            for object_id, text, course_id, score in rows
+        )
+    return hits
+
+
+def trigrams(text):
+    """pg_trgm-style trigrams: each word padded with two leading and one trailing space."""
+    grams = set()
+    for word in WORD_PATTERN.findall(text.lower()):
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(left, right):
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+class FallbackIndex:
+    """Distinct searched values with their trigrams, for databases without pg_trgm.
+
+    Values share a small vocabulary of words, so each query word is compared
+    with every distinct word once and values are scored from those results.
+    """
+
+    def __init__(self):
+        self.words = {}
+        self.entries = []
+        for kind, model, field, course_path in TARGETS:
+            values = {}
+            for object_id, text, course_id in model.objects.values_list('id', field, course_path).order_by('id'):
+                if text:
+                    values.setdefault(text, []).append((object_id, course_id))
+            for text, objects in values.items():
+                words = [self.words.setdefault(word, len(self.words)) for word in WORD_PATTERN.findall(text.lower())]
+                self.entries.append((kind, field, text, text.lower(), words, objects))
+        self.word_trigrams = [trigrams(word) for word in self.words]
+
+    def search(self, query, limit):
+        lowered = query.lower()
+        # Closest score of each query word against every word in the vocabulary.
+        closeness = []
+        for word in WORD_PATTERN.findall(lowered):
+            query_grams = trigrams(word)
+            closeness.append([similarity(query_grams, grams) for grams in self.word_trigrams])
+        hits = []
+        for kind, field, text, text_lower, words, objects in self.entries:
+            if lowered in text_lower:
+                score = 1.0
+            elif words and closeness:
+                score = sum(max(scores[word] for word in words) for scores in closeness) / len(closeness)
+            else:
+                continue
+            if score < SIMILARITY_THRESHOLD:
+                continue
+            for object_id, course_id in objects[:limit]:
+                hits.append({'kind': kind, 'field': field, 'id': object_id, 'text': text, 'course': course_id, 'score': score})
+        return hits
+
+
+_fallback_lock = threading.Lock()
+_fallback = (None, None)
+
+
+def _search_fallback(query, limit):
+    global _fallback
+    generation = content_generation()
+    with _fallback_lock:
+        if _fallback[0] != generation:
+            _fallback = (generation, FallbackIndex())
+        index = _fallback[1]
+    return index.search(query, limit)
@@ -1,19 +1,24 @@
+from datetime import time
+
 from rest_framework import serializers
-from .models import Course, Section, SectionTime
+from unipath_backend.metrics import TimedSerializerMixin
+from .models import Course, Enrollment, Section, SectionTime
 
-class SectionTimeSerializer(serializers.ModelSerializer):
+class SectionTimeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = SectionTime
         fields = '__all__'
 
-class SectionSerializer(serializers.ModelSerializer):
+class SectionSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     times = SectionTimeSerializer(many=True, read_only=True)
     
     class Meta:
         model = Section
         fields = '__all__'
+        # Seats are only taken or released through the enrollment endpoints.
+        read_only_fields = ['enrolled', 'waitlisted']
 
-class CourseSerializer(serializers.ModelSerializer):
+class CourseSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     prerequisites = serializers.PrimaryKeyRelatedField(many=True, queryset=Course.objects.all())
     corequisites = serializers.PrimaryKeyRelatedField(many=True, queryset=Course.objects.all())
     sections = SectionSerializer(many=True, read_only=True)
@@ -21,3 +26,79 @@ class CourseSerializer(serializers.ModelSerializer):
     class Meta:
         model = Course
         fields = '__all__'
+
+class BulkMeetingSerializer(serializers.Serializer):
+    day = serializers.ChoiceField(choices=SectionTime.DAYS_CHOICES)
+    start_time = serializers.TimeField()
+    end_time = serializers.TimeField()
+    location = serializers.CharField(max_length=100, allow_blank=True, default='')
+
+    def validate(self, attrs):
+        if attrs['end_time'] <= attrs['start_time']:
+            raise serializers.ValidationError({'end_time': 'Must be after start_time.'})
+        return attrs
+
+class BulkSectionSerializer(serializers.Serializer):
+    id = serializers.IntegerField(required=False)
+    course = serializers.IntegerField()
+    section_number = serializers.IntegerField(min_value=1)
+    instructor = serializers.CharField(max_length=100, allow_blank=True, default='')
+    capacity = serializers.IntegerField(min_value=0, default=0)
+    times = BulkMeetingSerializer(many=True, required=False)
+
+class BulkSectionTimeSerializer(BulkMeetingSerializer):
+    id = serializers.IntegerField(required=False)
+    section = serializers.IntegerField()
+
+class BulkSectionsRequestSerializer(serializers.Serializer):
+    upsert = BulkSectionSerializer(many=True, default=list, max_length=5000)
+    delete = serializers.ListField(child=serializers.IntegerField(), default=list, max_length=5000)
+
+class BulkSectionTimesRequestSerializer(serializers.Serializer):
+    upsert = BulkSectionTimeSerializer(many=True, default=list, max_length=5000)
+    delete = serializers.ListField(child=serializers.IntegerField(), default=list, max_length=5000)
+
+class TimeWindowSerializer(serializers.Serializer):
+    start = serializers.TimeField()
+    end = serializers.TimeField()
+
+    def validate(self, attrs):
+        if attrs['end'] <= attrs['start']:
+            raise serializers.ValidationError({'end': 'Must be after start.'})
+        return attrs
+
+class FreeRoomsQuerySerializer(TimeWindowSerializer):
+    day = serializers.ChoiceField(choices=SectionTime.DAYS_CHOICES)
+
+class UtilizationQuerySerializer(TimeWindowSerializer):
+    start = serializers.TimeField(default=time(8))
+    end = serializers.TimeField(default=time(20))
+    bucket = serializers.IntegerField(default=60, min_value=5, max_value=24 * 60)
+    room = serializers.ListField(child=serializers.CharField(), default=list)
+
+    def validate_bucket(self, value):
+        if value % 5:
+            raise serializers.ValidationError('Must be a multiple of 5 minutes.')
+        return value
+
+class ScheduleRequestSerializer(serializers.Serializer):
+    courses = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=12)
+    limit = serializers.IntegerField(default=10, min_value=1, max_value=50)
+    include_full = serializers.BooleanField(default=False)
+
+class PlanRequestSerializer(serializers.Serializer):
+    courses = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=200)
+    completed = serializers.ListField(child=serializers.IntegerField(), default=list, max_length=500)
+    max_units = serializers.IntegerField(default=18, min_value=1, max_value=60)
+
+class EnrollmentSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Enrollment
+        fields = ['id', 'section', 'status', 'created_at']
+
+class EnrollRequestSerializer(serializers.Serializer):
+    sections = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=20)
+    waitlist = serializers.BooleanField(default=False)
+
+class DropRequestSerializer(serializers.Serializer):
+    sections = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=20)
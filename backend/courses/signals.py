@@ -0,0 +1,75 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .changes import record_changes, record_instance_change
+from .clashes import update_clashes
+from .models import Course, Section, SectionTime
+from .prerequisites import invalidate_graph, update_graph
+
+
+@receiver(post_save, sender=Course)
+def add_course_to_prerequisite_graph(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: update_graph('add_course', instance.pk))
+
+
+@receiver(post_delete, sender=Course)
+def remove_course_from_prerequisite_graph(sender, instance, **kwargs):
+    transaction.on_commit(lambda: update_graph('remove_course', instance.pk))
+
+
+@receiver(m2m_changed, sender=Course.prerequisites.through)
+def update_prerequisite_graph(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'post_clear':
+        transaction.on_commit(invalidate_graph)
+        return
+    if action not in ('post_add', 'post_remove') or not pk_set:
+        return
+    if reverse:
+        edges = [(course_id, instance.pk) for course_id in pk_set]
+    else:
+        edges = [(instance.pk, prerequisite_id) for prerequisite_id in pk_set]
+    method = 'add_edges' if action == 'post_add' else 'remove_edges'
+    transaction.on_commit(lambda: update_graph(method, edges))
+
+
+def record_catalog_save(sender, instance, **kwargs):
+    record_instance_change(instance)
+
+
+def record_catalog_delete(sender, instance, **kwargs):
+    record_instance_change(instance, deleted=True)
+
+
+for model in (Course, Section, SectionTime):
+    post_save.connect(record_catalog_save, sender=model, dispatch_uid=f'catalog-change-save-{model.__name__}')
+    post_delete.connect(record_catalog_delete, sender=model, dispatch_uid=f'catalog-change-delete-{model.__name__}')
+
+
+@receiver(post_save, sender=SectionTime)
+@receiver(post_delete, sender=SectionTime)
+def update_clashes_for_meeting(sender, instance, **kwargs):
+    time_id = instance.pk
+    transaction.on_commit(lambda: update_clashes([time_id]))
+
+
+@receiver(post_save, sender=Section)
+def update_clashes_for_instructor(sender, instance, created, **kwargs):
+    # The instructor is shared by every meeting of the section.
+    if not created:
+        transaction.on_commit(lambda: update_clashes(instance.times.values_list('pk', flat=True)))
+
+
+@receiver(m2m_changed, sender=Course.prerequisites.through)
+@receiver(m2m_changed, sender=Course.corequisites.through)
+def record_requisite_change(sender, instance, action, reverse, pk_set, **kwargs):
+    # Requisite ids are part of the course row, so the owning course changed.
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            record_changes('course', [instance.pk])
+    elif action in ('post_add', 'post_remove') and pk_set:
+        record_changes('course', pk_set)
+    elif action == 'pre_clear':
+        # Clearing from the reverse side does not report the affected courses.
+        record_changes('course', sender.objects.filter(to_course_id=instance.pk).values_list('from_course_id', flat=True))
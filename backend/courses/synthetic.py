@@ -0,0 +1,129 @@
+"""
+Synthetic catalogs and students for benchmarks and load tests.
+
+Both generators are seeded, so the same arguments always produce the same
+data. They write with ``bulk_create`` and are meant for scratch databases:
+``generate_catalog`` does not append to the catalog change log, it only
+retires cached snapshots, the prerequisite graph, degree plans, the clash
+report and room occupancy when it is done.
+
+Prerequisites and corequisites always point at courses with lower ids, so
+the requisite graph is a DAG. Picking them from the ``REQUISITE_WINDOW``
+courses just below keeps chains long, as in a real program of study.
+"""
+import random
+from datetime import time
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from authentication.onboarding import import_students
+from .catalog import bump_catalog_generation
+from .models import Course, Section, SectionTime
+from .clashes import invalidate_clashes
+from .occupancy import times_changed
+from .planner import plans_changed
+from .prerequisites import invalidate_graph
+
+SUBJECTS = [
+    'Calculus', 'Physics', 'Chemistry', 'Biology', 'Algorithms', 'Databases', 'Statistics',
+    'Linear Algebra', 'Economics', 'Philosophy', 'Literature', 'History', 'Psychology',
+    'Operating Systems', 'Networks', 'Compilers', 'Thermodynamics', 'Mechanics', 'Genetics',
+]
+LEVELS = ['Introduction to', 'Foundations of', 'Advanced', 'Topics in', 'Applied', 'Seminar in']
+FIRST_NAMES = ['Sara', 'Ali', 'Maryam', 'Reza', 'John', 'Elena', 'Omid', 'Lena', 'David', 'Nora']
+LAST_NAMES = ['Smith', 'Ahmadi', 'Karimi', 'Novak', 'Garcia', 'Rahimi', 'Chen', 'Moradi', 'Weber']
+BUILDINGS = ['Engineering', 'Science', 'Humanities', 'Library', 'Main']
+DAYS = [code for code, _ in SectionTime.DAYS_CHOICES]
+START_TIMES = [time(hour, minute) for hour in range(8, 18) for minute in (0, 30)]
+DURATIONS = [60, 90, 120]
+MAJORS = ['Computer Science', 'Physics', 'Mathematics', 'Biology', 'Economics', 'Psychology', 'History']
+REQUISITE_WINDOW = 40
+
+
+def _requisites(rng, course_objects, max_prerequisites, corequisite_ratio):
+    prerequisites = []
+    corequisites = []
+    for position, course in enumerate(course_objects[1:], start=1):
+        earlier = course_objects[max(0, position - REQUISITE_WINDOW):position]
+        chosen = rng.sample(earlier, min(len(earlier), rng.randint(0, max_prerequisites)))
+        prerequisites.extend(
+            Course.prerequisites.through(from_course_id=course.id, to_course_id=other.id) for other in chosen
+        )
+        others = [other for other in earlier if other not in chosen]
+        if others and rng.random() < corequisite_ratio:
+            corequisites.append(Course.corequisites.through(from_course_id=course.id, to_course_id=rng.choice(others).id))
+    return prerequisites, corequisites
+
+
+def generate_catalog(courses=200, sections_per_course=5, times_per_section=2, first_course_id=1,
+                     seed=0, batch_size=2000, max_prerequisites=0, corequisite_ratio=0.0):
+    """Courses with sections and meeting times, and, if ``max_prerequisites`` is set, a requisite DAG."""
+    rng = random.Random(seed)
+    course_objects = [
+        Course(
+            id=first_course_id + offset,
+            name=f"{rng.choice(LEVELS)} {rng.choice(SUBJECTS)} {offset + 1}",
+            units=rng.choice([1, 2, 3, 3, 3, 4]),
+        )
+        for offset in range(courses)
+    ]
+    with transaction.atomic():
+        Course.objects.bulk_create(course_objects, batch_size=batch_size)
+        sections = []
+        for course in course_objects:
+            for number in range(1, sections_per_course + 1):
+                capacity = rng.choice([20, 30, 40, 60, 120])
+                sections.append(Section(
+                    course=course,
+                    section_number=number,
+                    instructor=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                    capacity=capacity,
+                    enrolled=rng.randint(0, capacity),
+                ))
+        sections = Section.objects.bulk_create(sections, batch_size=batch_size)
+        if not all(section.pk for section in sections):
+            sections = list(Section.objects.filter(course__in=course_objects).order_by('id'))
+        times = []
+        for section in sections:
+            for day in rng.sample(DAYS, times_per_section):
+                start = rng.choice(START_TIMES)
+                minutes = start.hour * 60 + start.minute + rng.choice(DURATIONS)
+                times.append(SectionTime(
+                    section=section,
+                    day=day,
+                    start_time=start,
+                    end_time=time(minutes // 60, minutes % 60),
+                    location=f"{rng.choice(BUILDINGS)} {rng.randint(1, 4)}{rng.randint(1, 30):02d}",
+                ))
+        SectionTime.objects.bulk_create(times, batch_size=batch_size)
+        if max_prerequisites or corequisite_ratio:
+            # Drawn after everything else, so the sections and times match a catalog without requisites.
+            prerequisites, corequisites = _requisites(rng, course_objects, max_prerequisites, corequisite_ratio)
+            Course.prerequisites.through.objects.bulk_create(prerequisites, batch_size=batch_size)
+            Course.corequisites.through.objects.bulk_create(corequisites, batch_size=batch_size)
+        transaction.on_commit(bump_catalog_generation)
+        transaction.on_commit(invalidate_graph)
+        transaction.on_commit(invalidate_clashes)
+        times_changed()
+        plans_changed()
+    return course_objects
+
+
+def generate_students(count=1000, password='Student-Pass-1', first_number=1, seed=0):
+    """``student<n>`` accounts with profiles, all sharing ``password``, hashed once."""
+    rng = random.Random(seed)
+    hashed = make_password(password)
+    rows = []
+    for number in range(first_number, first_number + count):
+        rows.append((number, {
+            'username': f'student{number}',
+            'email': f'student{number}@example.com',
+            'first_name': rng.choice(FIRST_NAMES),
+            'last_name': rng.choice(LAST_NAMES),
+            'password': hashed,
+            'student_id': f'S{number:07d}',
+            'major': rng.choice(MAJORS),
+            'year': rng.randint(1, 5),
+        }))
+    return import_students(rows)
@@ -1,3 +1,1618 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import io
+import json
+import os
+import random
+import tempfile
+import threading
+from base64 import urlsafe_b64encode
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, time, timedelta, timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.utils.translation import gettext_lazy
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+from unipath_backend.benchmarking import find_regressions
+from unipath_backend.database import ConnectionStats, ReplicaRouter, database_settings, pool_stats, reading_from_replica
+from unipath_backend.metrics import metrics
+from unipath_backend.renderers import ORJSONRenderer
+
+from .bulk import room_conflicts
+from .catalog import SNAPSHOT_LOCK_KEY, bump_catalog_generation, catalog_generation, latest_change_version
+from .changes import changes_since, compact_changes, record_changes
+from .clashes import REPORT_KEY, clash_report, clashes_with, find_clashes, overlapping_pairs
+from .enrollment import SectionsFull, drop_sections, enroll_in_sections
+from .importer import import_catalog, read_rows
+from .live import SeatBroker, seat_broker
+from .models import CatalogChange, Course, Enrollment, Section, SectionTime
+from .occupancy import OccupancyMatrix
+from .pagination import KeysetPagination
+from .planner import PlanningCatalog, build_plan
+from .prerequisites import PrerequisiteGraph, eligible_courses, invalidate_graph
+from .scheduling import ScheduleIndex, SectionSlot, generate_schedules, time_range_mask
+from .search import similarity, trigrams
+from .synthetic import REQUISITE_WINDOW, generate_catalog, generate_students
+from .views import SectionViewSet
+
+
+def create_catalog(count, sections_per_course=2, start_id=1):
+    courses = []
+    for offset in range(count):
+        course = Course.objects.create(id=start_id + offset, name=f"Course {start_id + offset}", units=3)
+        if courses:
+            course.prerequisites.add(courses[-1])
+            course.corequisites.add(courses[0])
+        for number in range(1, sections_per_course + 1):
+            section = Section.objects.create(
+                course=course,
+                section_number=number,
+                instructor=f"Instructor {number}",
+                capacity=30,
+                enrolled=10,
+            )
+            SectionTime.objects.create(section=section, day='mon', start_time=time(8), end_time=time(9, 30), location='Room 101')
+            SectionTime.objects.create(section=section, day='wed', start_time=time(8), end_time=time(9, 30), location='Room 101')
+        courses.append(course)
+    return courses
+
+
+class CatalogQueryCountTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='student', password='secret-pass-123')
+        self.client.force_authenticate(self.user)
+
+    def assertListQueries(self, url, num):
+        with self.assertNumQueries(num):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def test_course_list_query_count_is_constant(self):
+        create_catalog(3)
+        # courses, prerequisites, corequisites, sections, times
+        small = self.assertListQueries('/api/v1/courses/courses/', 5)
+        create_catalog(17, start_id=100)
+        large = self.assertListQueries('/api/v1/courses/courses/', 5)
+        self.assertEqual(len(small), 3)
+        self.assertEqual(len(large), 20)
+
+    def test_course_list_resolves_nested_sections_and_times(self):
+        create_catalog(2)
+        results = self.assertListQueries('/api/v1/courses/courses/', 5)
+        second = results[1]
+        self.assertEqual(second['prerequisites'], [1])
+        self.assertEqual(second['corequisites'], [1])
+        self.assertEqual(len(second['sections']), 2)
+        self.assertEqual(len(second['sections'][0]['times']), 2)
+
+    def test_section_list_query_count_is_constant(self):
+        create_catalog(1)
+        # sections joined with course, times
+        self.assertListQueries('/api/v1/courses/sections/', 2)
+        create_catalog(9, start_id=100)
+        self.assertListQueries('/api/v1/courses/sections/', 2)
+        self.assertListQueries('/api/v1/courses/sections/?search=Course', 2)
+
+    def test_section_time_list_query_count_is_constant(self):
+        create_catalog(1)
+        self.assertListQueries('/api/v1/courses/section-times/', 1)
+        create_catalog(9, start_id=100)
+        self.assertListQueries('/api/v1/courses/section-times/', 1)
+
+
+def slot(section_id, course_id, *ranges, capacity=30, enrolled=0):
+    mask = 0
+    for day, start, end in ranges:
+        mask |= time_range_mask(day, start, end)
+    return SectionSlot(section_id, course_id, mask, capacity, enrolled)
+
+
+class ScheduleGeneratorTests(SimpleTestCase):
+    def test_time_range_masks_overlap_only_when_minutes_overlap(self):
+        morning = time_range_mask('mon', time(8), time(9, 30))
+        self.assertTrue(morning & time_range_mask('mon', time(9, 29), time(10)))
+        self.assertFalse(morning & time_range_mask('mon', time(9, 30), time(11)))
+        self.assertFalse(morning & time_range_mask('tue', time(8), time(9, 30)))
+
+    def test_returns_only_conflict_free_combinations(self):
+        index = ScheduleIndex([
+            slot(1, 10, ('mon', time(8), time(10))),
+            slot(2, 10, ('tue', time(8), time(10))),
+            slot(3, 20, ('mon', time(9), time(11))),
+        ])
+        result = generate_schedules(index, [10, 20])
+        self.assertEqual(len(result.schedules), 1)
+        self.assertEqual({s.id for s in result.schedules[0].sections}, {2, 3})
+
+    def test_ranks_fewer_days_then_smaller_gaps_first(self):
+        index = ScheduleIndex([
+            slot(1, 10, ('mon', time(8), time(9))),
+            slot(2, 20, ('mon', time(9), time(10))),
+            slot(3, 20, ('mon', time(13), time(14))),
+            slot(4, 20, ('tue', time(9), time(10))),
+        ])
+        result = generate_schedules(index, [10, 20])
+        self.assertEqual([s.sections[1].id for s in result.schedules], [2, 3, 4])
+        self.assertEqual(result.schedules[1].gap_minutes, 240)
+
+    def test_skips_full_sections_unless_requested(self):
+        index = ScheduleIndex([slot(1, 10, ('mon', time(8), time(9)), capacity=20, enrolled=20)])
+        result = generate_schedules(index, [10])
+        self.assertEqual(result.schedules, [])
+        self.assertEqual(result.unavailable, [10])
+        self.assertEqual(len(generate_schedules(index, [10], include_full=True).schedules), 1)
+
+    def test_corequisites_are_co_scheduled(self):
+        index = ScheduleIndex(
+            [slot(1, 10, ('mon', time(8), time(9))), slot(2, 11, ('mon', time(10), time(11)))],
+            corequisites={10: {11}},
+        )
+        result = generate_schedules(index, [10])
+        self.assertEqual(result.courses, [10, 11])
+        self.assertEqual([s.id for s in result.schedules[0].sections], [1, 2])
+
+
+class ScheduleEndpointTests(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user(username='student', password='secret-pass-123'))
+
+    def test_generates_schedules_from_the_catalog(self):
+        courses = create_catalog(2, sections_per_course=1)
+        Section.objects.filter(course=courses[1]).update(enrolled=0)
+        SectionTime.objects.filter(section__course=courses[1]).update(start_time=time(10), end_time=time(11))
+        response = self.client.post('/api/v1/courses/schedules/', {'courses': [2]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['courses'], [1, 2])
+        self.assertEqual(len(response.data['schedules']), 1)
+        self.assertEqual(response.data['schedules'][0]['days'], 2)
+
+    def test_rejects_empty_course_list(self):
+        response = self.client.post('/api/v1/courses/schedules/', {'courses': []}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class PrerequisiteGraphTests(SimpleTestCase):
+    def setUp(self):
+        # 1 -> 2 -> 4, 1 -> 3 -> 4, and a cycle 5 <-> 6 that 7 depends on.
+        self.graph = PrerequisiteGraph(
+            range(1, 8),
+            [(2, 1), (3, 1), (4, 2), (4, 3), (5, 6), (6, 5), (7, 6)],
+        )
+
+    def test_topological_order_places_prerequisites_first(self):
+        order = self.graph.topological_order
+        self.assertEqual(set(order), {1, 2, 3, 4})
+        self.assertLess(order.index(1), order.index(2))
+        self.assertLess(order.index(3), order.index(4))
+
+    def test_detects_cycles(self):
+        self.assertEqual(self.graph.cycles, [[5, 6]])
+
+    def test_transitive_closure(self):
+        self.assertEqual(self.graph.all_prerequisites(4), {1, 2, 3})
+        self.assertEqual(self.graph.all_prerequisites(1), set())
+
+    def test_eligible_requires_every_direct_prerequisite(self):
+        self.assertEqual(self.graph.eligible([]), [1])
+        self.assertEqual(self.graph.eligible([1]), [2, 3])
+        self.assertEqual(self.graph.eligible([1, 2]), [3])
+        self.assertEqual(self.graph.eligible([1, 2, 3]), [4])
+
+    def test_incremental_updates_refresh_derived_data(self):
+        self.assertEqual(self.graph.all_prerequisites(4), {1, 2, 3})
+        self.graph.remove_edges([(4, 3)])
+        self.assertEqual(self.graph.all_prerequisites(4), {1, 2})
+        self.graph.add_edges([(1, 7)])
+        self.assertEqual(self.graph.eligible([]), [])
+        self.graph.remove_course(6)
+        self.assertEqual(self.graph.cycles, [])
+        self.assertEqual(self.graph.eligible([]), [5, 7])
+
+
+@override_settings(CACHE_SHARED=True)
+class EligibleCoursesEndpointTests(APITestCase):
+    def setUp(self):
+        invalidate_graph()
+        self.client.force_authenticate(User.objects.create_user(username='student', password='secret-pass-123'))
+
+    def test_answers_from_the_cached_graph(self):
+        create_catalog(3, sections_per_course=0)
+        response = self.client.get('/api/v1/courses/eligible/?completed=1')
+        self.assertEqual(response.data['eligible'], [2])
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/v1/courses/eligible/?completed=1,2')
+        self.assertEqual(response.data['eligible'], [3])
+
+    def test_m2m_changes_update_the_graph_without_reloading(self):
+        courses = create_catalog(3, sections_per_course=0)
+        self.client.get('/api/v1/courses/eligible/')
+        with self.captureOnCommitCallbacks(execute=True):
+            courses[2].prerequisites.remove(courses[1])
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/v1/courses/eligible/?completed=1')
+        self.assertEqual(response.data['eligible'], [2, 3])
+
+    @override_settings(CACHE_SHARED=False, LOCAL_STATE_TTL=10)
+    def test_without_a_shared_cache_the_graph_is_reloaded_on_a_timer(self):
+        create_catalog(3, sections_per_course=0)
+        with mock.patch('courses.versioning.time') as clock:
+            clock.time.return_value = 1000.0
+            self.client.get('/api/v1/courses/eligible/')
+            # Another worker's change reaches this one only through the database.
+            Course.prerequisites.through.objects.filter(from_course_id=3).delete()
+            clock.time.return_value = 1009.0
+            self.assertEqual(self.client.get('/api/v1/courses/eligible/?completed=1').data['eligible'], [2])
+            clock.time.return_value = 1010.0
+            self.assertEqual(self.client.get('/api/v1/courses/eligible/?completed=1').data['eligible'], [2, 3])
+
+    def test_rejects_malformed_ids(self):
+        response = self.client.get('/api/v1/courses/eligible/?completed=1,abc')
+        self.assertEqual(response.status_code, 400)
+
+    def test_command_lists_prerequisite_cycles(self):
+        courses = create_catalog(3, sections_per_course=0)
+        out = io.StringIO()
+        call_command('find_prerequisite_cycles', stdout=out)
+        self.assertIn('0 prerequisite cycles found', out.getvalue())
+        with self.captureOnCommitCallbacks(execute=True):
+            courses[0].prerequisites.add(courses[2])
+        out = io.StringIO()
+        call_command('find_prerequisite_cycles', stdout=out)
+        self.assertIn("1 'Course 1', 2 'Course 2', 3 'Course 3'", out.getvalue())
+        self.assertIn('1 prerequisite cycles found', out.getvalue())
+
+
+def fewest_terms(catalog, course_ids, max_units):
+    """Breadth-first over every set of courses a term could hold; the planner's reference answer."""
+    needed = sorted(course_ids)
+    start = frozenset()
+    frontier, seen, terms = {start}, {start}, 0
+    while frontier:
+        if frozenset(needed) in frontier:
+            return terms
+        following = set()
+        for done in frontier:
+            available = [c for c in needed if c not in done and catalog.prerequisites.get(c, set()) <= done]
+            for mask in range(1, 1 << len(available)):
+                term = {c for index, c in enumerate(available) if mask >> index & 1}
+                if sum(catalog.units[c] for c in term) > max_units:
+                    continue
+                if any(not catalog.corequisites.get(c, set()) <= done | term for c in term):
+                    continue
+                reached = done | term
+                if reached not in seen:
+                    seen.add(reached)
+                    following.add(reached)
+        frontier, terms = following, terms + 1
+    return None
+
+
+class DegreePlannerTests(SimpleTestCase):
+    def assertValidPlan(self, catalog, plan):
+        term_of = {}
+        for number, term in enumerate(plan.terms):
+            self.assertLessEqual(sum(catalog.units[c] for c in term['courses']), plan.max_units)
+            term_of.update(dict.fromkeys(term['courses'], number))
+        for course_id, number in term_of.items():
+            for prerequisite_id in catalog.prerequisites.get(course_id, ()):
+                self.assertLess(term_of[prerequisite_id], number)
+            for coreq_id in catalog.corequisites.get(course_id, ()):
+                self.assertLessEqual(term_of[coreq_id], number)
+
+    def test_matches_exhaustive_search_on_random_catalogs(self):
+        for seed in range(40):
+            rng = random.Random(seed)
+            units = {course_id: rng.randint(1, 4) for course_id in range(1, 9)}
+            prerequisites = [(c, p) for c in units for p in range(1, c) if rng.random() < 0.3]
+            corequisites = [(c, c - 1) for c in range(2, 9) if rng.random() < 0.1 and (c, c - 1) not in prerequisites]
+            catalog = PlanningCatalog(units.items(), prerequisites, corequisites)
+            plan = build_plan(catalog, set(units), set(), max_units=6)
+            self.assertEqual(plan.unplannable, [])
+            self.assertTrue(plan.optimal)
+            self.assertValidPlan(catalog, plan)
+            self.assertEqual(len(plan.terms), fewest_terms(catalog, units, 6), seed)
+
+    def test_completed_courses_and_their_prerequisites_are_skipped(self):
+        catalog = PlanningCatalog({1: 3, 2: 3, 3: 3, 4: 3}.items(), [(2, 1), (3, 2), (4, 3)])
+        plan = build_plan(catalog, {4}, {2}, max_units=12)
+        self.assertEqual([term['courses'] for term in plan.terms], [[3], [4]])
+        self.assertEqual(plan.lower_bound, 2)
+
+    def test_corequisites_share_a_term(self):
+        catalog = PlanningCatalog({1: 3, 2: 3, 3: 3}.items(), [(3, 1)], [(1, 2), (2, 1)])
+        plan = build_plan(catalog, {3}, set(), max_units=6)
+        self.assertEqual([term['courses'] for term in plan.terms], [[1, 2], [3]])
+
+    def test_reports_courses_that_cannot_be_planned(self):
+        # 2 and 3 require each other, 4 waits on them, and 5 is over the cap.
+        catalog = PlanningCatalog({1: 3, 2: 3, 3: 3, 4: 3, 5: 9}.items(), [(2, 3), (3, 2), (4, 3)])
+        plan = build_plan(catalog, {1, 4, 5}, set(), max_units=6)
+        self.assertEqual(plan.unplannable, [2, 3, 4, 5])
+        self.assertEqual([term['courses'] for term in plan.terms], [[1]])
+
+    def test_time_budget_keeps_the_best_plan_found(self):
+        rng = random.Random(1)
+        units = {course_id: rng.randint(1, 4) for course_id in range(1, 121)}
+        prerequisites = [(c, rng.randrange(1, c)) for c in range(2, 121) if rng.random() < 0.6]
+        catalog = PlanningCatalog(units.items(), prerequisites)
+        plan = build_plan(catalog, set(units), set(), max_units=7, time_budget=0)
+        self.assertValidPlan(catalog, plan)
+        self.assertEqual(sum(len(term['courses']) for term in plan.terms), 120)
+        self.assertEqual(plan.optimal, len(plan.terms) == plan.lower_bound)
+
+
+@override_settings(CACHE_SHARED=True)
+class PlanEndpointTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(User.objects.create_user(username='student', password='secret-pass-123'))
+
+    def test_plans_are_cached_until_a_course_changes(self):
+        # 1 -> 2 -> 3 -> 4, and every course is a corequisite of course 1.
+        courses = create_catalog(4, sections_per_course=0)
+        request = {'courses': [4], 'completed': [1], 'max_units': 6}
+        response = self.client.post('/api/v1/courses/plan/', request, format='json')
+        self.assertEqual([term['courses'] for term in response.data['terms']], [[2], [3], [4]])
+        self.assertTrue(response.data['optimal'])
+        with self.assertNumQueries(0):
+            self.client.post('/api/v1/courses/plan/', request, format='json')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            courses[3].prerequisites.remove(courses[2])
+        response = self.client.post('/api/v1/courses/plan/', request, format='json')
+        self.assertEqual([term['courses'] for term in response.data['terms']], [[4]])
+
+    @override_settings(CACHE_SHARED=False, LOCAL_STATE_TTL=10)
+    def test_without_a_shared_cache_plans_follow_other_workers_on_a_timer(self):
+        create_catalog(4, sections_per_course=0)
+        request = {'courses': [4], 'completed': [1], 'max_units': 6}
+        with mock.patch('courses.versioning.time') as clock:
+            clock.time.return_value = 1000.0
+            self.client.post('/api/v1/courses/plan/', request, format='json')
+            # Another worker's change reaches this one only through the database.
+            Course.prerequisites.through.objects.filter(from_course_id=4).delete()
+            clock.time.return_value = 1009.0
+            response = self.client.post('/api/v1/courses/plan/', request, format='json')
+            self.assertEqual([term['courses'] for term in response.data['terms']], [[2], [3], [4]])
+            clock.time.return_value = 1010.0
+            response = self.client.post('/api/v1/courses/plan/', request, format='json')
+            self.assertEqual([term['courses'] for term in response.data['terms']], [[4]])
+
+    def test_rejects_unknown_courses(self):
+        create_catalog(2, sections_per_course=0)
+        response = self.client.post('/api/v1/courses/plan/', {'courses': [2, 9]}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(CACHE_SHARED=True)
+class CatalogSnapshotTests(APITestCase):
+    url = '/api/v1/courses/catalog/'
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='student', password='secret-pass-123')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        create_catalog(2, sections_per_course=1)
+
+    def test_returns_the_full_catalog_compressed(self):
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        document = json.loads(gzip.decompress(response.content))
+        self.assertEqual(str(document['version']), response['X-Catalog-Version'])
+        self.assertEqual(document['courses'][1], {
+            'id': 2, 'name': 'Course 2', 'units': 3, 'prerequisites': [1], 'corequisites': [1],
+        })
+        self.assertEqual(len(document['sections']), 2)
+        self.assertEqual(document['section_times'][0]['start_time'], '08:00:00')
+
+    def test_conditional_get_is_served_without_database_access(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_catalog_changes_produce_a_new_version(self):
+        first = self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Section.objects.filter(course_id=1).get().save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(int(response['X-Catalog-Version']), int(first['X-Catalog-Version']) + 1)
+
+    def test_seat_changes_keep_the_snapshot(self):
+        first = self.client.get(self.url)
+        self.assertNotIn('enrolled', json.loads(first.content)['sections'][0])
+        generation = catalog_generation()
+        student = User.objects.create_user(username='enrolling', password='secret-pass-123').userprofile
+        with self.captureOnCommitCallbacks(execute=True):
+            enroll_in_sections(student, [Section.objects.filter(course_id=1).get().pk])
+        # Live seat streams still see the change.
+        self.assertNotEqual(catalog_generation(), generation)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_one_request_rebuilds_while_the_others_serve_the_previous_snapshot(self):
+        first = self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Course.objects.filter(pk=1).get().save()
+        cache.add(SNAPSHOT_LOCK_KEY, 1, 60)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        cache.delete(SNAPSHOT_LOCK_KEY)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(int(response['X-Catalog-Version']), int(first['X-Catalog-Version']))
+
+    @override_settings(CACHE_SHARED=False)
+    def test_without_a_shared_cache_the_change_log_retires_the_snapshot(self):
+        first = self.client.get(self.url)
+        # Another worker's change: its on_commit bump only reaches that worker's cache.
+        Course.objects.filter(pk=1).update(name='Renamed')
+        record_changes('course', [1])
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['courses'][0]['name'], 'Renamed')
+
+    def test_requires_authentication(self):
+        self.client.credentials()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+
+class CatalogChangesTests(APITestCase):
+    url = '/api/v1/courses/changes/'
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user(username='student', password='secret-pass-123'))
+        create_catalog(2, sections_per_course=1)
+        self.version = self.client.get(self.url, {'since': 0}).data['version']
+
+    def test_initial_feed_contains_every_object(self):
+        response = self.client.get(self.url, {'since': 0})
+        self.assertEqual([course['id'] for course in response.data['courses']], [1, 2])
+        self.assertEqual(len(response.data['sections']), 2)
+        self.assertEqual(len(response.data['section_times']), 4)
+
+    def test_returns_only_objects_changed_since_the_version(self):
+        section = Section.objects.get(course_id=2)
+        section.enrolled = 11
+        section.save()
+        response = self.client.get(self.url, {'since': self.version})
+        self.assertEqual(response.data['courses'], [])
+        self.assertEqual(response.data['sections'], [{
+            'id': section.pk, 'course': 2, 'section_number': 1, 'instructor': 'Instructor 1',
+            'capacity': 30, 'enrolled': 11,
+        }])
+        self.assertGreater(response.data['version'], self.version)
+
+    def test_deletes_are_reported_as_tombstones(self):
+        section_time = SectionTime.objects.first()
+        section_time_id = section_time.pk
+        section_time.delete()
+        response = self.client.get(self.url, {'since': self.version})
+        self.assertEqual(response.data['section_times'], [])
+        self.assertEqual(response.data['deleted']['section_times'], [section_time_id])
+
+    def test_requisite_changes_update_the_course(self):
+        Course.objects.get(pk=2).prerequisites.clear()
+        response = self.client.get(self.url, {'since': self.version})
+        self.assertEqual(response.data['courses'][0]['prerequisites'], [])
+
+    def test_pages_with_a_cursor(self):
+        response = self.client.get(self.url, {'since': 0, 'limit': 3})
+        self.assertTrue(response.data['has_more'])
+        rest = self.client.get(self.url, {'since': response.data['version']})
+        self.assertFalse(rest.data['has_more'])
+        self.assertEqual(rest.data['version'], self.version)
+
+    def test_compaction_keeps_the_feed_and_expires_old_tombstones(self):
+        section = Section.objects.get(course_id=1)
+        for enrolled in (12, 13, 14):
+            section.enrolled = enrolled
+            section.save()
+        before = self.client.get(self.url, {'since': self.version}).data
+        SectionTime.objects.first().delete()
+
+        entries = CatalogChange.objects.count()
+        objects = CatalogChange.objects.values('kind', 'object_id').distinct().count()
+        self.assertEqual(compact_changes(tombstone_age=timedelta(days=1)), (entries - objects, 0))
+        self.assertEqual(CatalogChange.objects.count(), objects)
+        self.assertEqual(self.client.get(self.url, {'since': self.version}).data['sections'], before['sections'])
+
+        CatalogChange.objects.filter(deleted=True).update(changed_at=CatalogChange.objects.first().changed_at - timedelta(days=2))
+        self.assertEqual(compact_changes(tombstone_age=timedelta(days=1)), (0, 1))
+        self.assertEqual(self.client.get(self.url, {'since': self.version}).status_code, 410)
+
+    def test_requires_an_integer_version(self):
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+
+    def test_cursor_waits_for_versions_committed_late(self):
+        section = Section.objects.get(course_id=2)
+        # A long transaction drew the next two versions; a short one committed the third first.
+        CatalogChange.objects.create(version=self.version + 3, kind='section', object_id=section.pk)
+        response = self.client.get(self.url, {'since': self.version})
+        self.assertEqual(response.data['version'], self.version)
+        self.assertEqual([row['id'] for row in response.data['sections']], [section.pk])
+        self.assertEqual(latest_change_version(), self.version)
+
+        CatalogChange.objects.create(version=self.version + 1, kind='course', object_id=1)
+        CatalogChange.objects.create(version=self.version + 2, kind='course', object_id=2)
+        response = self.client.get(self.url, {'since': self.version})
+        self.assertEqual(response.data['version'], self.version + 3)
+        self.assertEqual([course['id'] for course in response.data['courses']], [1, 2])
+
+    def test_old_gaps_do_not_hold_the_cursor(self):
+        CatalogChange.objects.create(version=self.version + 5, kind='course', object_id=1)
+        self.assertEqual(self.client.get(self.url, {'since': self.version}).data['version'], self.version)
+        CatalogChange.objects.filter(version=self.version + 5).update(
+            changed_at=datetime.now(timezone.utc) - timedelta(minutes=5),
+        )
+        self.assertEqual(self.client.get(self.url, {'since': self.version}).data['version'], self.version + 5)
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class InterleavedChangeLogTests(TransactionTestCase):
+    def test_change_committed_after_a_later_one_is_not_skipped(self):
+        Course.objects.create(id=1, name='Course 1', units=3)
+        since = changes_since(0)['version']
+        drawn = threading.Event()
+        commit = threading.Event()
+
+        def long_transaction():
+            try:
+                with transaction.atomic():
+                    record_changes('course', [1])
+                    drawn.set()
+                    commit.wait(10)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            pending = pool.submit(long_transaction)
+            drawn.wait(10)
+            with transaction.atomic():
+                record_changes('course', [1])
+            self.assertEqual(changes_since(since)['version'], since)
+            commit.set()
+            pending.result()
+        self.assertEqual(changes_since(since)['version'], since + 2)
+
+
+class CatalogSearchTests(APITestCase):
+    url = '/api/v1/courses/search/'
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user(username='student', password='secret-pass-123'))
+        with self.captureOnCommitCallbacks(execute=True):
+            calculus = Course.objects.create(id=1, name='Calculus I', units=3)
+            Course.objects.create(id=2, name='Organic Chemistry', units=4)
+            section = Section.objects.create(course=calculus, section_number=1, instructor='Maryam Karimi', capacity=30)
+            SectionTime.objects.create(
+                section=section, day='mon', start_time=time(8), end_time=time(9), location='Engineering 204',
+            )
+
+    def search(self, query):
+        response = self.client.get(self.url, {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [(hit['kind'], hit['text']) for hit in response.data['results']]
+
+    def test_trigram_similarity_matches_postgres(self):
+        self.assertEqual(trigrams('cat'), {'  c', ' ca', 'cat', 'at '})
+        self.assertAlmostEqual(similarity(trigrams('word'), trigrams('two words')), 4 / 11)
+
+    def test_tolerates_typos(self):
+        self.assertEqual(self.search('calculs')[0], ('course', 'Calculus I'))
+        self.assertEqual(self.search('karimy')[0], ('section', 'Maryam Karimi'))
+
+    def test_substring_matches_rank_first(self):
+        hits = self.search('engineering 204')
+        self.assertEqual(hits[0], ('section_time', 'Engineering 204'))
+
+    def test_sees_catalog_changes(self):
+        self.assertEqual(self.search('thermodynamics'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            Course.objects.create(id=3, name='Thermodynamics', units=3)
+        self.assertEqual(self.search('thermodynamics'), [('course', 'Thermodynamics')])
+
+    def test_requires_a_query(self):
+        self.assertEqual(self.client.get(self.url, {'q': ' '}).status_code, 400)
+
+
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user(username='student', password='secret-pass-123'))
+        for course_id in range(1, 8):
+            Course.objects.create(id=course_id, name=f"Course {course_id % 3}", units=course_id % 2 + 2)
+
+    def walk(self, url):
+        ids = []
+        pages = 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            ids.extend(course['id'] for course in response.data['results'])
+            url = response.data['next']
+            pages += 1
+        return ids, pages
+
+    def test_walks_every_row_once_in_order(self):
+        ids, pages = self.walk('/api/v1/courses/courses/?page_size=3')
+        self.assertEqual(ids, list(range(1, 8)))
+        self.assertEqual(pages, 3)
+
+    def test_follows_the_requested_ordering_with_duplicate_values(self):
+        expected = list(Course.objects.order_by('-units', '-id').values_list('id', flat=True))
+        ids, _ = self.walk('/api/v1/courses/courses/?ordering=-units&page_size=2')
+        self.assertEqual(ids, expected)
+        expected = list(Course.objects.order_by('name', 'id').values_list('id', flat=True))
+        ids, _ = self.walk('/api/v1/courses/courses/?ordering=name&page_size=2')
+        self.assertEqual(ids, expected)
+
+    def test_previous_link_returns_the_preceding_page(self):
+        first = self.client.get('/api/v1/courses/courses/?ordering=name&page_size=3')
+        self.assertIsNone(first.data['previous'])
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(back.data['results'], first.data['results'])
+
+    def test_rows_inserted_before_the_cursor_do_not_shift_pages(self):
+        first = self.client.get('/api/v1/courses/courses/?page_size=3')
+        Course.objects.create(id=0, name='Inserted', units=3)
+        second = self.client.get(first.data['next'])
+        self.assertEqual([course['id'] for course in second.data['results']], [4, 5, 6])
+
+    def test_cursor_pages_seek_on_the_ordering_index(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('reads SQLite query plans')
+        pages = [
+            (Section, 'courses_sec_capacit_c9d63c_idx', [('capacity', False), ('id', False)], [5, 3]),
+            (Course, 'courses_cou_units_2604c9_idx', [('units', True), ('id', True)], [3, 3]),
+            (SectionTime, 'courses_sec_day_2b11fb_idx', [('day', False), ('id', False)], ['mon', 3]),
+        ]
+        for model, index, fields, values in pages:
+            for reverse in (False, True):
+                queryset = model.objects.filter(KeysetPagination.keyset_filter(fields, values, reverse))
+                plan = queryset.order_by(*[
+                    ('-' if descending != reverse else '') + name for name, descending in fields
+                ]).explain()
+                self.assertIn(f'SEARCH {model._meta.db_table} USING INDEX {index}', plan)
+
+    def test_rejects_a_malformed_cursor(self):
+        self.assertEqual(self.client.get('/api/v1/courses/courses/?cursor=bogus').status_code, 404)
+        for values in (['abc'], ['abc', 1], [{'x': 1}, 1], [None, 1], [3, 1, 1]):
+            cursor = urlsafe_b64encode(json.dumps({'v': values}).encode()).decode()
+            response = self.client.get('/api/v1/courses/courses/', {'ordering': 'units', 'cursor': cursor})
+            self.assertEqual(response.status_code, 404, values)
+        cursor = urlsafe_b64encode(json.dumps({'v': ['25:00', 1]}).encode()).decode()
+        response = self.client.get('/api/v1/courses/section-times/', {'ordering': 'start_time', 'cursor': cursor})
+        self.assertEqual(response.status_code, 404)
+
+
+class EnrollmentTests(APITestCase):
+    url = '/api/v1/courses/enrollments/'
+
+    def setUp(self):
+        create_catalog(2, sections_per_course=1)
+        self.full, self.open = Section.objects.order_by('id')
+        Section.objects.filter(pk=self.full.pk).update(capacity=1, enrolled=0)
+        self.students = [
+            User.objects.create_user(username=f'student{number}', password='secret-pass-123')
+            for number in range(3)
+        ]
+        self.client.force_authenticate(self.students[0])
+
+    def seats(self, section):
+        section.refresh_from_db()
+        return section.enrolled
+
+    def test_enrolls_in_several_sections_atomically(self):
+        response = self.client.post(f'{self.url}enroll/', {'sections': [self.full.pk, self.open.pk]}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([e['status'] for e in response.data], ['enrolled', 'enrolled'])
+        self.assertEqual(self.seats(self.full), 1)
+        self.assertEqual(self.seats(self.open), 11)
+        self.assertEqual(len(self.client.get(self.url).data), 2)
+
+    def test_full_section_rolls_back_the_whole_batch(self):
+        enroll_in_sections(self.students[1].userprofile, [self.full.pk])
+        response = self.client.post(f'{self.url}enroll/', {'sections': [self.full.pk, self.open.pk]}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['sections'], [self.full.pk])
+        self.assertEqual(self.seats(self.open), 10)
+        self.assertFalse(Enrollment.objects.filter(student__user=self.students[0]).exists())
+
+    def test_never_overbooks(self):
+        enroll_in_sections(self.students[0].userprofile, [self.full.pk])
+        with self.assertRaises(SectionsFull):
+            enroll_in_sections(self.students[1].userprofile, [self.full.pk])
+        self.assertEqual(self.seats(self.full), 1)
+
+    def test_waitlisted_student_takes_the_dropped_seat(self):
+        enroll_in_sections(self.students[1].userprofile, [self.full.pk])
+        response = self.client.post(f'{self.url}enroll/', {'sections': [self.full.pk], 'waitlist': True}, format='json')
+        self.assertEqual(response.data[0]['status'], 'waitlisted')
+        self.client.force_authenticate(self.students[1])
+        self.assertEqual(self.client.post(f'{self.url}drop/', {'sections': [self.full.pk]}, format='json').status_code, 204)
+        self.assertEqual(Enrollment.objects.get(section=self.full).student.user, self.students[0])
+        self.assertEqual(self.seats(self.full), 1)
+
+    def test_drop_releases_the_seat_and_logs_the_change(self):
+        enroll_in_sections(self.students[0].userprofile, [self.open.pk])
+        version = CatalogChange.objects.latest('version').version
+        self.client.post(f'{self.url}drop/', {'sections': [self.open.pk]}, format='json')
+        self.assertEqual(self.seats(self.open), 10)
+        self.assertTrue(CatalogChange.objects.filter(version__gt=version, kind='section', object_id=self.open.pk).exists())
+
+    def test_rejects_duplicate_and_unknown_sections(self):
+        enroll_in_sections(self.students[0].userprofile, [self.open.pk])
+        self.assertEqual(self.client.post(f'{self.url}enroll/', {'sections': [self.open.pk]}, format='json').status_code, 409)
+        self.assertEqual(self.client.post(f'{self.url}enroll/', {'sections': [999]}, format='json').status_code, 400)
+        self.assertEqual(self.client.post(f'{self.url}drop/', {'sections': [self.full.pk]}, format='json').status_code, 404)
+
+    def test_enrolled_count_is_read_only_through_the_section_api(self):
+        response = self.client.patch(f'/api/v1/courses/sections/{self.open.pk}/', {'enrolled': 0}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.seats(self.open), 10)
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class ConcurrentEnrollmentTests(TransactionTestCase):
+    def test_threads_racing_for_one_section_never_overbook(self):
+        course = Course.objects.create(id=1, name='Course 1', units=3)
+        section = Section.objects.create(course=course, section_number=1, capacity=5)
+        profiles = [
+            User.objects.create_user(username=f'student{number}', password='secret-pass-123').userprofile
+            for number in range(20)
+        ]
+
+        def attempt(profile):
+            try:
+                return enroll_in_sections(profile, [section.pk], waitlist=True)[0].status
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            statuses = list(pool.map(attempt, profiles))
+        section.refresh_from_db()
+        self.assertEqual(section.enrolled, 5)
+        self.assertEqual(statuses.count(Enrollment.ENROLLED), 5)
+        self.assertEqual(statuses.count(Enrollment.WAITLISTED), 15)
+
+    def test_a_drop_waits_for_a_waitlist_entry_being_written(self):
+        course = Course.objects.create(id=1, name='Course 1', units=3)
+        section = Section.objects.create(course=course, section_number=1, capacity=1)
+        holder, waiting = [
+            User.objects.create_user(username=f'student{number}', password='secret-pass-123').userprofile
+            for number in range(2)
+        ]
+        enroll_in_sections(holder, [section.pk])
+        writing, resume = threading.Event(), threading.Event()
+        bulk_create = Enrollment.objects.bulk_create
+
+        def paused_bulk_create(*args, **kwargs):
+            writing.set()
+            resume.wait(5)
+            return bulk_create(*args, **kwargs)
+
+        def run(function, *args):
+            try:
+                return function(*args)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            with mock.patch.object(Enrollment.objects, 'bulk_create', paused_bulk_create):
+                enrolling = pool.submit(run, enroll_in_sections, waiting, [section.pk], True)
+                self.assertTrue(writing.wait(5))
+                dropping = pool.submit(run, drop_sections, holder, [section.pk])
+                # The drop must queue behind the section lock rather than release the seat to nobody.
+                self.assertFalse(wait([dropping], timeout=0.2).done)
+                resume.set()
+                enrolling.result()
+            dropping.result()
+        section.refresh_from_db()
+        self.assertEqual((section.enrolled, section.waitlisted), (1, 0))
+        self.assertEqual(Enrollment.objects.get(section=section).status, Enrollment.ENROLLED)
+
+    def test_concurrent_drops_each_promote_a_waitlisted_student(self):
+        course = Course.objects.create(id=1, name='Course 1', units=3)
+        section = Section.objects.create(course=course, section_number=1, capacity=5)
+        profiles = [
+            User.objects.create_user(username=f'student{number}', password='secret-pass-123').userprofile
+            for number in range(10)
+        ]
+        for profile in profiles:
+            enroll_in_sections(profile, [section.pk], waitlist=True)
+
+        def drop(profile):
+            try:
+                drop_sections(profile, [section.pk])
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            list(pool.map(drop, profiles[:5]))
+        section.refresh_from_db()
+        self.assertEqual((section.enrolled, section.waitlisted), (5, 0))
+        self.assertEqual(Enrollment.objects.filter(section=section, status=Enrollment.ENROLLED).count(), 5)
+
+
+CATALOG_CSV = """course,course_name,units,prerequisites,corequisites,section,instructor,capacity,day,start_time,end_time,location
+1,Calculus I,3,,,1,Sara Smith,30,mon,08:00,09:30,Room 101
+1,,,,,1,,,wed,08:00,09:30,Room 101
+1,,,,,2,Ali Karimi,25,tue,10:00,11:30,Room 102
+2,Calculus II,3,1,3,1,Sara Smith,30,Monday,10:00,11:30,Room 101
+3,Calculus II Lab,1,,,,,,,,,
+"""
+
+
+class ImportCatalogTests(TestCase):
+    def write(self, content, suffix='.csv'):
+        handle = tempfile.NamedTemporaryFile('w', suffix=suffix, delete=False)
+        with handle:
+            handle.write(content)
+        self.addCleanup(os.unlink, handle.name)
+        return handle.name
+
+    def load(self, content, suffix='.csv', **options):
+        with self.captureOnCommitCallbacks(execute=True):
+            return import_catalog(read_rows(self.write(content, suffix)), **options)
+
+    def test_imports_courses_sections_times_and_requisites(self):
+        report = self.load(CATALOG_CSV)
+        self.assertEqual(report.rows, 5)
+        self.assertEqual(report.created, {'courses': 3, 'sections': 3, 'section_times': 4})
+        self.assertEqual(report.requisites_added, 2)
+        calculus = Course.objects.get(pk=2)
+        self.assertEqual(list(calculus.prerequisites.values_list('pk', flat=True)), [1])
+        self.assertEqual(list(calculus.corequisites.values_list('pk', flat=True)), [3])
+        self.assertEqual(SectionTime.objects.get(section__course_id=2).day, 'mon')
+        self.assertEqual(Section.objects.get(course_id=1, section_number=2).instructor, 'Ali Karimi')
+
+    def test_reimport_only_writes_changed_rows(self):
+        self.load(CATALOG_CSV)
+        Section.objects.filter(course_id=1).update(enrolled=7)
+        versions = CatalogChange.objects.count()
+        with self.assertNumQueries(9):
+            report = self.load(CATALOG_CSV)
+        self.assertEqual(report.updated, {'courses': 0, 'sections': 0, 'section_times': 0})
+        self.assertEqual(CatalogChange.objects.count(), versions)
+
+        report = self.load(CATALOG_CSV.replace('Room 102', 'Room 202').replace('Calculus I,3', 'Calculus I,4'))
+        self.assertEqual(report.updated, {'courses': 1, 'sections': 0, 'section_times': 1})
+        self.assertEqual(SectionTime.objects.get(section__section_number=2).location, 'Room 202')
+        self.assertEqual(Section.objects.get(course_id=1, section_number=1).enrolled, 7)
+
+    def test_prune_removes_meetings_missing_from_the_file(self):
+        self.load(CATALOG_CSV)
+        trimmed = '\n'.join(line for line in CATALOG_CSV.splitlines() if ',2,Ali' not in line and ',wed,' not in line)
+        report = self.load(trimmed + '\n', prune=True)
+        self.assertEqual(report.deleted, {'sections': 1, 'section_times': 1})
+        self.assertFalse(Section.objects.filter(course_id=1, section_number=2).exists())
+        self.assertTrue(CatalogChange.objects.filter(kind='section', deleted=True).exists())
+
+    def test_new_courses_reach_the_prerequisite_graph(self):
+        self.load(CATALOG_CSV)
+        self.assertNotIn(4, eligible_courses(set()))
+        self.load(CATALOG_CSV + '4,Physics I,3,,,,,,,,,\n')
+        self.assertIn(4, eligible_courses(set()))
+
+    def test_json_lines_input(self):
+        rows = [
+            {'course': 5, 'course_name': 'Databases', 'units': 3, 'prerequisites': [], 'section': 1,
+             'capacity': 40, 'day': 'thu', 'start_time': '13:00', 'end_time': '14:30'},
+        ]
+        report = self.load('\n'.join(json.dumps(row) for row in rows), suffix='.jsonl')
+        self.assertEqual(report.created['section_times'], 1)
+
+    def test_invalid_files_are_rejected_before_writing(self):
+        bad = CATALOG_CSV + '4,Broken,3,99,,1,X,10,mon,10:00,09:00,Room 1\n'
+        with self.assertRaises(CommandError):
+            call_command('import_catalog', self.write(bad), stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertFalse(Course.objects.exists())
+
+
+class BulkWriteTests(APITestCase):
+    url = '/api/v1/courses/sections/bulk/'
+
+    def setUp(self):
+        self.client.force_authenticate(
+            User.objects.create_user(username='admin', password='secret-pass-123', is_staff=True)
+        )
+        create_catalog(2, sections_per_course=1)
+
+    def meeting(self, day='tue', start='10:00', end='11:00', location='Room 201'):
+        return {'day': day, 'start_time': start, 'end_time': end, 'location': location}
+
+    def test_creates_updates_and_deletes_sections_with_times(self):
+        existing = Section.objects.get(course_id=1)
+        doomed = Section.objects.get(course_id=2)
+        payload = {
+            'upsert': [
+                {'id': existing.pk, 'course': 1, 'section_number': 1, 'instructor': 'Maryam Karimi', 'capacity': 40,
+                 'times': [self.meeting('mon', '08:00', '09:30', 'Room 101')]},
+                {'course': 2, 'section_number': 5, 'capacity': 20,
+                 'times': [self.meeting(), self.meeting('thu')]},
+            ],
+            'delete': [doomed.pk],
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        first, second = response.data['sections']
+        self.assertEqual((first['id'], first['instructor'], first['enrolled']), (existing.pk, 'Maryam Karimi', 10))
+        self.assertEqual([time['day'] for time in first['times']], ['mon'])
+        self.assertEqual(sorted(time['day'] for time in second['times']), ['thu', 'tue'])
+        self.assertFalse(Section.objects.filter(pk=doomed.pk).exists())
+        changed = set(CatalogChange.objects.filter(kind='section').values_list('object_id', flat=True))
+        self.assertTrue({existing.pk, second['id'], doomed.pk} <= changed)
+
+    def test_rejects_room_overlaps_within_the_batch_and_with_stored_times(self):
+        payload = {'upsert': [
+            {'course': 1, 'section_number': 2, 'times': [self.meeting()]},
+            {'course': 2, 'section_number': 2, 'times': [self.meeting(start='10:30', end='12:00', location=' room 201')]},
+            {'course': 2, 'section_number': 3, 'times': [self.meeting('mon', '09:00', '10:00', 'Room 101')]},
+        ]}
+        response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        conflicts = response.data['conflicts']
+        # The fixture's two Monday meetings in Room 101 both overlap the new one.
+        self.assertEqual([(conflict['location'], conflict['day']) for conflict in conflicts],
+                         [('room 101', 'mon'), ('room 101', 'mon'), ('room 201', 'tue')])
+        self.assertEqual(conflicts[2]['slots'], [['upsert', 0, 0], ['upsert', 1, 0]])
+        self.assertEqual(Section.objects.count(), 2)
+
+    def test_replacing_a_sections_times_frees_its_room(self):
+        section = Section.objects.get(course_id=1)
+        payload = {'upsert': [
+            {'id': section.pk, 'course': 1, 'section_number': 1, 'times': [self.meeting('mon', '08:30', '09:30', 'Room 101')]},
+        ]}
+        self.assertEqual(self.client.post(self.url, payload, format='json').status_code, 400)
+        Section.objects.filter(course_id=2).delete()
+        response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(SectionTime.objects.filter(section=section).count(), 1)
+
+    def test_validates_rows(self):
+        payload = {'upsert': [
+            {'course': 1, 'section_number': 3, 'times': [self.meeting(start='11:00', end='10:00')]},
+        ]}
+        response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('end_time', response.data['upsert'][0]['times'][0])
+        payload = {'upsert': [{'course': 1, 'section_number': 3}, {'course': 1, 'section_number': 3}]}
+        self.assertEqual(self.client.post(self.url, payload, format='json').status_code, 400)
+        payload = {'upsert': [{'course': 99, 'section_number': 1}]}
+        self.assertEqual(self.client.post(self.url, payload, format='json').data, {'courses': 'Unknown ids: [99]'})
+
+    def test_section_times_batch(self):
+        section = Section.objects.get(course_id=1)
+        monday = SectionTime.objects.get(section=section, day='mon')
+        payload = {
+            'upsert': [
+                {'id': monday.pk, 'section': section.pk, **self.meeting('mon', '08:00', '10:00', 'Room 101')},
+                {'section': section.pk, **self.meeting('fri')},
+            ],
+            'delete': [SectionTime.objects.get(section=section, day='wed').pk],
+        }
+        response = self.client.post('/api/v1/courses/section-times/bulk/', payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['conflicts'][0]['location'], 'room 101')
+
+        payload['upsert'][0]['location'] = 'Room 102'
+        response = self.client.post('/api/v1/courses/section-times/bulk/', payload, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(sorted(SectionTime.objects.filter(section=section).values_list('day', flat=True)), ['fri', 'mon'])
+        self.assertEqual(SectionTime.objects.get(pk=monday.pk).end_time, time(10))
+
+    def test_a_row_taken_mid_batch_is_a_validation_error(self):
+        def racing_writer(*args, **kwargs):
+            Section.objects.create(course_id=2, section_number=5, capacity=10)
+            return room_conflicts(*args, **kwargs)
+
+        payload = {'upsert': [{'course': 2, 'section_number': 5, 'times': [self.meeting()]}]}
+        with mock.patch('courses.bulk.room_conflicts', side_effect=racing_writer):
+            response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('non_field_errors', response.data)
+        self.assertFalse(Section.objects.filter(course_id=2, section_number=5).exists())
+
+    def test_meeting_ids_are_read_back_without_returning_inserts(self):
+        section = Section.objects.get(course_id=1)
+        payload = {'upsert': [{'section': section.pk, **self.meeting('fri')}, {'section': section.pk, **self.meeting('sat')}]}
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            response = self.client.post('/api/v1/courses/section-times/bulk/', payload, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        ids = [row['id'] for row in response.data['section_times']]
+        expected = [SectionTime.objects.get(section=section, day=day).pk for day in ('fri', 'sat')]
+        self.assertEqual(ids, expected)
+        changed = set(CatalogChange.objects.filter(kind='section_time').values_list('object_id', flat=True))
+        self.assertTrue(set(expected) <= changed)
+
+
+    def test_only_staff_can_write_in_bulk(self):
+        self.client.force_authenticate(User.objects.create_user(username='student', password='secret-pass-123'))
+        doomed = Section.objects.get(course_id=2)
+        response = self.client.post(self.url, {'delete': [doomed.pk]}, format='json')
+        self.assertEqual(response.status_code, 403)
+        response = self.client.post(
+            '/api/v1/courses/section-times/bulk/', {'delete': [doomed.times.first().pk]}, format='json'
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertTrue(Section.objects.filter(pk=doomed.pk).exists())
+
+
+class ClashDetectionTests(APITestCase):
+    url = '/api/v1/courses/clashes/'
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(User.objects.create_user(username='student', password='secret-pass-123'))
+        # Both sections meet in Room 101 with "Instructor 1" on Monday and Wednesday.
+        create_catalog(2, sections_per_course=1)
+
+    def test_overlapping_pairs_skips_touching_slots(self):
+        slots = [(time(8), time(9), 'a'), (time(9), time(10), 'b'), (time(9, 30), time(11), 'c'), (time(8), time(12), 'd')]
+        pairs = {frozenset(pair) for pair in overlapping_pairs(slots)}
+        self.assertEqual(pairs, {frozenset(pair) for pair in ['ad', 'bd', 'cd', 'bc']})
+
+    def test_lists_room_and_instructor_clashes(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 4)
+        response = self.client.get(self.url, {'kind': 'room', 'day': 'mon'})
+        self.assertEqual(response.data['count'], 1)
+        clash = response.data['clashes'][0]
+        self.assertEqual((clash['kind'], clash['resource'], clash['day']), ('room', 'room 101', 'mon'))
+        self.assertEqual({meeting['course'] for meeting in clash['meetings']}, {1, 2})
+        self.assertEqual(self.client.get(self.url, {'kind': 'desk'}).status_code, 400)
+
+    def test_saves_patch_the_cached_report(self):
+        self.assertEqual(len(clash_report()), 4)
+        meeting = SectionTime.objects.get(section__course_id=1, day='mon')
+        meeting.location = 'Room 102'
+        with self.captureOnCommitCallbacks(execute=True):
+            meeting.save()
+        self.assertEqual(cache.get(REPORT_KEY), find_clashes())
+        self.assertEqual(len(cache.get(REPORT_KEY)), 3)
+
+        section = Section.objects.get(course_id=2)
+        section.instructor = 'Someone Else'
+        with self.captureOnCommitCallbacks(execute=True):
+            section.save()
+        self.assertEqual(cache.get(REPORT_KEY), find_clashes())
+        self.assertEqual(len(cache.get(REPORT_KEY)), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            SectionTime.objects.filter(section__course_id=2, day='wed').delete()
+        self.assertEqual(cache.get(REPORT_KEY), set())
+
+    def test_neighbours_are_looked_up_by_index(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('reads SQLite query plans')
+        meeting = SectionTime.objects.get(section__course_id=1, day='mon')
+        with CaptureQueriesContext(connection) as queries:
+            clashes = clashes_with([meeting.pk])
+        self.assertEqual({clash[0] for clash in clashes}, {'room', 'instructor'})
+        plans = []
+        with connection.cursor() as cursor:
+            for query in queries.captured_queries[1:]:
+                cursor.execute(f'EXPLAIN QUERY PLAN {query["sql"]}')
+                plans.append(' '.join(row[-1] for row in cursor.fetchall()))
+        self.assertIn('USING INDEX courses_time_room_day_idx', plans[0])
+        self.assertIn('USING INDEX courses_section_teacher_idx', plans[1])
+
+    def test_command_lists_clashes(self):
+        out = io.StringIO()
+        call_command('find_clashes', '--kind', 'room', stdout=out)
+        self.assertIn("room 'room 101' mon", out.getvalue())
+        self.assertIn('2 clashes found', out.getvalue())
+
+
+class RoomOccupancyTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(User.objects.create_user(username='scheduler', password='secret-pass-123'))
+        # Every section meets in Room 101 on Monday and Wednesday, 08:00-09:30.
+        create_catalog(1, sections_per_course=1)
+        section = Section.objects.get()
+        SectionTime.objects.create(section=section, day='mon', start_time=time(10), end_time=time(11), location='Room 102')
+
+    def test_matrix_widens_meetings_to_whole_slots(self):
+        matrix = OccupancyMatrix([('tue', time(10, 2), time(10, 58), 'Lab')])
+        self.assertEqual(matrix.free_rooms('tue', time(9), time(10)), ['Lab'])
+        self.assertEqual(matrix.free_rooms('tue', time(10), time(10, 3)), [])
+        self.assertEqual(matrix.free_rooms('tue', time(11), time(12)), ['Lab'])
+        self.assertEqual(OccupancyMatrix([]).free_rooms('mon', time(8), time(9)), [])
+
+    def test_free_rooms(self):
+        url = '/api/v1/courses/rooms/free/'
+        response = self.client.get(url, {'day': 'mon', 'start': '10:00', 'end': '11:30'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['rooms'], ['Room 101'])
+        response = self.client.get(url, {'day': 'mon', 'start': '09:30', 'end': '10:00'})
+        self.assertEqual(response.data['rooms'], ['Room 101', 'Room 102'])
+        self.assertEqual(self.client.get(url, {'day': 'mon', 'start': '11:00', 'end': '10:00'}).status_code, 400)
+
+    def test_matrix_is_rebuilt_when_times_change(self):
+        url = '/api/v1/courses/rooms/free/'
+        params = {'day': 'tue', 'start': '10:00', 'end': '11:00'}
+        self.assertEqual(len(self.client.get(url, params).data['rooms']), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            SectionTime.objects.create(section=Section.objects.get(), day='tue', start_time=time(10, 30),
+                                       end_time=time(12), location='room 102 ')
+        self.assertEqual(self.client.get(url, params).data['rooms'], ['Room 101'])
+
+    @override_settings(CACHE_SHARED=False, LOCAL_STATE_TTL=10)
+    def test_without_a_shared_cache_the_matrix_is_rebuilt_on_a_timer(self):
+        url = '/api/v1/courses/rooms/free/'
+        params = {'day': 'tue', 'start': '10:00', 'end': '11:00'}
+        with mock.patch('courses.versioning.time') as clock:
+            clock.time.return_value = 1000.0
+            self.assertEqual(len(self.client.get(url, params).data['rooms']), 2)
+            # Another worker's change reaches this one only through the database.
+            SectionTime.objects.bulk_create([SectionTime(
+                section=Section.objects.get(), day='tue', start_time=time(10), end_time=time(11), location='Room 102',
+            )])
+            clock.time.return_value = 1009.0
+            self.assertEqual(len(self.client.get(url, params).data['rooms']), 2)
+            clock.time.return_value = 1010.0
+            self.assertEqual(self.client.get(url, params).data['rooms'], ['Room 101'])
+
+    def test_utilization(self):
+        url = '/api/v1/courses/rooms/utilization/'
+        response = self.client.get(url, {'start': '08:00', 'end': '12:00', 'bucket': 90})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['buckets'], ['08:00', '09:30', '11:00'])
+        # Room 101 is busy for 90 of 240 minutes on Monday and Wednesday.
+        room = response.data['rooms'][0]
+        self.assertEqual((room['room'], room['days']['mon'], room['days']['tue']), ('Room 101', 0.375, 0.0))
+        self.assertEqual(response.data['heatmap']['mon'], [0.5, 0.3333, 0.0])
+        response = self.client.get(url, {'room': ' room 102', 'start': '10:00', 'end': '11:00'})
+        self.assertEqual([room['days']['mon'] for room in response.data['rooms']], [1.0])
+        self.assertEqual(self.client.get(url, {'room': 'Room 999'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'bucket': 7}).status_code, 400)
+
+
+class DemandStatsTests(APITestCase):
+    url = '/api/v1/courses/demand/'
+
+    def setUp(self):
+        cache.clear()
+        create_catalog(2, sections_per_course=2)
+        first, second = Section.objects.filter(course_id=1).order_by('section_number')
+        Section.objects.filter(pk=first.pk).update(capacity=1, enrolled=0)
+        Section.objects.filter(pk=second.pk).update(capacity=10)
+        self.section = first
+        self.students = [
+            User.objects.create_user(username=f'student{number}', password='secret-pass-123') for number in range(3)
+        ]
+        for student in self.students[:2]:
+            enroll_in_sections(student.userprofile, [first.pk], waitlist=True)
+        self.client.force_authenticate(self.students[0])
+
+    def test_course_pressure(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['totals'], {
+            'sections': 4, 'full_sections': 2, 'capacity': 71, 'enrolled': 31, 'waitlisted': 1,
+        })
+        first, second = response.data['results']
+        self.assertEqual(first, {
+            'course': 1, 'name': 'Course 1', 'sections': 2, 'full_sections': 2, 'capacity': 11, 'enrolled': 11,
+            'waitlisted': 1, 'fill_ratio': 1.0, 'projected_fill': 12 / 11, 'projected_overflow': 1, 'rank': 1,
+        })
+        self.assertEqual((second['course'], second['fill_ratio'], second['projected_overflow'], second['rank']),
+                         (2, 1 / 3, 0, 2))
+
+    def test_instructor_pressure(self):
+        response = self.client.get(self.url, {'by': 'instructor', 'limit': 1})
+        row, = response.data['results']
+        self.assertEqual((row['instructor'], row['capacity'], row['enrolled'], row['waitlisted']),
+                         ('Instructor 2', 40, 20, 0))
+        self.assertEqual(self.client.get(self.url, {'by': 'room'}).status_code, 400)
+
+    def test_stale_report_is_served_until_the_refresh_interval_passes(self):
+        self.assertEqual(self.client.get(self.url).data['totals']['waitlisted'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            enroll_in_sections(self.students[2].userprofile, [self.section.pk], waitlist=True)
+        self.assertEqual(self.client.get(self.url).data['totals']['waitlisted'], 1)
+        with override_settings(DEMAND_STATS_MIN_REFRESH=0):
+            self.assertEqual(self.client.get(self.url).data['totals']['waitlisted'], 2)
+            with self.captureOnCommitCallbacks(execute=True):
+                drop_sections(self.students[0].userprofile, [self.section.pk])
+            totals = self.client.get(self.url).data['totals']
+        self.assertEqual((totals['enrolled'], totals['waitlisted']), (31, 1))
+
+    @override_settings(CACHE_SHARED=False, DEMAND_STATS_MIN_REFRESH=30)
+    def test_without_a_shared_cache_the_report_expires_after_the_refresh_interval(self):
+        with mock.patch('courses.demand.time') as clock:
+            clock.time.return_value = 1000.0
+            self.assertEqual(self.client.get(self.url).data['totals']['waitlisted'], 1)
+            # Another worker's enrollment: its bump only reaches that worker's cache.
+            Section.objects.filter(pk=self.section.pk).update(waitlisted=4)
+            clock.time.return_value = 1029.0
+            self.assertEqual(self.client.get(self.url).data['totals']['waitlisted'], 1)
+            clock.time.return_value = 1030.0
+            self.assertEqual(self.client.get(self.url).data['totals']['waitlisted'], 4)
+
+
+class LiveSeatTests(TestCase):
+    url = '/api/v1/courses/live/seats/'
+
+    def setUp(self):
+        cache.clear()
+        create_catalog(1, sections_per_course=2)
+        self.first, self.second = Section.objects.order_by('id')
+        self.user = User.objects.create_user(username='watcher', password='secret-pass-123')
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    async def test_broker_coalesces_bursts_and_skips_unchanged_seats(self):
+        broker = SeatBroker(interval=3600)
+        both = broker.subscribe([self.first.pk, self.second.pk], {self.first.pk: (10, 30), self.second.pk: (10, 30)})
+        second_only = broker.subscribe([self.second.pk])
+        for enrolled in (11, 12, 13):
+            broker.publish({self.first.pk: (enrolled, 30), self.second.pk: (10, 30)})
+        self.assertEqual(await both.next_batch(), {self.first.pk: (13, 30)})
+        self.assertFalse(second_only.ready.is_set())
+        broker.unsubscribe(both)
+        broker.unsubscribe(second_only)
+        self.assertEqual(broker.subscribers, {})
+        broker.poller.cancel()
+
+    async def test_without_a_shared_cache_seats_are_read_on_every_check(self):
+        broker = SeatBroker(interval=3600)
+        subscription = broker.subscribe([self.first.pk], {self.first.pk: (10, 30)})
+        with override_settings(CACHE_SHARED=True):
+            await broker.refresh()
+            # Another worker enrolls; the generation it bumps is in its own cache.
+            await Section.objects.filter(pk=self.first.pk).aupdate(enrolled=12)
+            await broker.refresh()
+        self.assertFalse(subscription.ready.is_set())
+        await broker.refresh()
+        self.assertEqual(await subscription.next_batch(), {self.first.pk: (12, 30)})
+        broker.unsubscribe(subscription)
+        broker.poller.cancel()
+
+    async def test_poller_survives_a_failed_refresh(self):
+        broker = SeatBroker(interval=0.01)
+        read = mock.Mock(side_effect=[DatabaseError('connection lost'), {self.first.pk: (12, 30)}])
+        with mock.patch('courses.live.read_seats', read), self.assertLogs('courses.live', 'ERROR'):
+            subscription = broker.subscribe([self.first.pk], {self.first.pk: (10, 30)})
+            batch = await asyncio.wait_for(subscription.next_batch(), 5)
+        self.assertEqual(batch, {self.first.pk: (12, 30)})
+        self.assertFalse(broker.poller.done())
+        broker.unsubscribe(subscription)
+        await broker.poller
+
+    @override_settings(SEAT_PUSH_INTERVAL=0.01)
+    async def test_stream_pushes_seat_changes(self):
+        response = await self.async_client.get(self.url, {'sections': f'{self.first.pk}'}, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        first = await anext(stream)
+        self.assertTrue(first.startswith(b'event: seats\n'))
+        self.assertEqual(json.loads(first.split(b'data: ')[1])['sections'],
+                         [{'id': self.first.pk, 'enrolled': 10, 'capacity': 30, 'available': 20}])
+
+        await Section.objects.filter(pk=self.first.pk).aupdate(enrolled=30)
+        await sync_to_async(bump_catalog_generation)()
+        update = await asyncio.wait_for(anext(stream), 5)
+        self.assertEqual(json.loads(update.split(b'data: ')[1])['sections'][0]['available'], 0)
+        # A client disconnect cancels the task waiting on the stream.
+        waiting = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0.05)
+        waiting.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiting
+        self.assertEqual(seat_broker.subscribers, {})
+
+    async def test_stream_requires_authentication_and_known_sections(self):
+        response = await self.async_client.get(self.url, {'sections': f'{self.first.pk}'})
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get(self.url, {'sections': '999'}, headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+        response = await self.async_client.get(self.url, {'sections': 'x'}, headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+
+    def test_stream_is_refused_under_wsgi(self):
+        response = self.client.get(self.url, {'sections': f'{self.first.pk}'}, headers=self.headers)
+        self.assertEqual(response.status_code, 501)
+        self.assertFalse(response.streaming)
+
+
+class AsyncCatalogViewTests(APITestCase):
+    def setUp(self):
+        create_catalog(5)
+        self.client.force_authenticate(User.objects.create_user(username='reader', password='secret-pass-123'))
+
+    def test_async_endpoints_match_the_sync_ones(self):
+        for path in ['courses/', 'courses/?ordering=-name&page_size=2', 'sections/?course=2', 'section-times/?day=mon',
+                     'sections/?search=Instructor 2&ordering=-capacity']:
+            expected = self.client.get(f'/api/v1/courses/{path}')
+            response = self.client.get(f'/api/v1/courses/async/{path}')
+            self.assertEqual(response.status_code, 200, path)
+            self.assertEqual(response.data['results'], expected.data['results'], path)
+            self.assertEqual(bool(response.data['next']), bool(expected.data['next']), path)
+        section = Section.objects.first()
+        for path in ['courses/3/', f'sections/{section.pk}/', f'section-times/{section.times.first().pk}/']:
+            self.assertEqual(self.client.get(f'/api/v1/courses/async/{path}').data,
+                             self.client.get(f'/api/v1/courses/{path}').data, path)
+
+    def test_cursor_pagination_and_errors(self):
+        first = self.client.get('/api/v1/courses/async/courses/', {'page_size': 2}).data
+        second = self.client.get(first['next']).data
+        self.assertEqual([course['id'] for course in second['results']], [3, 4])
+        self.assertEqual(self.client.get('/api/v1/courses/async/courses/99/').status_code, 404)
+        self.assertEqual(self.client.get('/api/v1/courses/async/sections/', {'course': 99}).status_code, 400)
+        self.assertEqual(self.client.post('/api/v1/courses/async/courses/', {}).status_code, 405)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get('/api/v1/courses/async/courses/').status_code, 401)
+
+
+class DatabaseSettingsTests(APITestCase):
+    def test_settings_from_environment(self):
+        default = database_settings({})['default']
+        self.assertEqual(default['CONN_MAX_AGE'], 60)
+        self.assertTrue(default['CONN_HEALTH_CHECKS'])
+        # The default host is a PgBouncer pooler, which cannot hold server-side cursors.
+        self.assertTrue(default['DISABLE_SERVER_SIDE_CURSORS'])
+        self.assertNotIn('pool', default['OPTIONS'])
+
+        databases = database_settings({
+            'DB_HOST': 'primary.internal', 'DB_STATEMENT_TIMEOUT_MS': '5000', 'DB_POOL_MAX_SIZE': '16',
+            'DB_REPLICA_HOST': 'replica.internal', 'DB_CONN_HEALTH_CHECKS': 'false',
+        })
+        default, replica = databases['default'], databases['replica']
+        self.assertEqual(default['CONN_MAX_AGE'], 0)
+        self.assertFalse(default['CONN_HEALTH_CHECKS'])
+        self.assertFalse(default['DISABLE_SERVER_SIDE_CURSORS'])
+        self.assertEqual(default['OPTIONS']['options'], '-c statement_timeout=5000')
+        self.assertEqual(default['OPTIONS']['pool'], {'min_size': 2, 'max_size': 16, 'timeout': 10.0})
+        self.assertEqual(replica['HOST'], 'replica.internal')
+        self.assertEqual(replica['OPTIONS']['pool'], default['OPTIONS']['pool'])
+        self.assertIsNot(replica['OPTIONS'], default['OPTIONS'])
+        self.assertEqual(replica['TEST'], {'MIRROR': 'default'})
+
+    def test_catalog_reads_follow_the_replica_only_when_asked(self):
+        router = ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Course))
+        with reading_from_replica():
+            self.assertIsNone(router.db_for_read(Course))
+            with override_settings(CATALOG_READ_DATABASE='default'):
+                self.assertEqual(router.db_for_read(Section), 'default')
+                self.assertIsNone(router.db_for_read(User))
+        self.assertFalse(router.allow_migrate('replica', 'courses'))
+
+    @override_settings(CATALOG_READ_DATABASE='default')
+    def test_viewsets_read_catalog_from_replica(self):
+        create_catalog(2)
+        self.client.force_authenticate(
+            User.objects.create_user(username='reader', password='secret-pass-123', is_staff=True)
+        )
+        routed = []
+        route = ReplicaRouter.db_for_read
+
+        def record(router, model, **hints):
+            routed.append((model, route(router, model, **hints)))
+            return routed[-1][1]
+
+        with mock.patch.object(ReplicaRouter, 'db_for_read', record):
+            self.assertEqual(self.client.get('/api/v1/courses/sections/').status_code, 200)
+            self.assertEqual(self.client.get('/api/v1/courses/async/courses/').status_code, 200)
+            self.assertIn((Section, 'default'), routed)
+            self.assertIn((Course, 'default'), routed)
+            routed.clear()
+            response = self.client.post('/api/v1/courses/sections/bulk/', {'upsert': [], 'delete': []}, format='json')
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(all(alias is None for _, alias in routed))
+
+    def test_connection_stats(self):
+        stats = ConnectionStats(window=3)
+        for seconds in (0.001, 0.002, 0.003, 0.004):
+            stats.acquired('default', seconds)
+        stats.released('default')
+        stats.failed('default')
+        with self.assertLogs('unipath_backend.database', 'WARNING'):
+            stats.acquired('replica', 1.0)
+        report = stats.snapshot()
+        self.assertEqual(report['default']['acquired'], 4)
+        self.assertEqual(report['default']['open'], 3)
+        self.assertEqual(report['default']['failed'], 1)
+        self.assertAlmostEqual(report['default']['mean_ms'], 2.5)
+        self.assertAlmostEqual(report['default']['max_ms'], 4.0)
+        self.assertEqual(report['replica']['open'], 1)
+        self.assertIsNone(pool_stats(connection))
+
+
+class PerformanceMetricsTests(APITestCase):
+    def setUp(self):
+        metrics.reset()
+        create_catalog(3)
+        self.client.force_authenticate(User.objects.create_user(username='reader', password='secret-pass-123'))
+
+    @override_settings(PERFORMANCE_SAMPLE_RATE=1)
+    def test_profiled_requests_report_queries_and_serializer_time(self):
+        response = self.client.get('/api/v1/courses/sections/')
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="[1-9]\d* queries", serialize;dur=[\d.]+$')
+        # Queries the async views run in a worker thread are counted too.
+        response = self.client.get('/api/v1/courses/async/courses/')
+        self.assertRegex(response['Server-Timing'], r'desc="[1-9]\d* queries"')
+
+        with override_settings(METRICS_TOKEN='scrape-token'):
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+            body = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-token').content.decode()
+        self.assertIn('unipath_http_requests_total{view="section-list",method="GET",status="200"} 1', body)
+        self.assertIn('unipath_http_request_duration_seconds_bucket{view="section-list",method="GET",le="+Inf"} 1', body)
+        self.assertRegex(body, r'unipath_profiled_db_queries_total\{view="async-course-list",method="GET"\} [1-9]')
+        self.assertRegex(body, r'unipath_http_response_bytes_total\{view="section-list",method="GET"\} [1-9]')
+
+    @override_settings(PERFORMANCE_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_only_timed(self):
+        response = self.client.get('/api/v1/courses/sections/')
+        self.assertRegex(response['Server-Timing'], r'^app;dur=[\d.]+$')
+        self.assertEqual(metrics.sampled, {})
+        self.assertEqual(metrics.statuses['section-list', 'GET', 200], 1)
+        # DEBUG is off under test and no token is set.
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+
+    @override_settings(PERFORMANCE_SAMPLE_RATE=1, PERFORMANCE_QUERY_THRESHOLD=1)
+    def test_query_heavy_endpoints_are_logged_once_a_minute(self):
+        with self.assertLogs('unipath_backend.metrics', 'WARNING') as logs:
+            self.client.get('/api/v1/courses/sections/')
+        self.assertIn('GET section-list ran', logs.output[0])
+        with self.assertNoLogs('unipath_backend.metrics', 'WARNING'):
+            self.client.get('/api/v1/courses/sections/')
+
+
+class ValuesListTests(APITestCase):
+    def setUp(self):
+        create_catalog(6)
+        self.client.force_authenticate(User.objects.create_user(username='reader', password='secret-pass-123'))
+
+    def test_lists_match_the_model_serializers(self):
+        for path in ['courses/', 'courses/?ordering=-name&page_size=2', 'courses/?search=Course 3', 'sections/?course=2',
+                     'sections/?ordering=-capacity&page_size=3', 'section-times/?day=wed', 'section-times/?ordering=start_time']:
+            expected = self.client.get(f'/api/v1/courses/{path}&fast=0' if '?' in path else f'/api/v1/courses/{path}?fast=0')
+            response = self.client.get(f'/api/v1/courses/{path}')
+            self.assertEqual(response.status_code, 200, path)
+            self.assertEqual(response.json()['results'], expected.json()['results'], path)
+            self.assertEqual(bool(response.data['next']), bool(expected.data['next']), path)
+
+    def test_other_paginators_go_through_the_serializer(self):
+        with mock.patch.object(SectionViewSet, 'pagination_class', PageNumberPagination):
+            response = self.client.get('/api/v1/courses/sections/', {'page': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 12)
+        with mock.patch.object(SectionViewSet, 'pagination_class', None):
+            response = self.client.get('/api/v1/courses/sections/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 12)
+
+    def test_cursor_pages_and_query_count(self):
+        first = self.client.get('/api/v1/courses/sections/', {'page_size': 5, 'ordering': '-section_number'}).data
+        second = self.client.get(first['next']).data
+        ids = [section['id'] for section in first['results'] + second['results']]
+        self.assertEqual(ids, list(Section.objects.order_by('-section_number', '-id').values_list('pk', flat=True)[:10]))
+        with self.assertNumQueries(2):
+            self.client.get('/api/v1/courses/sections/', {'page_size': 50})
+        # Courses, prerequisites, corequisites, sections, times.
+        with self.assertNumQueries(5):
+            self.client.get('/api/v1/courses/courses/', {'page_size': 50})
+
+
+class ORJSONRendererTests(SimpleTestCase):
+    def test_output_matches_the_json_renderer(self):
+        data = {
+            'text': 'caf\u00e9 \u2028 \u2029 "quoted"', 'lazy': gettext_lazy('Invalid cursor'), 'number': Decimal('1.50'),
+            'when': datetime(2026, 1, 2, 3, 4, 5, 678901, tzinfo=timezone.utc), 'at': time(8, 30),
+            'nested': [{'a': 1, 'b': None, 'c': True, 'd': 2.5}], 7: 'int key',
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+        self.assertEqual(ORJSONRenderer().render(data, 'application/json; indent=2'),
+                         JSONRenderer().render(data, 'application/json; indent=2'))
+
+
+class SyntheticDataTests(TestCase):
+    def catalog_rows(self):
+        return (
+            list(Course.objects.order_by('id').values_list('id', 'name', 'units')),
+            # Section ids come from the database, so sections are told apart by course and number.
+            list(SectionTime.objects.order_by('id').values_list(
+                'section__course_id', 'section__section_number', 'day', 'start_time', 'location',
+            )),
+            sorted(Course.prerequisites.through.objects.values_list('from_course_id', 'to_course_id')),
+            sorted(Course.corequisites.through.objects.values_list('from_course_id', 'to_course_id')),
+        )
+
+    def test_same_seed_same_catalog(self):
+        generate_catalog(60, 2, seed=3, max_prerequisites=3, corequisite_ratio=0.2)
+        first = self.catalog_rows()
+        Course.objects.all().delete()
+        generate_catalog(60, 2, seed=3, max_prerequisites=3, corequisite_ratio=0.2)
+        self.assertEqual(self.catalog_rows(), first)
+        Course.objects.all().delete()
+        generate_catalog(60, 2, seed=4, max_prerequisites=3, corequisite_ratio=0.2)
+        self.assertNotEqual(self.catalog_rows(), first)
+
+    def test_requisites_point_at_recent_lower_ids(self):
+        generate_catalog(200, 1, first_course_id=1000, max_prerequisites=3, corequisite_ratio=0.1)
+        _, _, prerequisites, corequisites = self.catalog_rows()
+        self.assertTrue(prerequisites and corequisites)
+        for course_id, other_id in prerequisites + corequisites:
+            self.assertLess(other_id, course_id)
+            self.assertLessEqual(course_id - other_id, REQUISITE_WINDOW)
+        self.assertTrue(set(prerequisites).isdisjoint(corequisites))
+        per_course = {}
+        for course_id, _ in prerequisites:
+            per_course[course_id] = per_course.get(course_id, 0) + 1
+        self.assertLessEqual(max(per_course.values()), 3)
+
+    def test_without_requisites_by_default(self):
+        generate_catalog(20, 1)
+        self.assertFalse(Course.prerequisites.through.objects.exists())
+        self.assertFalse(Course.corequisites.through.objects.exists())
+
+    def test_students_with_profiles_can_log_in(self):
+        report = generate_students(5, password='Generated-Pass-1', first_number=10)
+        self.assertEqual(report.created, 5)
+        user = User.objects.get(username='student12')
+        self.assertEqual(user.userprofile.student_id, 'S0000012')
+        response = self.client.post(
+            '/api/v1/auth/login/', {'username': 'student12', 'password': 'Generated-Pass-1'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(generate_students(5, first_number=10).skipped, 5)
+
+    def test_command_refuses_existing_course_ids(self):
+        out = io.StringIO()
+        call_command('generate_catalog', courses=30, sections_per_course=1, students=3, stdout=out)
+        self.assertIn('catalog: 30 courses, 30 sections', out.getvalue())
+        self.assertEqual(User.objects.filter(username__startswith='student').count(), 3)
+        with self.assertRaises(CommandError):
+            call_command('generate_catalog', courses=10, first_course_id=25, students=0, stdout=out)
+
+
+class BaselineComparisonTests(SimpleTestCase):
+    def test_find_regressions(self):
+        baseline = {
+            'list': {'p50_ms': 10.0, 'p95_ms': 20.0, 'queries': 3},
+            'detail': {'p50_ms': 0.2, 'p95_ms': 0.4, 'queries': 1},
+            'http all': {'p50_ms': 30.0, 'throughput': 100.0},
+            'removed': {'p50_ms': 1.0},
+        }
+        results = {
+            'list': {'p50_ms': 15.5, 'p95_ms': 90.0, 'queries': 3},
+            'detail': {'p50_ms': 1.1, 'p95_ms': 5.0, 'queries': 1},
+            'http all': {'p50_ms': 31.0, 'throughput': 70.0},
+        }
+        # Within 50% plus 1ms, tail latency ignored, missing results skipped.
+        self.assertEqual(find_regressions(results, baseline), [])
+        results['list'].update(p50_ms=16.5, queries=4)
+        results['http all']['throughput'] = 60.0
+        self.assertEqual(find_regressions(results, baseline), [
+            'http all: throughput 60.0/s < baseline 100.0/s',
+            'list: p50_ms 16.50 > baseline 10.00',
+            'list: queries 4 > baseline 3',
+        ])
+        self.assertEqual(len(find_regressions(results, baseline, tolerance=1.0)), 1)
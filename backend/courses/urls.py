@@ -6,7 +6,25 @@ router = DefaultRouter()
 router.register(r'courses', views.CourseViewSet)
 router.register(r'sections', views.SectionViewSet)
 router.register(r'section-times', views.SectionTimeViewSet)
+router.register(r'enrollments', views.EnrollmentViewSet, basename='enrollment')
 
 urlpatterns = [
+    path('catalog/', views.CatalogSnapshotView.as_view(), name='catalog-snapshot'),
+    path('changes/', views.CatalogChangesView.as_view(), name='catalog-changes'),
+    path('search/', views.CatalogSearchView.as_view(), name='catalog-search'),
+    path('clashes/', views.ClashesView.as_view(), name='clashes'),
+    path('rooms/free/', views.FreeRoomsView.as_view(), name='free-rooms'),
+    path('rooms/utilization/', views.RoomUtilizationView.as_view(), name='room-utilization'),
+    path('demand/', views.DemandView.as_view(), name='demand'),
+    path('live/seats/', views.seat_stream, name='live-seats'),
+    path('eligible/', views.EligibleCoursesView.as_view(), name='eligible-courses'),
+    path('schedules/', views.ScheduleView.as_view(), name='schedules'),
+    path('plan/', views.PlanView.as_view(), name='plan'),
+    path('async/courses/', views.AsyncCourseView.as_view(), name='async-course-list'),
+    path('async/courses/<int:pk>/', views.AsyncCourseView.as_view(), name='async-course-detail'),
+    path('async/sections/', views.AsyncSectionView.as_view(), name='async-section-list'),
+    path('async/sections/<int:pk>/', views.AsyncSectionView.as_view(), name='async-section-detail'),
+    path('async/section-times/', views.AsyncSectionTimeView.as_view(), name='async-section-time-list'),
+    path('async/section-times/<int:pk>/', views.AsyncSectionTimeView.as_view(), name='async-section-time-detail'),
     path('', include(router.urls)),
 ]
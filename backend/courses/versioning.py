@@ -0,0 +1,41 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from unipath_backend.cache import is_shared
+
+
+def _seed():
+    # A counter that was evicted restarts from the clock rather than from
+    # zero, so values cached under an old number are never mistaken for new.
+    return int(time.time() * 1000)
+
+
+def read_counter(key):
+    return cache.get_or_set(key, _seed, None)
+
+
+def bump_counter(key):
+    """Atomically increment a never-expiring cache counter, recreating it if it was evicted."""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, _seed(), None)
+        return cache.incr(key)
+
+
+def worker_generation(counter):
+    """The generation a worker compares against for state it keeps in memory.
+
+    Without a shared cache the bumps made by other workers never arrive, so
+    the generation also moves every ``LOCAL_STATE_TTL`` seconds and the state
+    is reloaded from the database on that schedule.
+    """
+    if is_shared():
+        return counter
+    ttl = getattr(settings, 'LOCAL_STATE_TTL', 10)
+    return f'{counter}.{int(time.time() // ttl)}'
+
+
+def read_generation(key):
+    return worker_generation(read_counter(key))
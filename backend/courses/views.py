@@ -1,29 +1,383 @@
-from rest_framework import viewsets
+from datetime import datetime, timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework import mixins, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import AuthenticationFailed, NotFound, ValidationError
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
 from django_filters.rest_framework import DjangoFilterBackend
+from authentication.authentication import CachedJWTAuthentication
+from unipath_backend.async_views import AsyncAPIView
+from unipath_backend.database import ReplicaReadMixin, reading_from_replica
+from unipath_backend.throttling import EnrollmentRateThrottle, UserRateThrottle
 from rest_framework.filters import SearchFilter, OrderingFilter
-from .models import Course, Section, SectionTime
-from .serializers import CourseSerializer, SectionSerializer, SectionTimeSerializer
+from .bulk import BulkWriteError, write_section_times, write_sections
+from .catalog import get_snapshot, latest_change_version
+from .changes import ChangeFeedExpired, changes_since
+from .clashes import INSTRUCTOR, ROOM, clash_report, describe, resource_key
+from .demand import GROUPS, demand_stats
+from .enrollment import AlreadyEnrolled, NotEnrolled, SectionsFull, UnknownSections, drop_sections, enroll_in_sections
+from .live import read_seats, seat_events
+from .models import Course, Enrollment, Section, SectionTime
+from .occupancy import occupancy
+from .pagination import KeysetPagination
+from .planner import UnknownCourses, plan_courses
+from .readers import course_list, section_list, section_time_list
+from .prerequisites import eligible_courses
+from .scheduling import ScheduleIndex, generate_schedules
+from .search import search_catalog
+from .serializers import (
+    BulkSectionsRequestSerializer, BulkSectionTimesRequestSerializer, CourseSerializer, DropRequestSerializer,
+    EnrollmentSerializer, EnrollRequestSerializer, FreeRoomsQuerySerializer, PlanRequestSerializer,
+    ScheduleRequestSerializer, SectionSerializer, SectionTimeSerializer, UtilizationQuerySerializer,
+)
+
+class ValuesListMixin:
+    """List pages through ``list_rows`` over ``values_list`` rows instead of the model serializer.
+
+    ``?fast=0`` falls back to the serializer; the output is the same. So do
+    views without a paginator that can page ``values_list`` rows.
+    """
+    list_rows = None
 
-class CourseViewSet(viewsets.ModelViewSet):
-    queryset = Course.objects.all()
+    def list(self, request, *args, **kwargs):
+        paginator = self.paginator
+        if request.query_params.get('fast') == '0' or not hasattr(paginator, 'page_queryset'):
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginator.page_queryset(queryset, request, self)
+        return self.paginator.get_paginated_response(self.paginator.build_page(type(self).list_rows(page)))
+
+class CourseViewSet(ReplicaReadMixin, ValuesListMixin, viewsets.ModelViewSet):
+    queryset = Course.objects.with_catalog_tree()
+    pagination_class = KeysetPagination
     serializer_class = CourseSerializer
+    list_rows = course_list
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_fields = ['units']
     search_fields = ['name']
     ordering_fields = ['name', 'units']
+    ordering = ['id']
 
-class SectionViewSet(viewsets.ModelViewSet):
-    queryset = Section.objects.all()
+class SectionViewSet(ReplicaReadMixin, ValuesListMixin, viewsets.ModelViewSet):
+    queryset = Section.objects.with_times()
+    pagination_class = KeysetPagination
     serializer_class = SectionSerializer
+    list_rows = section_list
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_fields = ['course', 'instructor']
     search_fields = ['course__name', 'instructor']
     ordering_fields = ['section_number', 'capacity']
+    ordering = ['id']
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
+    def bulk(self, request):
+        serializer = BulkSectionsRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            ids = write_sections(serializer.validated_data['upsert'], serializer.validated_data['delete'])
+        except BulkWriteError as exc:
+            return Response(exc.errors, status=status.HTTP_400_BAD_REQUEST)
+        sections = Section.objects.with_times().in_bulk(ids)
+        return Response({
+            'sections': SectionSerializer([sections[section_id] for section_id in ids], many=True).data,
+            'deleted': sorted(serializer.validated_data['delete']),
+        })
 
-class SectionTimeViewSet(viewsets.ModelViewSet):
-    queryset = SectionTime.objects.all()
+class SectionTimeViewSet(ReplicaReadMixin, ValuesListMixin, viewsets.ModelViewSet):
+    queryset = SectionTime.objects.select_related('section__course')
+    pagination_class = KeysetPagination
     serializer_class = SectionTimeSerializer
+    list_rows = section_time_list
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_fields = ['day', 'section__course']
     search_fields = ['location']
     ordering_fields = ['day', 'start_time']
+    ordering = ['id']
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
+    def bulk(self, request):
+        serializer = BulkSectionTimesRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            ids = write_section_times(serializer.validated_data['upsert'], serializer.validated_data['delete'])
+        except BulkWriteError as exc:
+            return Response(exc.errors, status=status.HTTP_400_BAD_REQUEST)
+        times = SectionTime.objects.in_bulk(ids)
+        return Response({
+            'section_times': SectionTimeSerializer([times[time_id] for time_id in ids], many=True).data,
+            'deleted': sorted(serializer.validated_data['delete']),
+        })
+
+class AsyncCatalogReadView(AsyncAPIView):
+    """List and retrieve with the configuration of ``viewset``, off the event loop in a single thread hop.
+
+    Rows come from the viewset's ``list_rows`` reader, as in its fast list
+    path; awaiting each query and running the model serializer on the loop
+    made every request several hops and slower than the sync view.
+    """
+    viewset = None
+    shared = ('queryset', 'list_rows', 'filter_backends', 'filterset_fields', 'search_fields',
+              'ordering_fields', 'ordering', 'pagination_class')
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for name in cls.shared:
+            setattr(cls, name, getattr(cls.viewset, name))
+
+    def filter_queryset(self, queryset):
+        for backend in self.filter_backends:
+            queryset = backend().filter_queryset(self.request, queryset, self)
+        return queryset
+
+    async def get(self, request, pk=None):
+        return await sync_to_async(self.read)(request, pk)
+
+    def read(self, request, pk):
+        with reading_from_replica():
+            if pk is not None:
+                rows = type(self).list_rows(self.queryset.filter(pk=pk))
+                if not rows:
+                    raise NotFound()
+                return Response(rows[0])
+            queryset = self.filter_queryset(self.queryset.all())
+            paginator = self.pagination_class()
+            page = paginator.page_queryset(queryset, request, self)
+            return paginator.get_paginated_response(paginator.build_page(type(self).list_rows(page)))
+
+class AsyncCourseView(AsyncCatalogReadView):
+    viewset = CourseViewSet
+
+class AsyncSectionView(AsyncCatalogReadView):
+    viewset = SectionViewSet
+
+class AsyncSectionTimeView(AsyncCatalogReadView):
+    viewset = SectionTimeViewSet
+
+class ScheduleView(APIView):
+    def post(self, request):
+        serializer = ScheduleRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        index = ScheduleIndex.for_courses(params['courses'])
+        result = generate_schedules(
+            index,
+            params['courses'],
+            limit=params['limit'],
+            include_full=params['include_full'],
+            time_budget=getattr(settings, 'SCHEDULE_TIME_BUDGET', 1.0),
+        )
+        return Response({
+            'courses': result.courses,
+            'unavailable': result.unavailable,
+            'truncated': result.truncated,
+            'schedules': [schedule.as_dict() for schedule in result.schedules],
+        })
+
+class PlanView(APIView):
+    def post(self, request):
+        serializer = PlanRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        try:
+            plan = plan_courses(
+                params['courses'],
+                params['completed'],
+                max_units=params['max_units'],
+                time_budget=getattr(settings, 'PLANNER_TIME_BUDGET', 1.0),
+            )
+        except UnknownCourses as exc:
+            raise ValidationError({'courses': f'Unknown courses: {exc.course_ids}'})
+        return Response(plan)
+
+class EligibleCoursesView(APIView):
+    def get(self, request):
+        try:
+            completed = {
+                int(value)
+                for raw in request.query_params.getlist('completed')
+                for value in raw.split(',') if value.strip()
+            }
+        except ValueError:
+            raise ValidationError({'completed': 'Expected a comma-separated list of course ids.'})
+        return Response({'completed': sorted(completed), 'eligible': eligible_courses(completed)})
+
+class CatalogSearchView(APIView):
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            raise ValidationError({'q': 'This parameter is required.'})
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+        except ValueError:
+            raise ValidationError({'limit': 'Expected an integer.'})
+        return Response({'query': query, 'results': search_catalog(query, limit=limit)})
+
+class ClashesView(APIView):
+    def get(self, request):
+        kind = request.query_params.get('kind')
+        if kind not in (None, ROOM, INSTRUCTOR):
+            raise ValidationError({'kind': f'Expected {ROOM!r} or {INSTRUCTOR!r}.'})
+        day = request.query_params.get('day')
+        if day is not None and day not in dict(SectionTime.DAYS_CHOICES):
+            raise ValidationError({'day': 'Unknown day.'})
+        clashes = [
+            clash for clash in clash_report()
+            if (kind is None or clash[0] == kind) and (day is None or clash[2] == day)
+        ]
+        return Response({'count': len(clashes), 'clashes': describe(clashes)})
+
+class FreeRoomsView(APIView):
+    def get(self, request):
+        serializer = FreeRoomsQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        day, start, end = (serializer.validated_data[field] for field in ('day', 'start', 'end'))
+        rooms = occupancy().free_rooms(day, start, end)
+        return Response({'day': day, 'start': start, 'end': end, 'count': len(rooms), 'rooms': rooms})
+
+class RoomUtilizationView(APIView):
+    def get(self, request):
+        serializer = UtilizationQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        matrix = occupancy()
+        rooms = None
+        if params['room']:
+            rooms = [resource_key(room) for room in params['room']]
+            unknown = [room for room, key in zip(params['room'], rooms) if key not in matrix.index]
+            if unknown:
+                raise ValidationError({'room': f'Unknown rooms: {unknown}'})
+        report = matrix.utilization(params['start'], params['end'], params['bucket'], rooms=rooms)
+        return Response({'start': params['start'], 'end': params['end'], 'bucket_minutes': params['bucket'], **report})
+
+class DemandView(APIView):
+    def get(self, request):
+        group = request.query_params.get('by', 'course')
+        if group not in GROUPS:
+            raise ValidationError({'by': f'Expected one of {sorted(GROUPS)}.'})
+        try:
+            limit = min(max(int(request.query_params.get('limit', 50)), 1), 1000)
+        except ValueError:
+            raise ValidationError({'limit': 'Expected an integer.'})
+        stats = demand_stats()
+        return Response({
+            'generated_at': datetime.fromtimestamp(stats['generated_at'], timezone.utc),
+            'by': group,
+            'totals': stats['totals'],
+            'results': stats[group][:limit],
+        })
+
+class CatalogSnapshotView(APIView):
+    # Token claims are enough to authorize a catalog read, so a revalidation
+    # that ends in 304 never touches the database.
+    authentication_classes = [JWTStatelessUserAuthentication]
+
+    def get(self, request):
+        snapshot = get_snapshot()
+        coding = snapshot.negotiate(request.headers.get('Accept-Encoding', ''))
+        if snapshot.matches(parse_etags(request.headers.get('If-None-Match', ''))):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(snapshot.encodings[coding], content_type='application/json')
+            if coding != 'identity':
+                response['Content-Encoding'] = coding
+        response['ETag'] = snapshot.etags[coding]
+        response['X-Catalog-Version'] = str(snapshot.version)
+        response['Cache-Control'] = 'private, no-cache'
+        patch_vary_headers(response, ['Accept-Encoding', 'Authorization'])
+        return response
+
+class CatalogChangesView(APIView):
+    def get(self, request):
+        params = {}
+        for name, default in (('since', None), ('limit', 1000)):
+            try:
+                params[name] = int(request.query_params.get(name, default))
+            except (TypeError, ValueError):
+                raise ValidationError({name: 'Expected an integer.'})
+        limit = min(max(params['limit'], 1), 5000)
+        try:
+            return Response(changes_since(params['since'], limit=limit))
+        except ChangeFeedExpired:
+            return Response(
+                {'detail': 'Changes before this version were compacted; download the catalog snapshot.',
+                 'version': latest_change_version()},
+                status=status.HTTP_410_GONE,
+            )
+
+class EnrollmentViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    serializer_class = EnrollmentSerializer
+    pagination_class = None
+
+    def get_queryset(self):
+        return Enrollment.objects.filter(student__user=self.request.user).order_by('section_id')
+
+    @action(detail=False, methods=['post'], throttle_classes=[UserRateThrottle, EnrollmentRateThrottle])
+    def enroll(self, request):
+        serializer = EnrollRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            enrollments = enroll_in_sections(
+                request.user.userprofile,
+                serializer.validated_data['sections'],
+                waitlist=serializer.validated_data['waitlist'],
+            )
+        except UnknownSections as exc:
+            raise ValidationError({'sections': f'Unknown sections: {exc.section_ids}'})
+        except SectionsFull as exc:
+            return Response({'detail': 'Sections are full.', 'sections': exc.section_ids}, status=status.HTTP_409_CONFLICT)
+        except AlreadyEnrolled as exc:
+            return Response(
+                {'detail': 'Already enrolled or waitlisted.', 'sections': exc.section_ids},
+                status=status.HTTP_409_CONFLICT,
+            )
+        return Response(EnrollmentSerializer(enrollments, many=True).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'], throttle_classes=[UserRateThrottle, EnrollmentRateThrottle])
+    def drop(self, request):
+        serializer = DropRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            drop_sections(request.user.userprofile, serializer.validated_data['sections'])
+        except NotEnrolled as exc:
+            return Response(
+                {'detail': 'Not enrolled in these sections.', 'sections': exc.section_ids},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+MAX_LIVE_SECTIONS = 200
+
+async def seat_stream(request):
+    """Server-sent seat counts for ``?sections=1,2,3``; needs an ASGI server to stream."""
+    if not isinstance(request, ASGIRequest):
+        # WSGI buffers an async iterator to the end, and this one never ends.
+        return JsonResponse({'detail': 'Live seats need an ASGI server.'}, status=501)
+    try:
+        auth = await sync_to_async(CachedJWTAuthentication().authenticate)(request)
+    except AuthenticationFailed as exc:
+        return JsonResponse({'detail': exc.detail}, status=401)
+    if auth is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+    try:
+        section_ids = {int(value) for value in request.GET.get('sections', '').split(',') if value.strip()}
+    except ValueError:
+        return JsonResponse({'sections': 'Expected a comma-separated list of section ids.'}, status=400)
+    if not 0 < len(section_ids) <= MAX_LIVE_SECTIONS:
+        return JsonResponse({'sections': f'Give between 1 and {MAX_LIVE_SECTIONS} section ids.'}, status=400)
+    seats = await sync_to_async(read_seats)(section_ids)
+    if len(seats) != len(section_ids):
+        return JsonResponse({'sections': f'Unknown ids: {sorted(section_ids - seats.keys())}'}, status=400)
+    response = StreamingHttpResponse(seat_events(section_ids, seats), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
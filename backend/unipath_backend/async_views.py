@@ -0,0 +1,39 @@
+"""
+DRF views whose handlers are coroutines.
+
+DRF dispatches synchronously, so ``AsyncAPIView`` reimplements
+``dispatch``: authentication, permissions and throttling still run through
+``APIView.initial`` (in a worker thread, as they may hit the cache or the
+database), and the handler itself is awaited on the event loop, where it
+can use the async ORM. Exceptions and rendering go through the usual DRF
+machinery.
+"""
+import inspect
+
+from asgiref.sync import sync_to_async
+from rest_framework.views import APIView
+
+
+class AsyncAPIView(APIView):
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            if inspect.isawaitable(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def options(self, request, *args, **kwargs):
+        return super().options(request, *args, **kwargs)
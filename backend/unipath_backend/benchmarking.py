@@ -0,0 +1,112 @@
+"""
+Helpers shared by the ``bench_*`` management commands.
+"""
+import json
+import statistics
+import time
+from contextlib import contextmanager
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    rank = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[rank]
+
+
+def summarize(samples):
+    """Latency statistics in milliseconds for a list of durations in seconds."""
+    total = sum(samples)
+    return {
+        'runs': len(samples),
+        'mean_ms': statistics.fmean(samples) * 1000 if samples else 0.0,
+        'p50_ms': percentile(samples, 50) * 1000,
+        'p95_ms': percentile(samples, 95) * 1000,
+        'p99_ms': percentile(samples, 99) * 1000,
+        'ops_per_sec': len(samples) / total if total else 0.0,
+    }
+
+
+def measure(func, repeat=100, warmup=3):
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def format_stats(label, stats):
+    return (
+        f"{label:<32} runs={stats['runs']:<6} mean={stats['mean_ms']:.3f}ms "
+        f"p50={stats['p50_ms']:.3f}ms p95={stats['p95_ms']:.3f}ms "
+        f"p99={stats['p99_ms']:.3f}ms ops/s={stats['ops_per_sec']:.1f}"
+    )
+
+
+@contextmanager
+def scratch_database(verbosity=0):
+    """Run a benchmark against a throwaway test database instead of the configured one."""
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity)
+        teardown_test_environment()
+
+
+@contextmanager
+def without_throttling():
+    """Benchmarks issue far more requests than the API rate limits allow."""
+    from rest_framework.views import APIView
+
+    # Views and actions with their own throttle_classes bypass the class default, so skip them all here.
+    original = APIView.get_throttles
+    APIView.get_throttles = lambda view: []
+    try:
+        yield
+    finally:
+        APIView.get_throttles = original
+
+
+def write_baseline(path, results, meta=None):
+    with open(path, 'w') as stream:
+        json.dump({'meta': meta or {}, 'results': results}, stream, indent=2, sort_keys=True)
+        stream.write('\n')
+
+
+def read_baseline(path):
+    with open(path) as stream:
+        return json.load(stream)['results']
+
+
+def find_regressions(results, baseline, tolerance=0.5, floor_ms=1.0):
+    """Messages for every result worse than its baseline entry.
+
+    The median latency may grow by ``tolerance`` plus ``floor_ms``, since
+    timer noise swamps sub-millisecond endpoints, and ``throughput`` may drop
+    by ``tolerance``. Tail percentiles are recorded but not compared: a few
+    dozen samples on a shared machine make them too noisy to gate on. Query
+    counts are deterministic, so any increase is a regression.
+    """
+    regressions = []
+    for name, expected in sorted(baseline.items()):
+        actual = results.get(name)
+        if actual is None:
+            continue
+        if 'p50_ms' in expected and actual['p50_ms'] > expected['p50_ms'] * (1 + tolerance) + floor_ms:
+            regressions.append(f"{name}: p50_ms {actual['p50_ms']:.2f} > baseline {expected['p50_ms']:.2f}")
+        if 'throughput' in expected and actual['throughput'] * (1 + tolerance) < expected['throughput']:
+            regressions.append(
+                f"{name}: throughput {actual['throughput']:.1f}/s < baseline {expected['throughput']:.1f}/s"
+            )
+        if 'queries' in expected and actual['queries'] > expected['queries']:
+            regressions.append(f"{name}: queries {actual['queries']} > baseline {expected['queries']}")
+    return regressions
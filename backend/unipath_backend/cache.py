@@ -0,0 +1,46 @@
+"""
+``CACHES`` from the environment.
+
+With ``REDIS_URL`` set (``redis://`` or ``rediss://``; several comma-separated
+URLs make the first the primary and the rest replicas) the default cache is
+Redis, shared by every worker process: cached users, catalog versions and
+the API throttle counters then hold across the whole deployment. Without it
+each process keeps its own local-memory cache, which is enough for
+development and tests.
+
+Features that tell workers about changes through the cache check
+``is_shared()`` and fall back to the database when each process has its own.
+"""
+import os
+
+LOCAL_BACKENDS = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+def cache_settings(env=os.environ):
+    url = env.get('REDIS_URL', '')
+    if not url:
+        return {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    return {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': url.split(',') if ',' in url else url,
+            'KEY_PREFIX': env.get('CACHE_KEY_PREFIX', 'unipath'),
+        }
+    }
+
+
+def is_shared(alias='default'):
+    """Whether every worker process sees the same entries in the cache ``alias``.
+
+    ``CACHE_SHARED`` overrides the guess from the backend, e.g. for a single
+    worker process on the local-memory cache.
+    """
+    from django.conf import settings
+
+    shared = getattr(settings, 'CACHE_SHARED', None)
+    if shared is not None:
+        return shared
+    return settings.CACHES[alias]['BACKEND'] not in LOCAL_BACKENDS
@@ -0,0 +1,200 @@
+"""
+Database connections: settings from the environment, catalog reads on a
+replica, and connection acquisition statistics.
+
+``database_settings`` builds ``DATABASES`` from ``DB_*`` variables. By
+default connections persist for ``DB_CONN_MAX_AGE`` seconds and are
+health-checked before reuse; setting ``DB_POOL_MAX_SIZE`` switches to a
+psycopg 3 connection pool instead. ``DB_REPLICA_HOST`` adds a ``replica``
+alias that ``ReplicaRouter`` sends catalog reads to while
+``reading_from_replica`` is active.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+from .benchmarking import summarize
+
+logger = logging.getLogger(__name__)
+
+REPLICA = 'replica'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_reading_from_replica = ContextVar('reading_from_replica', default=False)
+
+
+def env_flag(env, name, default):
+    value = env.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def database_settings(env=os.environ):
+    """``DATABASES`` for the environment in ``env``; unset variables keep the development defaults."""
+    host = env.get('DB_HOST', 'ep-shy-flower-a9xhzxwx-pooler.gwc.azure.neon.tech')
+    options = {'sslmode': env.get('DB_SSLMODE', 'require')}
+    timeout = int(env.get('DB_STATEMENT_TIMEOUT_MS', 0))
+    if timeout:
+        options['options'] = f'-c statement_timeout={timeout}'
+    default = {
+        'ENGINE': 'unipath_backend.postgresql',
+        'NAME': env.get('DB_NAME', 'unipath'),
+        'USER': env.get('DB_USER', 'neondb_owner'),
+        'PASSWORD': env.get('DB_PASSWORD', 'npg_Kms78IAdLbxR'),
+        'HOST': host,
+        'PORT': env.get('DB_PORT', '5432'),
+        'CONN_MAX_AGE': int(env.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': env_flag(env, 'DB_CONN_HEALTH_CHECKS', True),
+        # A transaction-mode pooler such as PgBouncer cannot keep a named cursor open between statements.
+        'DISABLE_SERVER_SIDE_CURSORS': env_flag(env, 'DB_DISABLE_SERVER_SIDE_CURSORS', '-pooler' in host),
+        'OPTIONS': options,
+    }
+    pool_size = int(env.get('DB_POOL_MAX_SIZE', 0))
+    if pool_size:
+        # Pooled connections go back to the pool at the end of each request instead of persisting.
+        default['CONN_MAX_AGE'] = 0
+        options['pool'] = {
+            'min_size': int(env.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': pool_size,
+            'timeout': float(env.get('DB_POOL_TIMEOUT', 10)),
+        }
+    databases = {'default': default}
+    if env.get('DB_REPLICA_HOST'):
+        databases[REPLICA] = {
+            **default,
+            'HOST': env['DB_REPLICA_HOST'],
+            'PORT': env.get('DB_REPLICA_PORT', default['PORT']),
+            'OPTIONS': {**options, 'pool': dict(options['pool'])} if pool_size else dict(options),
+            'TEST': {'MIRROR': 'default'},
+        }
+    return databases
+
+
+@contextmanager
+def reading_from_replica():
+    """Route catalog reads made inside the block to the read replica, if one is configured."""
+    token = _reading_from_replica.set(True)
+    try:
+        yield
+    finally:
+        _reading_from_replica.reset(token)
+
+
+class ReplicaRouter:
+    """Send reads of the ``courses`` app to ``CATALOG_READ_DATABASE`` inside ``reading_from_replica``."""
+    apps = {'courses'}
+
+    def db_for_read(self, model, **hints):
+        alias = getattr(settings, 'CATALOG_READ_DATABASE', None)
+        if alias and _reading_from_replica.get() and model._meta.app_label in self.apps:
+            return alias
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary.
+        if {obj1._state.db, obj2._state.db} <= {'default', REPLICA}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        if db == REPLICA:
+            return False
+        return None
+
+
+class ReplicaReadMixin:
+    """Serve a viewset's safe methods from the read replica; writes and the reads they make stay on the primary."""
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            return super().dispatch(request, *args, **kwargs)
+        with reading_from_replica():
+            return super().dispatch(request, *args, **kwargs)
+
+
+class ConnectionStats:
+    """Time taken to get a database connection, and how many this process holds, per alias."""
+
+    def __init__(self, window=1000):
+        self.window = window
+        self.lock = threading.Lock()
+        self.aliases = {}
+
+    def _entry(self, alias):
+        return self.aliases.setdefault(alias, {
+            'acquired': 0, 'failed': 0, 'open': 0, 'total': 0.0, 'max': 0.0,
+            'recent': deque(maxlen=self.window),
+        })
+
+    def acquired(self, alias, seconds):
+        with self.lock:
+            entry = self._entry(alias)
+            entry['acquired'] += 1
+            entry['open'] += 1
+            entry['total'] += seconds
+            entry['max'] = max(entry['max'], seconds)
+            entry['recent'].append(seconds)
+        slow = getattr(settings, 'DB_SLOW_CONNECTION_MS', 500)
+        if seconds * 1000 > slow:
+            logger.warning('Getting a connection to %r took %.0fms', alias, seconds * 1000)
+
+    def failed(self, alias):
+        with self.lock:
+            self._entry(alias)['failed'] += 1
+
+    def released(self, alias):
+        with self.lock:
+            entry = self._entry(alias)
+            entry['open'] = max(entry['open'] - 1, 0)
+
+    def snapshot(self):
+        with self.lock:
+            aliases = {alias: dict(entry, recent=list(entry['recent'])) for alias, entry in self.aliases.items()}
+        report = {}
+        for alias, entry in aliases.items():
+            recent = summarize(entry['recent'])
+            report[alias] = {
+                'acquired': entry['acquired'],
+                'failed': entry['failed'],
+                'open': entry['open'],
+                'mean_ms': entry['total'] / entry['acquired'] * 1000 if entry['acquired'] else 0.0,
+                'p95_ms': recent['p95_ms'],
+                'max_ms': entry['max'] * 1000,
+            }
+        return report
+
+    def reset(self):
+        with self.lock:
+            self.aliases.clear()
+
+
+connection_stats = ConnectionStats()
+
+
+def pool_stats(connection):
+    """psycopg pool counters for ``connection``'s alias with the share of the pool in use, or None unpooled."""
+    pool = getattr(connection, 'pool', None)
+    if pool is None:
+        return None
+    stats = pool.get_stats()
+    in_use = stats.get('pool_size', 0) - stats.get('pool_available', 0)
+    stats['saturation'] = in_use / stats['pool_max'] if stats.get('pool_max') else 0.0
+    return stats
+
+
+def timed_acquire(alias, acquire):
+    started = time.perf_counter()
+    try:
+        connection = acquire()
+    except Exception:
+        connection_stats.failed(alias)
+        raise
+    connection_stats.acquired(alias, time.perf_counter() - started)
+    return connection
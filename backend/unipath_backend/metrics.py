@@ -0,0 +1,263 @@
+"""
+Per-request performance metrics.
+
+``PerformanceMiddleware`` times every request and counts it per view,
+method and status. A ``PERFORMANCE_SAMPLE_RATE`` share of requests is also
+profiled: the queries they run on any connection and the time spent in
+``TimedSerializerMixin`` serializers. Profiled requests over
+``PERFORMANCE_QUERY_THRESHOLD`` queries are logged with their most repeated
+statement, which is usually an N+1. Timings go out in a ``Server-Timing``
+header, and the totals of this process in Prometheus text format at
+``/metrics``.
+"""
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+
+from .database import connection_stats, pool_stats
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+WARN_INTERVAL = 60
+
+_profile = ContextVar('request_profile', default=None)
+
+
+class RequestProfile:
+    """What one sampled request spent on queries and serialization."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.serialize = 0.0
+        self.serializing = False
+        self.statements = Counter()
+
+
+def record_query(execute, sql, params, many, context):
+    profile = _profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.db += time.perf_counter() - started
+        profile.queries += 1
+        profile.statements[sql] += 1
+
+
+def install_query_recorder(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+connection_created.connect(install_query_recorder)
+
+
+class TimedSerializerMixin:
+    """Counts the time a serializer spends in ``to_representation`` towards a sampled request's profile."""
+
+    def to_representation(self, instance):
+        profile = _profile.get()
+        if profile is None or profile.serializing:
+            return super().to_representation(instance)
+        profile.serializing = True
+        started = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            profile.serializing = False
+            profile.serialize += time.perf_counter() - started
+
+
+class Metrics:
+    """Request totals of this process, by view and method."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.statuses = Counter()
+            self.durations = {}
+            self.response_bytes = Counter()
+            self.sampled = {}
+            self.warned = {}
+
+    def observe(self, view, method, status, seconds, size, profile=None):
+        key = (view, method)
+        with self.lock:
+            self.statuses[view, method, status] += 1
+            buckets = self.durations.setdefault(key, [0] * len(DURATION_BUCKETS) + [0.0, 0])
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if seconds <= bound:
+                    buckets[index] += 1
+            buckets[-2] += seconds
+            buckets[-1] += 1
+            self.response_bytes[key] += size
+            if profile is not None:
+                totals = self.sampled.setdefault(key, [0, 0, 0.0, 0.0])
+                totals[0] += 1
+                totals[1] += profile.queries
+                totals[2] += profile.db
+                totals[3] += profile.serialize
+
+    def should_warn(self, view, method):
+        now = time.monotonic()
+        with self.lock:
+            if now - self.warned.get((view, method), -WARN_INTERVAL) < WARN_INTERVAL:
+                return False
+            self.warned[view, method] = now
+            return True
+
+    def render(self):
+        with self.lock:
+            statuses = dict(self.statuses)
+            durations = {key: list(value) for key, value in self.durations.items()}
+            response_bytes = dict(self.response_bytes)
+            sampled = {key: list(value) for key, value in self.sampled.items()}
+        lines = []
+
+        def family(name, kind, help_text, samples):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for suffix, labels, value in samples:
+                lines.append(f'{name}{suffix}{{{format_labels(labels)}}} {value}')
+
+        family('unipath_http_requests_total', 'counter', 'Requests served.', [
+            ('', {'view': view, 'method': method, 'status': status}, count)
+            for (view, method, status), count in sorted(statuses.items())
+        ])
+        histogram = []
+        for (view, method), buckets in sorted(durations.items()):
+            labels = {'view': view, 'method': method}
+            for bound, count in zip(DURATION_BUCKETS, buckets):
+                histogram.append(('_bucket', {**labels, 'le': repr(bound)}, count))
+            histogram.append(('_bucket', {**labels, 'le': '+Inf'}, buckets[-1]))
+            histogram.append(('_sum', labels, buckets[-2]))
+            histogram.append(('_count', labels, buckets[-1]))
+        family('unipath_http_request_duration_seconds', 'histogram', 'Time to build the response.', histogram)
+        family('unipath_http_response_bytes_total', 'counter', 'Response body bytes, streams excluded.', [
+            ('', {'view': view, 'method': method}, size) for (view, method), size in sorted(response_bytes.items())
+        ])
+        for index, name, help_text in [
+            (0, 'unipath_profiled_requests_total', 'Requests sampled for profiling.'),
+            (1, 'unipath_profiled_db_queries_total', 'Queries run by profiled requests.'),
+            (2, 'unipath_profiled_db_seconds_total', 'Time profiled requests spent in queries.'),
+            (3, 'unipath_profiled_serializer_seconds_total', 'Time profiled requests spent serializing.'),
+        ]:
+            family(name, 'counter', help_text, [
+                ('', {'view': view, 'method': method}, totals[index]) for (view, method), totals in sorted(sampled.items())
+            ])
+
+        connection_report = sorted(connection_stats.snapshot().items())
+        family('unipath_db_connections_acquired_total', 'counter', 'Database connections opened or checked out.', [
+            ('', {'alias': alias}, stats['acquired']) for alias, stats in connection_report
+        ])
+        family('unipath_db_connection_acquire_seconds_total', 'counter', 'Time spent getting database connections.', [
+            ('', {'alias': alias}, stats['acquired'] * stats['mean_ms'] / 1000) for alias, stats in connection_report
+        ])
+        family('unipath_db_connections_open', 'gauge', 'Database connections held by this process.', [
+            ('', {'alias': alias}, stats['open']) for alias, stats in connection_report
+        ])
+        pools = [(alias, pool_stats(connections[alias])) for alias in connections]
+        family('unipath_db_pool_saturation', 'gauge', 'Share of the connection pool in use.', [
+            ('', {'alias': alias}, stats['saturation']) for alias, stats in pools if stats is not None
+        ])
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels):
+    return ','.join(f'{name}="{escape_label(value)}"' for name, value in labels.items())
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+metrics = Metrics()
+
+
+class PerformanceMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        # Connections opened before this module was loaded did not get the recorder.
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        profile = RequestProfile() if sampled() else None
+        token = _profile.set(profile)
+        try:
+            response = self.get_response(request)
+        finally:
+            _profile.reset(token)
+        return self.finish(request, response, time.perf_counter() - started, profile)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        profile = RequestProfile() if sampled() else None
+        token = _profile.set(profile)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _profile.reset(token)
+        return self.finish(request, response, time.perf_counter() - started, profile)
+
+    def finish(self, request, response, seconds, profile):
+        match = request.resolver_match
+        view = match.view_name if match else '<unmatched>'
+        size = 0 if response.streaming else len(response.content)
+        metrics.observe(view, request.method, response.status_code, seconds, size, profile)
+        if getattr(settings, 'PERFORMANCE_SERVER_TIMING', True):
+            timings = [f'app;dur={seconds * 1000:.1f}']
+            if profile is not None:
+                timings.append(f'db;dur={profile.db * 1000:.1f};desc="{profile.queries} queries"')
+                timings.append(f'serialize;dur={profile.serialize * 1000:.1f}')
+            response['Server-Timing'] = ', '.join(timings)
+        threshold = getattr(settings, 'PERFORMANCE_QUERY_THRESHOLD', 20)
+        if profile is not None and profile.queries > threshold and metrics.should_warn(view, request.method):
+            statement, repeats = profile.statements.most_common(1)[0]
+            logger.warning(
+                '%s %s ran %d queries (threshold %d); repeated %d times: %s',
+                request.method, view, profile.queries, threshold, repeats, statement[:300],
+            )
+        return response
+
+
+def sampled():
+    rate = getattr(settings, 'PERFORMANCE_SAMPLE_RATE', 0.1)
+    return rate >= 1 or random.random() < rate
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint; needs ``METRICS_TOKEN`` as a bearer token, or DEBUG when none is set."""
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        if request.headers.get('Authorization') != f'Bearer {token}':
+            return HttpResponseForbidden()
+    elif not settings.DEBUG:
+        return HttpResponseForbidden()
+    body = metrics.render()
+    return HttpResponse(body, content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,18 @@
+"""
+The PostgreSQL backend, timing how long each new connection (or checkout
+from the pool) takes and counting the connections this process holds.
+"""
+from django.db.backends.postgresql import base
+
+from unipath_backend.database import connection_stats, timed_acquire
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_new_connection(self, conn_params):
+        return timed_acquire(self.alias, lambda: super(DatabaseWrapper, self).get_new_connection(conn_params))
+
+    def _close(self):
+        try:
+            return super()._close()
+        finally:
+            connection_stats.released(self.alias)
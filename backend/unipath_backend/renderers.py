@@ -0,0 +1,28 @@
+"""
+A drop-in ``JSONRenderer`` that encodes with orjson when it is installed.
+
+The output matches DRF's compact JSON: dates and anything else orjson does
+not encode natively go through DRF's ``JSONEncoder``, and U+2028/U+2029 are
+escaped the same way. Pretty-printed requests (``indent=``) and an
+uninstalled orjson fall back to the standard renderer.
+"""
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME) if orjson is not None else 0
+
+
+class ORJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or not self.compact or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        body = orjson.dumps(data, default=self.encoder_class().default, option=OPTIONS)
+        return body.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
@@ -10,8 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from unipath_backend.cache import cache_settings
+from unipath_backend.database import REPLICA, database_settings
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -37,6 +41,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'corsheaders',
     'rest_framework',
     'rest_framework_simplejwt',
@@ -48,6 +53,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'unipath_backend.metrics.PerformanceMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -81,19 +87,33 @@ WSGI_APPLICATION = 'unipath_backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': 'unipath',
-        'USER': 'neondb_owner',
-        'PASSWORD': 'npg_Kms78IAdLbxR',
-        'HOST': 'ep-shy-flower-a9xhzxwx-pooler.gwc.azure.neon.tech',
-        'PORT': '5432',
-        'OPTIONS': {
-            'sslmode': 'require',
-        },
-    }
-}
+# Connection, pooling, timeout and replica settings come from DB_* environment variables;
+# see unipath_backend/database.py.
+DATABASES = database_settings()
+
+DATABASE_ROUTERS = ['unipath_backend.database.ReplicaRouter']
+
+# Alias the catalog viewsets read from, when a replica is configured
+CATALOG_READ_DATABASE = REPLICA if REPLICA in DATABASES else None
+
+# Connection acquisitions slower than this many milliseconds are logged
+DB_SLOW_CONNECTION_MS = 500
+
+# Caches
+# Redis when REDIS_URL is set, shared by all workers; see unipath_backend/cache.py.
+CACHES = cache_settings()
+
+# Whether every worker sees the same default cache. None decides from the backend: Redis is shared,
+# local memory is not, and features that sync workers through the cache then read the database.
+# Set True only when a single worker process serves the site.
+CACHE_SHARED = None
+
+# Seconds a worker without a shared cache keeps in-memory state built from the catalog, such as the
+# prerequisite graph, before reloading it from the database
+LOCAL_STATE_TTL = 10
+
+# Cache alias holding the API throttle counters
+THROTTLE_CACHE = 'default'
 
 
 # Password validation
@@ -137,23 +157,30 @@ CORS_ALLOWED_ORIGINS = [
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'authentication.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'unipath_backend.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle'
+        'unipath_backend.throttling.AnonRateThrottle',
+        'unipath_backend.throttling.UserRateThrottle'
     ],
     'DEFAULT_THROTTLE_RATES': {
         'anon': '100/hour',
-        'user': '1000/hour'
+        'user': '1000/hour',
+        'register': '10/hour',
+        'login': '20/minute',
+        'enrollment': '60/minute'
     }
 }
 
@@ -166,6 +193,40 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': True,
 }
 
+# Seconds an authenticated user is reused from this process, and from the shared cache. Without a
+# shared cache (see CACHE_SHARED) users are read from the database on every request.
+AUTH_USER_LOCAL_TTL = 5
+AUTH_USER_CACHE_TTL = 300
+
+# Blacklisted refresh tokens held in each process's bloom filter before it is rebuilt
+TOKEN_BLACKLIST_FILTER_CAPACITY = 1000000
+
+# Seconds a gap in the catalog change log may still be filled by a transaction committing late;
+# the delta sync cursor does not pass younger gaps. Keep longer than any catalog write transaction.
+CATALOG_CHANGES_SETTLE = 120
+
+# Seconds a stale enrollment-pressure report may still be served before one request rebuilds it
+DEMAND_STATS_MIN_REFRESH = 30
+
+# Seconds the schedule generator may search for conflict-free combinations before answering with those found
+SCHEDULE_TIME_BUDGET = 1.0
+
+# Seconds a degree plan may search for fewer terms before answering with the best plan found
+PLANNER_TIME_BUDGET = 1.0
+
+# Seconds between live seat checks, and between keepalives on an idle seat stream
+SEAT_PUSH_INTERVAL = 0.5
+SEAT_PUSH_HEARTBEAT = 15
+
+# Share of requests profiled for query and serializer time, the query count that gets a profiled
+# request logged as a likely N+1, and whether responses carry a Server-Timing header
+PERFORMANCE_SAMPLE_RATE = 0.1
+PERFORMANCE_QUERY_THRESHOLD = 20
+PERFORMANCE_SERVER_TIMING = True
+
+# Bearer token Prometheus scrapes /metrics with; without one the endpoint only answers when DEBUG is on
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
 # Guardian settings
 AUTHENTICATION_BACKENDS = (
     'django.contrib.auth.backends.ModelBackend',
@@ -177,6 +238,20 @@ AUTHENTICATION_BACKENDS = (
 
 STATIC_URL = 'static/'
 
+# Uploaded files. Avatar originals and their thumbnails have content-addressed names and are
+# served with a year-long immutable Cache-Control (see authentication/avatars.py).
+
+MEDIA_URL = '/media/'
+MEDIA_ROOT = Path(os.environ.get('MEDIA_ROOT', BASE_DIR / 'media'))
+
+# Whether Django serves MEDIA_ROOT itself. Its static file view is for development; in production
+# the web server or storage should serve /media/.
+SERVE_MEDIA = DEBUG
+
+AVATAR_MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+AVATAR_SIZES = (64, 128, 256)
+AVATAR_THUMBNAIL_WORKERS = 2
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,71 @@
+"""
+Fixed-window API throttles.
+
+DRF's ``SimpleRateThrottle`` stores a list with the timestamp of every
+request in the window and rewrites it on each request, so a ``1000/hour``
+user costs a 1,000-entry list read, pruned and written back per call, and
+two workers can both read the list before either writes it. These throttles
+keep one integer per key and window instead, raised with a single atomic
+``incr``, so the count is exact across workers sharing the cache and costs
+the same at the first request as at the thousandth.
+
+The trade-off is the fixed window: a client can spend its allowance at the
+end of one window and again at the start of the next.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import throttling
+
+
+class FixedWindowRateThrottle(throttling.SimpleRateThrottle):
+    @property
+    def cache(self):
+        return caches[getattr(settings, 'THROTTLE_CACHE', 'default')]
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        self.now = self.timer()
+        window = int(self.now // self.duration)
+        self.window_end = (window + 1) * self.duration
+        key = f'{self.key}:{window}'
+        try:
+            count = self.cache.incr(key)
+        except ValueError:
+            # The first request of the window. If another worker added the key first, count on top of it.
+            count = 1 if self.cache.add(key, 1, self.duration) else self.cache.incr(key)
+        return count <= self.num_requests
+
+    def wait(self):
+        return max(self.window_end - self.now, 0)
+
+
+class AnonRateThrottle(FixedWindowRateThrottle, throttling.AnonRateThrottle):
+    """``anon`` rate per client address for unauthenticated requests."""
+
+
+class UserRateThrottle(FixedWindowRateThrottle, throttling.UserRateThrottle):
+    """``user`` rate per user, or per client address for unauthenticated requests."""
+
+
+class ClientRateThrottle(FixedWindowRateThrottle):
+    """The scope's rate per client address, signed in or not."""
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class RegisterRateThrottle(ClientRateThrottle):
+    scope = 'register'
+
+
+class LoginRateThrottle(ClientRateThrottle):
+    scope = 'login'
+
+
+class EnrollmentRateThrottle(UserRateThrottle):
+    """Enroll and drop requests, which spike when the course registration window opens."""
+    scope = 'enrollment'
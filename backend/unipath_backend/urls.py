@@ -14,13 +14,21 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
+
+from authentication.avatars import media_view
+from .metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     path('api/v1/', include([
         path('auth/', include('authentication.urls')),
         path('courses/', include('courses.urls')),
     ])),
 ]
+
+if settings.SERVE_MEDIA:
+    urlpatterns.append(re_path(r'^media/(?P<path>.*)$', media_view, name='media'))